@@ -6,7 +6,7 @@ import io
 import textwrap
 import base64
 from langchain_core.tools import tool
-from .utils import INTERNAL_SKILLS_DIR, USER_SKILLS_DIR, get_available_skills_hint, get_skill_suggestions, MEMORY_FILE, ensure_memory_exists, PROJECT_ROOT
+from .utils import INTERNAL_SKILLS_DIR, USER_SKILLS_DIR, get_available_skills_hint, get_skill_suggestions, MEMORY_FILE, ensure_memory_exists, PROJECT_ROOT, get_knowledge_service
 
 # 尝试导入可选依赖
 try:
@@ -323,19 +323,51 @@ def search_file(file_path: str, pattern: str, case_sensitive: bool = False):
     except Exception as e: return f"搜索出错: {e}"
 
 @tool
-def retrieve_knowledge(query: str, collection: str = "documents"):
+def retrieve_knowledge(query: str = "", collection: str = "documents", mode: str = None, source: str = "", since: str = "", queries: list[str] = None):
     """
     语义检索工具。从本地知识库或对话历史中检索相关信息。
     适用场景：
     1. 查阅已入库的文档（如白皮书、技术方案）。 Collection: "documents"
     2. 回忆过去的对话背景（情景记忆）。 Collection: "episodic_memory"
+    3. 同时查文档与历史对话时，一次调用即可： Collection: "documents,episodic_memory" 或 "all"
+       (合并排序后的结果会标注所属 Collection)
+    检索模式 mode：
+    - 不传时使用配置的默认模式 (ZX_KB_SEARCH_MODE，未配置为 "hybrid")。
+    - "hybrid": 关键词 + 向量融合排序，兼顾语义与精确匹配。
+    - "vector": 纯语义检索，适合意思相近但措辞不同的问题。
+    - "keyword": 纯关键词检索，适合编号、型号、人名等精确标识。
+    可选过滤 (先过滤再检索)：
+    - source: 来源文件 glob，如 "*.pdf"、"*白皮书*"。
+    - since: 只看该日期之后入库的内容，格式 YYYY-MM-DD。
+    批量检索：需要从多个角度查资料时，把问题放进 queries 列表一次调用 (最多 10 个)，
+    结果按问题分组返回，每个问题最多 5 条。不要为每个问题单独调用本工具。
     """
-    # 动态定位脚本
+    filters = {k: v for k, v in {"source": source, "since": since}.items() if v}
+    all_queries = [q for q in [query] + list(queries or []) if q and q.strip()]
+    if not all_queries:
+        return "错误: 请提供 query 或 queries。"
+    # 优先走进程内常驻检索服务，免去每次冷启动解释器和加载模型
+    service = get_knowledge_service()
+    if service is not None:
+        try:
+            if len(all_queries) > 1:
+                return service.search_many(all_queries, collection, mode=mode, filters=filters)
+            return service.search(all_queries[0], collection, mode=mode, filters=filters)
+        except Exception as e:
+            return f"检索失败: {e}"
+
+    # 回退：知识库依赖不可用时，动态定位脚本走子进程
     script_path = os.path.join(INTERNAL_SKILLS_DIR, "knowledge_base/scripts/query.py")
     if not os.path.exists(script_path):
         return "错误: 知识库技能脚本未找到。"
         
-    cmd = [sys.executable, script_path, query, collection]
+    cmd = [sys.executable, script_path, all_queries[0], collection]
+    if mode:
+        cmd += ["--mode", mode]
+    for extra in all_queries[1:]:
+        cmd += ["-q", extra]
+    for key, value in filters.items():
+        cmd += [f"--{key}", value]
     try:
         # 注入 PYTHONPATH 确保脚本能找到 agent_core
         env = os.environ.copy()
@@ -128,3 +128,14 @@ def get_available_skills_hint(limit: int = 5) -> str:
         if len(items) >= limit:
             break
     return "；".join(items)
+
+def get_knowledge_service():
+    """
+    返回进程内常驻的知识库检索服务 (模型与表句柄常驻内存)。
+    知识库依赖 (lancedb/fastembed) 缺失时返回 None，由调用方回退到子进程模式。
+    """
+    try:
+        from skills.knowledge_base.scripts.retrieval_service import get_service
+    except ImportError:
+        return None
+    return get_service()
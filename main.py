@@ -11,7 +11,6 @@ import time
 import threading
 import queue
 import signal
-import subprocess
 import atexit
 
 # Rich & PromptToolkit
@@ -36,6 +35,7 @@ _LAST_CHAT_HISTORY = None
 _LAST_STOP_EVENT = None
 _LAST_WORKER_THREAD = None
 _ARCHIVE_ON_EXIT_DONE = False
+_TURN_RECORDER = None
 
 def _msg_key(msg):
     """生成消息去重键：优先使用消息 id，缺失时回退到对象地址。"""
@@ -77,6 +77,9 @@ def _flush_live_snapshot(live, accumulated_content: str):
 def _archive_session(chat_history):
     """将当前会话历史归档为 Markdown 文件"""
     if not chat_history: return
+    if _TURN_RECORDER is not None and _TURN_RECORDER.turns:
+        _close_turn_memory()
+        return
     
     import datetime
     import os
@@ -116,32 +119,56 @@ def _archive_session(chat_history):
             f.write("\n".join(content))
         console.print(f"[dim]💾 会话已归档至: .../logs/{today}/{filename}[/dim]")
         
-        # [新增] 自动入库到 episodic_memory
-        # 使用 subprocess 调用 ingest.py，确保环境隔离且路径正确
-        # 假设 ingest.py 在标准位置
-        ingest_script = os.path.join(os.getcwd(), "skills/knowledge_base/scripts/ingest.py")
-        if os.path.exists(ingest_script):
-            # 使用 sys.executable 确保使用当前的 venv python
-            # 传入 file_path 和 collection_name="episodic_memory"
-            # 无论成功与否，不应阻塞退出，所以 capture_output=True 且不 check
-            proc = subprocess.run(
-                [sys.executable, ingest_script, file_path, "episodic_memory"],
-                capture_output=True,
-                text=True
-            )
-            if proc.returncode == 0:
-                console.print(f"[dim]🧠 记忆已同步至 episodic_memory[/dim]")
-            else:
-                err_text = (proc.stderr or proc.stdout or "").strip()
-                err_line = err_text.splitlines()[0] if err_text else ""
-                suffix = f" {err_line[:200]}" if err_line else ""
-                console.print(f"[dim]⚠️ 记忆同步失败 (code {proc.returncode}){suffix}[/dim]")
-        else:
-            console.print(f"[dim]⚠️ 未找到 ingest 脚本，跳过记忆同步[/dim]")
+        # 自动入库到 episodic_memory：退出路径只写入任务日志，向量化由后台进程完成
+        _enqueue_episodic(file_path)
             
     except Exception as e:
         console.print(f"[red]归档失败: {e}[/red]")
 
+def _enqueue_episodic(file_path):
+    """把会话文件加入入库任务日志并拉起后台入库进程，不等待向量化完成。"""
+    try:
+        from skills.knowledge_base.scripts.ingest_journal import IngestJournal, spawn_drainer
+        IngestJournal().enqueue(file_path, "episodic_memory")
+        spawn_drainer()
+        console.print(f"[dim]🧠 记忆已加入后台入库队列 (episodic_memory)[/dim]")
+    except Exception as e:
+        # 会话文件已落盘，排队失败不影响退出
+        console.print(f"[dim]⚠️ 记忆入库排队失败: {e}[/dim]")
+
+def _start_turn_memory():
+    """按轮次增量写入情景记忆 (ZX_KB_TURN_MEMORY=0 时回退为退出时整段归档)。"""
+    global _TURN_RECORDER
+    try:
+        from skills.knowledge_base.scripts.turn_memory import TurnRecorder, TURN_MEMORY_ENABLED
+    except ImportError:
+        return
+    if TURN_MEMORY_ENABLED:
+        from agent_core.utils import USER_MEMORY_DIR
+        import datetime
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        _TURN_RECORDER = TurnRecorder(os.path.join(USER_MEMORY_DIR, "logs", today))
+
+def _record_turn(turn_messages, started_at):
+    """一轮对话结束后写入会话日志，向量化在后台线程完成。"""
+    if _TURN_RECORDER is None:
+        return
+    import datetime
+    try:
+        _TURN_RECORDER.record(turn_messages, datetime.datetime.fromtimestamp(started_at).isoformat(timespec="seconds"))
+    except Exception as e:
+        console.print(f"[dim]⚠️ 本轮记忆写入失败: {e}[/dim]")
+
+def _close_turn_memory():
+    """退出时等待剩余轮次入库；有轮次未写入时把会话日志交给后台入库队列，只补齐缺失的轮次。"""
+    recorder = _TURN_RECORDER
+    needs_backfill = recorder.close()
+    console.print(f"[dim]💾 会话已记录至: {recorder.log_path} ({recorder.turns} 轮)[/dim]")
+    if needs_backfill:
+        _enqueue_episodic(recorder.log_path)
+    else:
+        console.print(f"[dim]🧠 记忆已按轮次同步至 episodic_memory[/dim]")
+
 def _archive_session_once(chat_history):
     """退出路径只归档一次，避免重复写入。"""
     global _ARCHIVE_ON_EXIT_DONE
@@ -181,6 +208,22 @@ def _handle_termination(signum, frame):
     finally:
         raise SystemExit(0)
 
+def _start_knowledge_warmup():
+    """后台预热常驻知识库检索服务，使首次 retrieve_knowledge 即为热查询。"""
+    from agent_core.utils import get_knowledge_service
+    service = get_knowledge_service()
+    if service is not None:
+        service.warmup_async()
+
+def _start_journal_drain():
+    """上次退出时未完成 (或被中断) 的记忆入库任务，启动时交给后台进程继续。"""
+    try:
+        from skills.knowledge_base.scripts.ingest_journal import IngestJournal, spawn_drainer
+        if IngestJournal().has_work():
+            spawn_drainer()
+    except Exception as e:
+        console.print(f"[dim]⚠️ 记忆入库队列检查失败: {e}[/dim]")
+
 def _install_exit_handlers():
     """安装退出钩子，覆盖非优雅退出场景。"""
     atexit.register(lambda: _archive_session_once(_LAST_CHAT_HISTORY))
@@ -201,6 +244,10 @@ def main():
     except Exception as e:
         ui.render_error(console, f"初始化失败: {e}")
         return
+
+    _start_knowledge_warmup()
+    _start_journal_drain()
+    _start_turn_memory()
     
     chat_history = []
     active_skills = {}
@@ -345,6 +392,7 @@ def main():
                     except queue.Empty:
                         continue
 
+            _record_turn(current_messages[len(chat_history):], start_time)
             chat_history = current_messages
             _set_runtime_context(chat_history, stop_event, worker_thread)
 
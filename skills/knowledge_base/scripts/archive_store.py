@@ -0,0 +1,216 @@
+import os
+import sys
+import errno
+import shutil
+import hashlib
+import datetime
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS archive_refs (
+    collection  TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    acquired_at TEXT NOT NULL,
+    PRIMARY KEY (collection, path)
+);
+CREATE INDEX IF NOT EXISTS idx_archive_refs_path ON archive_refs (path);
+"""
+
+HASH_BLOCK_SIZE = 1024 * 1024   # 流式哈希 / 复制的块大小，大文件不整体读入内存
+# 归档方式 (ZX_KB_ARCHIVE_LINK)：
+# - reflink (默认): 同一文件系统且支持写时复制 (btrfs / xfs 等) 时共享数据块，否则退回复制
+# - hardlink: 先尝试硬链接 (与源文件共享 inode，原地修改源文件会同时改变归档)，再 reflink，最后复制
+# - copy: 总是复制
+LINK_MODES = ("reflink", "hardlink", "copy")
+LINK_MODE = os.environ.get("ZX_KB_ARCHIVE_LINK", "reflink")
+FICLONE = 0x40049409            # Linux ioctl: 克隆整个文件 (reflink)
+_UNSUPPORTED = (errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTTY, errno.EOPNOTSUPP, errno.ENOSYS, errno.EBADF)
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def hash_file(file_path):
+    """分块流式计算文件的完整 SHA-256 (内容地址)"""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def object_dir(archive_dir, content_hash):
+    """分片目录：<归档根>/ab/cd/<完整哈希>/，每层最多 256 个子目录"""
+    return os.path.join(archive_dir, content_hash[:2], content_hash[2:4], content_hash)
+
+
+def is_archived(path, archive_dir):
+    """路径是否位于归档目录内 (只有归档副本才按引用计数清理)"""
+    if not path:
+        return False
+    root = os.path.abspath(archive_dir)
+    return os.path.commonpath([root, os.path.abspath(path)]) == root
+
+
+def _reflink(src, dst):
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported on this platform")
+    import fcntl
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def _materialize(src, dst, mode):
+    """把 src 放到 dst，返回实际使用的方式。不支持的方式依次退回，复制由内核完成 (不经过 Python 内存)。"""
+    attempts = {"hardlink": ("hardlink", "reflink"), "reflink": ("reflink",), "copy": ()}[mode]
+    for method in attempts:
+        try:
+            if method == "hardlink":
+                os.link(src, dst)
+            else:
+                _reflink(src, dst)
+                shutil.copystat(src, dst)
+            return method
+        except OSError as e:
+            if os.path.exists(dst):
+                os.remove(dst)
+            if e.errno not in _UNSUPPORTED:
+                raise
+    shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+    return "copy"
+
+
+def store_file(file_path, content_hash, archive_dir, mode=LINK_MODE):
+    """
+    按内容地址归档：<分片目录>/<原文件名>，返回 (归档路径, 方式)。
+    - 已存在: existing
+    - 同内容、不同文件名已归档: 在归档内硬链接 (dedup)，数据只存一份
+    - 否则按 mode 链接或复制；先写临时文件再原子改名，并发入库与中途崩溃都不会留下半个文件
+    只做文件系统操作，可在解析进程中调用。
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"不支持的归档方式 '{mode}'，可选: {', '.join(LINK_MODES)}")
+    target_dir = object_dir(archive_dir, content_hash)
+    target = os.path.join(target_dir, os.path.basename(file_path))
+    if os.path.exists(target):
+        return target, "existing"
+    os.makedirs(target_dir, exist_ok=True)
+    tmp = os.path.join(target_dir, f".tmp-{os.getpid()}-{os.urandom(4).hex()}")
+    try:
+        sibling = next((os.path.join(target_dir, n) for n in sorted(os.listdir(target_dir))
+                        if not n.startswith(".tmp-")), None)
+        method = None
+        if sibling:
+            try:
+                os.link(sibling, tmp)
+                method = "dedup"
+            except OSError:
+                method = None
+        if method is None:
+            method = _materialize(file_path, tmp, mode)
+        os.replace(tmp, target)
+        return target, method
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class ArchiveStore:
+    """
+    归档副本的引用计数：每个 (集合, 归档路径) 是一个引用，存在 kb_meta.sqlite3。
+    同一文档入库到多个集合时共用一个归档副本，最后一个引用释放时才删除文件并清理空的分片目录。
+    同一集合内多个路径 (不同目录下同名同内容的文件) 也可能共用一个归档：
+    传入 manifest 时，清单中仍有路径使用该归档则不释放。
+    """
+
+    def __init__(self, meta, archive_dir, manifest=None):
+        self.meta = meta
+        self.archive_dir = os.path.abspath(archive_dir)
+        self.manifest = manifest
+        self.meta.ensure_schema(_DDL)
+
+    def acquire(self, collection, path):
+        """登记引用 (重复登记无副作用)；归档目录之外的路径 (如会话日志) 不计数"""
+        if not is_archived(path, self.archive_dir):
+            return False
+        self.meta.execute(
+            "INSERT OR IGNORE INTO archive_refs (collection, path, acquired_at) VALUES (?, ?, ?)",
+            (collection, path, _now()),
+        )
+        return True
+
+    def refcount(self, path):
+        row = self.meta.query_one("SELECT COUNT(*) AS n FROM archive_refs WHERE path = ?", (path,))
+        return row["n"]
+
+    def release(self, collection, path):
+        """释放引用 (本集合清单中仍有路径使用时保留)，没有其他引用时删除归档文件，返回是否删除了文件"""
+        if not is_archived(path, self.archive_dir):
+            return False
+        if self.manifest is not None and self.manifest.paths_for_source(collection, path):
+            return False
+        self.meta.execute("DELETE FROM archive_refs WHERE collection = ? AND path = ?", (collection, path))
+        if self.refcount(path):
+            return False
+        return self._remove(path)
+
+    def release_collection(self, collection):
+        """集合被删除：释放它的全部引用，返回删除的文件数"""
+        paths = [r["path"] for r in self.meta.query("SELECT path FROM archive_refs WHERE collection = ?", (collection,))]
+        return sum(self.release(collection, p) for p in paths)
+
+    def _remove(self, path):
+        try:
+            if not os.path.isfile(path):
+                return False
+            os.remove(path)
+        except OSError as e:
+            print(f"⚠️ Failed to remove archive {path}: {e}")
+            return False
+        # 自底向上清理空的分片目录
+        parent = os.path.dirname(path)
+        while parent != self.archive_dir and is_archived(parent, self.archive_dir):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+        return True
+
+    def iter_files(self):
+        for dirpath, _, names in os.walk(self.archive_dir):
+            for name in names:
+                if not name.startswith(".tmp-"):
+                    yield os.path.join(dirpath, name)
+
+    def stats(self):
+        """归档文件数、实际占用 (同一 inode 只计一次)、引用数与去重节省的字节数"""
+        files = logical = physical = 0
+        inodes = set()
+        for path in self.iter_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files += 1
+            logical += st.st_size
+            if (st.st_dev, st.st_ino) not in inodes:
+                inodes.add((st.st_dev, st.st_ino))
+                physical += st.st_size
+        refs = self.meta.query_one("SELECT COUNT(*) AS n FROM archive_refs")["n"]
+        return {"files": files, "objects": len(inodes), "logical_bytes": logical,
+                "physical_bytes": physical, "saved_bytes": logical - physical, "refs": refs}
+
+    def gc(self, referenced_sources):
+        """
+        补登记 + 回收：referenced_sources 为 {(集合, source)} (来自来源目录，覆盖升级前入库的旧归档)，
+        先补登记其中位于归档目录的引用，再删除没有任何引用的归档文件。返回删除的文件数。
+        """
+        for collection, source in referenced_sources:
+            self.acquire(collection, source)
+        removed = 0
+        for path in list(self.iter_files()):
+            if not self.refcount(path):
+                removed += self._remove(path)
+        return removed
@@ -0,0 +1,371 @@
+import sys
+import os
+import json
+import time
+import heapq
+import random
+import argparse
+import datetime
+import platform
+import subprocess
+
+import numpy as np
+import pyarrow as pa
+
+# [关键修复] 先添加路径
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(CURRENT_DIR)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+if __name__ == "__main__":
+    # 基准测试完全离线运行：模型须已缓存 (FASTEMBED_CACHE_PATH)，不会中途联网下载
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+from skills.knowledge_base.scripts import db_manager, ingest
+from skills.knowledge_base.scripts.chunker import chunk_blocks
+from skills.knowledge_base.scripts.extractors import iter_document_blocks
+from skills.knowledge_base.scripts.metrics import summarize_latencies
+from skills.knowledge_base.scripts.query import search_rows, vector_search, SEARCH_MODES
+from skills.knowledge_base.scripts.vector_precision import decode_vectors, VECTOR_COLUMN, SCALE_COLUMN
+from skills.knowledge_base.scripts.synthetic_corpus import generate_corpus, CORPUS_FORMATS
+
+DEFAULT_SIZES = "1k,100k,1m"
+DEFAULT_QUERIES = 200       # 每个集合的查询数
+DEFAULT_K = 10
+WARMUP_QUERIES = 5          # 预热查询 (打开表、加载索引)，不计入延迟
+QUERY_CHARS = 24            # 查询取自片段正文的一段
+SCAN_BATCH_ROWS = 65536     # 暴力检索按批流式扫描，内存与表大小无关
+STAGES = ("extract", "chunk", "embed", "write", "index")
+RESULTS_VERSION = 1
+
+
+def parse_size(text):
+    """'1k' / '100k' / '1m' / '5000' -> 片段数"""
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000 * 1000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _dir_bytes(path):
+    total = 0
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None, None
+    return commit or None, bool(dirty)
+
+
+def open_bench_db(work_dir, verbose=True):
+    """在 work_dir 下启动独立的 DBManager，不读写 ~/.zx-cli 中的正式知识库"""
+    db_manager.DB_PATH = os.path.join(work_dir, "lancedb_store")
+    db_manager.DOCS_ARCHIVE_PATH = ingest.DOCS_ARCHIVE_PATH = os.path.join(work_dir, "documents")
+    db_manager.DBManager._instance = None
+    return db_manager.DBManager.get_instance(verbose=verbose)
+
+
+class _Stage:
+    """累计各阶段耗时与处理量"""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    def timed(self, stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.seconds[stage] += time.perf_counter() - start
+        return result
+
+
+def ingest_corpus(db, collection, files, write_rows=ingest.WRITE_BATCH_ROWS, samples=DEFAULT_QUERIES, seed=0):
+    """
+    分阶段入库并计时：抽取 -> 切片 -> 向量化 -> 写入，最后同步维护索引。
+    与 IngestPipeline 相同的写入路径 (replace_source_chunks)，但各阶段串行执行，耗时互不重叠；
+    向量化绕过缓存，重复运行测量的仍是推理本身。语料直接作为来源，不做归档。
+    同时水塘抽样 samples 个片段正文作为查询，内存与语料规模无关。
+    """
+    stage, rng = _Stage(), random.Random(seed)
+    pending, sampled = [], []
+    chunks = 0
+
+    def flush():
+        if not pending:
+            return
+        vectors = stage.timed("embed", db.embedding_engine.embed, [r["text"] for r in pending])
+        rows = [{"vector": v, **r} for r, v in zip(pending, vectors)]
+        stage.timed("write", db.replace_source_chunks, collection, rows)
+        pending.clear()
+
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    for path in files:
+        blocks = stage.timed("extract", lambda: list(iter_document_blocks(path)))
+        for chunk in stage.timed("chunk", lambda: list(chunk_blocks(blocks))):
+            row = {"text": chunk["text"], "source": path, "line_range": f"{chunk['line_start']}-{chunk['line_end']}",
+                   "location": chunk["location"], "type": "document",
+                   "chunk_id": ingest.make_chunk_id(path, chunks), "ingested_at": started_at}
+            if len(sampled) < samples:
+                sampled.append(chunk["text"])
+            elif rng.random() < samples / (chunks + 1):
+                sampled[rng.randrange(samples)] = chunk["text"]
+            pending.append(row)
+            chunks += 1
+            if len(pending) >= write_rows:
+                flush()
+    flush()
+    if chunks:
+        stage.timed("index", db.maintain_indexes, collection, False)
+
+    total = sum(stage.seconds.values())
+    report = {name: {"seconds": s, "chunks_per_s": chunks / s if s else 0.0} for name, s in stage.seconds.items()}
+    return {"chunks": chunks, "seconds": total, "chunks_per_s": chunks / total if total else 0.0,
+            "stages": report}, sampled
+
+
+def make_queries(texts, seed=0, chars=QUERY_CHARS):
+    """从片段正文截取一段作为查询 (近似真实用户用原文片段提问)"""
+    rng = random.Random(seed)
+    queries = []
+    for text in texts:
+        flat = " ".join(text.split())
+        start = rng.randrange(max(1, len(flat) - chars))
+        queries.append(flat[start:start + chars])
+    return queries
+
+
+def brute_force_topk(tbl, query_vecs, k):
+    """
+    真值：对全表向量做精确 L2 检索 (按批流式扫描，每个查询维护大小为 k 的堆)，
+    返回每个查询的 chunk_id 集合。不经过 ANN 索引，与表的存储精度无关。
+    """
+    queries = np.asarray(query_vecs, dtype=np.float32)
+    heaps = [[] for _ in queries]
+    columns = [c for c in ("chunk_id", VECTOR_COLUMN, SCALE_COLUMN) if c in tbl.schema.names]
+    for batch in tbl.search().select(columns).limit(None).to_batches(SCAN_BATCH_ROWS):
+        table = pa.Table.from_batches([batch])
+        if table.num_rows == 0:
+            continue
+        matrix = decode_vectors(table)
+        ids = table.column("chunk_id").to_pylist()
+        dists = (queries ** 2).sum(1)[:, None] + (matrix ** 2).sum(1)[None, :] - 2 * queries @ matrix.T
+        top = np.argpartition(dists, min(k, len(ids) - 1), axis=1)[:, :k]
+        for qi, heap in enumerate(heaps):
+            for i in top[qi]:
+                item = (-float(dists[qi, i]), ids[i])
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+    return [{chunk_id for _, chunk_id in heap} for heap in heaps]
+
+
+def measure_queries(db, tbl, queries, k=DEFAULT_K, modes=SEARCH_MODES):
+    """
+    查询向量化与各检索模式的延迟 (ms, 均值/p50/p95/p99)，以及向量检索相对暴力检索的 recall@k。
+    查询向量预先算好，检索延迟不含向量化；向量化单独计时 (绕过缓存)。
+    """
+    report = {"queries": len(queries), "k": k}
+    if not queries:
+        return report
+    embed_ms, query_vecs = [], []
+    for q in queries[:WARMUP_QUERIES]:
+        db.embedding_engine.embed([q])
+    for q in queries:
+        start = time.perf_counter()
+        query_vecs.append(db.embedding_engine.embed([q])[0])
+        embed_ms.append((time.perf_counter() - start) * 1000)
+    report["embed"] = summarize_latencies(embed_ms)
+
+    for mode in modes:
+        for q, vec in list(zip(queries, query_vecs))[:WARMUP_QUERIES]:
+            search_rows(db, tbl, q, k, mode, query_vec=vec)
+        latencies = []
+        for q, vec in zip(queries, query_vecs):
+            start = time.perf_counter()
+            search_rows(db, tbl, q, k, mode, query_vec=vec)
+            latencies.append((time.perf_counter() - start) * 1000)
+        report[mode] = summarize_latencies(latencies)
+
+    truth = brute_force_topk(tbl, query_vecs, k)
+    hits = sum(len(gt & {r["chunk_id"] for r in vector_search(db, tbl, q, k, vec)})
+               for q, vec, gt in zip(queries, query_vecs, truth))
+    report["recall_at_k"] = hits / (sum(len(gt) for gt in truth) or 1)
+    return report
+
+
+def disk_usage(db, collection, corpus_bytes, chunks):
+    table_bytes = _dir_bytes(db.table_path(collection))
+    return {
+        "corpus_bytes": corpus_bytes,
+        "table_bytes": table_bytes,
+        "meta_bytes": os.path.getsize(db.meta.path) if os.path.exists(db.meta.path) else 0,
+        "bytes_per_chunk": table_bytes / chunks if chunks else 0.0,
+    }
+
+
+def run_one(db, work_dir, fmt, target, queries=DEFAULT_QUERIES, k=DEFAULT_K, seed=0, verbose=True):
+    """单个 (格式, 规模) 组合：生成/复用语料 -> 分阶段入库 -> 查询延迟与召回 -> 磁盘占用"""
+    corpus_dir = os.path.join(work_dir, "corpus", f"{fmt}-{target}")
+    start = time.perf_counter()
+    files = generate_corpus(corpus_dir, fmt, target, seed)
+    generate_seconds = time.perf_counter() - start
+    corpus_bytes = sum(os.path.getsize(f) for f in files)
+    collection = f"bench_{fmt}_{target}"
+    db.reset_table(collection)
+    if verbose:
+        print(f"⏱️ [Bench] {fmt} × {target}: {len(files)} files, ingesting into '{collection}'...")
+
+    ingest_report, sampled = ingest_corpus(db, collection, files, samples=queries, seed=seed)
+    tbl = db.get_table(collection)
+    query_report = measure_queries(db, tbl, make_queries(sampled, seed), k) if tbl is not None else {}
+    run = {
+        "format": fmt,
+        "target_chunks": target,
+        "files": len(files),
+        "chunks": ingest_report["chunks"],
+        "generate_seconds": generate_seconds,
+        "ingest": ingest_report,
+        "query": query_report,
+        "disk": disk_usage(db, collection, corpus_bytes, ingest_report["chunks"]),
+    }
+    if verbose:
+        print(format_run(run))
+    return run
+
+
+def run_benchmark(db, work_dir, formats=CORPUS_FORMATS, sizes=(1000,), queries=DEFAULT_QUERIES, k=DEFAULT_K,
+                  seed=0, verbose=True):
+    """全部组合的结果 (JSON 可序列化)，meta 中记录提交、机器与模型，便于跨提交对比"""
+    commit, dirty = _git_commit()
+    meta = {
+        "version": RESULTS_VERSION,
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "embedding": db.embedding_engine.describe(),
+        "settings": {"queries": queries, "k": k, "seed": seed, "write_batch_rows": ingest.WRITE_BATCH_ROWS},
+    }
+    runs = [run_one(db, work_dir, fmt, size, queries, k, seed, verbose) for size in sizes for fmt in formats]
+    return {"meta": meta, "runs": runs}
+
+
+def format_run(run):
+    ing, q, disk = run["ingest"], run["query"], run["disk"]
+    lines = [f"📊 {run['format']} × {run['target_chunks']}: {run['chunks']} chunks from {run['files']} files, "
+             f"{ing['chunks_per_s']:.0f} chunks/s overall"]
+    lines.append("   ingest: " + ", ".join(f"{s} {v['seconds']:.2f}s ({v['chunks_per_s']:.0f}/s)"
+                                          for s, v in ing["stages"].items()))
+    for mode in ("embed",) + SEARCH_MODES:
+        if mode in q:
+            lat = q[mode]
+            lines.append(f"   {mode:<8} p50 {lat['p50_ms']:.1f}ms | p95 {lat['p95_ms']:.1f}ms | p99 {lat['p99_ms']:.1f}ms")
+    if "recall_at_k" in q:
+        lines.append(f"   recall@{q['k']} (vs brute force): {q['recall_at_k']:.3f}")
+    lines.append(f"   disk: table {disk['table_bytes'] / 1024 / 1024:.1f}MB "
+                 f"({disk['bytes_per_chunk']:.0f} B/chunk), corpus {disk['corpus_bytes'] / 1024 / 1024:.1f}MB")
+    return "\n".join(lines)
+
+
+# 对比的指标：(名称, 取值路径, 越大越好)
+COMPARE_METRICS = (
+    [("ingest chunks/s", ("ingest", "chunks_per_s"), True)]
+    + [(f"{s} chunks/s", ("ingest", "stages", s, "chunks_per_s"), True) for s in STAGES]
+    + [(f"{m} {p}", ("query", m, f"{p}_ms"), False) for m in ("embed",) + SEARCH_MODES for p in ("p50", "p95", "p99")]
+    + [("recall@k", ("query", "recall_at_k"), True), ("table bytes", ("disk", "table_bytes"), False)]
+)
+
+
+def _lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def compare(base, current):
+    """
+    两份结果按 (格式, 规模) 对齐，逐项计算变化：
+    返回 [{format, target_chunks, metric, base, current, change, better}]，change 为相对变化比例。
+    """
+    base_runs = {(r["format"], r["target_chunks"]): r for r in base.get("runs", [])}
+    rows = []
+    for run in current.get("runs", []):
+        key = (run["format"], run["target_chunks"])
+        if key not in base_runs:
+            continue
+        for name, path, higher_is_better in COMPARE_METRICS:
+            old, new = _lookup(base_runs[key], path), _lookup(run, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            rows.append({"format": key[0], "target_chunks": key[1], "metric": name, "base": old,
+                         "current": new, "change": change,
+                         "better": change == 0 or (change > 0) == higher_is_better})
+    return rows
+
+
+def format_compare(rows, base_meta=None, current_meta=None):
+    if not rows:
+        return "没有可对比的 (格式, 规模) 组合。"
+    commits = ""
+    if base_meta and current_meta:
+        commits = f" ({(base_meta.get('commit') or '?')[:10]} -> {(current_meta.get('commit') or '?')[:10]})"
+    lines = [f"--- 基准对比{commits} ---"]
+    for r in rows:
+        mark = "✅" if r["better"] else "⚠️"
+        lines.append(f"{mark} {r['format']} × {r['target_chunks']} {r['metric']:<22} "
+                     f"{r['base']:.4g} -> {r['current']:.4g} ({r['change']:+.1%})")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Knowledge base benchmark: ingest throughput, query latency, recall, disk")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="语料规模 (片段数)，逗号分隔，如 1k,100k,1m")
+    parser.add_argument("--formats", default=",".join(CORPUS_FORMATS), help="语料格式，逗号分隔")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="每个集合的查询数")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="top-k (recall@k)")
+    parser.add_argument("--seed", type=int, default=0, help="语料与查询的随机种子")
+    parser.add_argument("--work-dir", default=os.path.expanduser("~/.zx-cli/bench"),
+                        help="工作目录 (语料缓存与独立的向量库)")
+    parser.add_argument("--out", default=None, help="结果 JSON 路径 (默认 <work-dir>/results-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="与之前的结果 JSON 对比")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in CORPUS_FORMATS]
+    if unknown:
+        parser.error(f"不支持的语料格式: {', '.join(unknown)}")
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    db = open_bench_db(args.work_dir)
+    results = run_benchmark(db, args.work_dir, formats, sizes, args.queries, args.k, args.seed)
+    out = args.out or os.path.join(args.work_dir, f"results-{(results['meta']['commit'] or 'unknown')[:10]}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 Results written to {out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        print(format_compare(compare(base, results), base.get("meta"), results["meta"]))
+    return results
+
+
+if __name__ == "__main__":
+    main()
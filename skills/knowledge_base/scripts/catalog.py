@@ -0,0 +1,175 @@
+import os
+import datetime
+from collections import defaultdict
+
+import pyarrow.compute as pc
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS source_catalog (
+    collection   TEXT NOT NULL,
+    source       TEXT NOT NULL,
+    name         TEXT NOT NULL,
+    chunks       INTEGER NOT NULL,
+    bytes        INTEGER NOT NULL,
+    content_hash TEXT,
+    ingested_at  TEXT NOT NULL,
+    PRIMARY KEY (collection, source)
+);
+CREATE INDEX IF NOT EXISTS idx_catalog_name ON source_catalog (collection, name);
+CREATE TABLE IF NOT EXISTS source_catalog_state (
+    collection TEXT PRIMARY KEY,
+    built_at   TEXT NOT NULL
+);
+"""
+
+SCAN_BATCH_ROWS = 8192
+LIST_PAGE_ROWS = 1000    # 清单分页读取的行数
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def summarize_rows(rows):
+    """按来源汇总待写入的片段: {source: (片段数, 正文字节数)}"""
+    stats = defaultdict(lambda: [0, 0])
+    for row in rows:
+        item = stats[row["source"]]
+        item[0] += 1
+        item[1] += len(row.get("text", "").encode("utf-8"))
+    return {source: tuple(v) for source, v in stats.items()}
+
+
+class SourceCatalog:
+    """
+    来源目录：每个集合下每个源文件的片段数、正文字节数、入库时间与内容哈希。
+    随写入/删除增量维护，list / delete 只读这张小表，与向量库的总行数无关。
+    """
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.meta.ensure_schema(_DDL)
+
+    def is_built(self, collection):
+        return self.meta.query_one(
+            "SELECT 1 FROM source_catalog_state WHERE collection = ?", (collection,)
+        ) is not None
+
+    def mark_built(self, collection):
+        self.meta.execute(
+            "INSERT OR REPLACE INTO source_catalog_state (collection, built_at) VALUES (?, ?)", (collection, _now())
+        )
+
+    def apply_write(self, collection, rows, stale_sources=(), hashes=None):
+        """
+        记录一次写入：rows 中出现的来源整体替换为新的统计，
+        stale_sources 中未再出现的来源被移除 (与 merge_insert 的原子替换语义一致)。
+        """
+        hashes = hashes or {}
+        stats = summarize_rows(rows)
+        now = _now()
+        with self.meta.transaction() as conn:
+            for source in stale_sources:
+                if source not in stats:
+                    conn.execute("DELETE FROM source_catalog WHERE collection = ? AND source = ?", (collection, source))
+            conn.executemany(
+                "INSERT OR REPLACE INTO source_catalog "
+                "(collection, source, name, chunks, bytes, content_hash, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(collection, source, os.path.basename(source), chunks, size, hashes.get(source), now)
+                 for source, (chunks, size) in stats.items()],
+            )
+
+    def apply_append(self, collection, rows):
+        """记录一次追加写入：累加来源的片段数与字节数 (来源不存在时新建)。"""
+        now = _now()
+        self.meta.executemany(
+            "INSERT INTO source_catalog (collection, source, name, chunks, bytes, content_hash, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, NULL, ?) ON CONFLICT (collection, source) DO UPDATE SET "
+            "chunks = chunks + excluded.chunks, bytes = bytes + excluded.bytes, ingested_at = excluded.ingested_at",
+            [(collection, source, os.path.basename(source), chunks, size, now)
+             for source, (chunks, size) in summarize_rows(rows).items()],
+        )
+
+    def remove_source(self, collection, source):
+        return self.meta.execute(
+            "DELETE FROM source_catalog WHERE collection = ? AND source = ?", (collection, source)
+        )
+
+    def clear(self, collection):
+        """表被删除或重建时调用；重建后的空表直接视为已建好目录。"""
+        with self.meta.transaction() as conn:
+            conn.execute("DELETE FROM source_catalog WHERE collection = ?", (collection,))
+            conn.execute("DELETE FROM source_catalog_state WHERE collection = ?", (collection,))
+
+    def get(self, collection, source):
+        row = self.meta.query_one(
+            "SELECT * FROM source_catalog WHERE collection = ? AND source = ?", (collection, source)
+        )
+        return dict(row) if row else None
+
+    def find_by_name(self, collection, name):
+        """按文件名 (basename) 查找来源，走 name 索引。"""
+        rows = self.meta.query(
+            "SELECT source FROM source_catalog WHERE collection = ? AND name = ? ORDER BY source", (collection, name)
+        )
+        return [r["source"] for r in rows]
+
+    def collections_for_source(self, source):
+        """引用同一来源的所有集合 (同一归档文件可入库到多个集合)"""
+        rows = self.meta.query("SELECT collection FROM source_catalog WHERE source = ?", (source,))
+        return [r["collection"] for r in rows]
+
+    def entries(self, collection):
+        return list(self.iter_entries(collection))
+
+    def iter_entries(self, collection, page_size=LIST_PAGE_ROWS):
+        """按来源顺序分页流式读取 (键集分页，每页一次短查询)，大集合的清单不必一次装入内存"""
+        last = ""
+        while True:
+            rows = self.meta.query(
+                "SELECT * FROM source_catalog WHERE collection = ? AND source > ? ORDER BY source LIMIT ?",
+                (collection, last, page_size),
+            )
+            for row in rows:
+                yield dict(row)
+            if len(rows) < page_size:
+                return
+            last = rows[-1]["source"]
+
+    def counts(self, collection):
+        # 只读取需要的两列
+        rows = self.meta.query("SELECT source, chunks FROM source_catalog WHERE collection = ?", (collection,))
+        return {r["source"]: r["chunks"] for r in rows}
+
+    def rebuild(self, collection, tbl, hashes=None, refs=()):
+        """
+        从向量表全量重建目录 (升级前已有数据的表只需执行一次)。
+        按批流式读取 source/text 两列，不受行数上限限制；refs 为近重复引用行 (不在向量表中，同样计入片段数)。
+        """
+        hashes = hashes or {}
+        stats = defaultdict(lambda: [0, 0])
+        for ref in refs:
+            item = stats[ref["source"]]
+            item[0] += 1
+            item[1] += len(ref["text"].encode("utf-8"))
+        reader = tbl.search().select(["source", "text"]).limit(None).to_batches(SCAN_BATCH_ROWS)
+        for batch in reader:
+            sources = batch.column("source").to_pylist()
+            sizes = pc.binary_length(pc.cast(batch.column("text"), "binary")).to_pylist()
+            for source, size in zip(sources, sizes):
+                item = stats[source]
+                item[0] += 1
+                item[1] += size or 0
+        now = _now()
+        with self.meta.transaction() as conn:
+            conn.execute("DELETE FROM source_catalog WHERE collection = ?", (collection,))
+            conn.executemany(
+                "INSERT INTO source_catalog "
+                "(collection, source, name, chunks, bytes, content_hash, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(collection, source, os.path.basename(source), chunks, size, hashes.get(source), now)
+                 for source, (chunks, size) in stats.items()],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO source_catalog_state (collection, built_at) VALUES (?, ?)", (collection, now)
+            )
+        return len(stats)
@@ -0,0 +1,299 @@
+import re
+
+import numpy as np
+
+from skills.knowledge_base.scripts.extractors import UNKNOWN_LOCATION, iter_document_blocks
+from skills.knowledge_base.scripts import evaluation
+
+# 切片参数 (按嵌入模型的 token 估算；bge-small-zh 输入上限 512，含特殊符号)
+CHUNK_TARGET_TOKENS = 256    # 达到该长度后在下一个段落边界切分
+CHUNK_MAX_TOKENS = 480       # 硬上限：超过会被模型截断，必须在此之前切分
+CHUNK_OVERLAP_TOKENS = 48    # 只有段落中途被硬上限切断时，下一片才带上这么多 token 的上文
+CHUNK_MIN_TOKENS = 96        # 短于该长度的标题小节并入下一小节，避免只有标题或一两行的碎片
+
+CHUNKER_VERSION = f"structured-{CHUNK_TARGET_TOKENS}-{CHUNK_MAX_TOKENS}-{CHUNK_OVERLAP_TOKENS}"
+
+# 中日韩字符逐字成词；字母/数字串按子词估算；其余非空白符号各算一个
+_TOKEN_RE = re.compile(r"[㐀-鿿豈-﫿]|[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(\S.*)$")
+
+
+def estimate_tokens(text):
+    """
+    估算 WordPiece token 数 (不加载分词器，可在解析进程中使用)。
+    偏保守：英文约 3 字母一个子词，数字约 2 位一个。
+    """
+    count = 0
+    for match in _TOKEN_RE.finditer(text):
+        piece = match.group()
+        if len(piece) == 1:
+            count += 1
+        elif piece.isdigit():
+            count += (len(piece) + 1) // 2
+        else:
+            count += (len(piece) + 2) // 3
+    return count
+
+
+def _split_long_line(line, max_tokens):
+    """单行超过硬上限时按 token 估算切成若干段。"""
+    pieces, start, tokens = [], 0, 0
+    for match in _TOKEN_RE.finditer(line):
+        t = estimate_tokens(match.group())
+        if tokens + t > max_tokens and match.start() > start:
+            pieces.append(line[start:match.start()])
+            start, tokens = match.start(), 0
+        tokens += t
+    pieces.append(line[start:])
+    return [p.strip() for p in pieces if p.strip()]
+
+
+def chunk_blocks(blocks, target_tokens=CHUNK_TARGET_TOKENS, max_tokens=CHUNK_MAX_TOKENS,
+                 overlap_tokens=CHUNK_OVERLAP_TOKENS, min_tokens=CHUNK_MIN_TOKENS):
+    """
+    结构感知切片：消费 TextBlock 流，按位置与标题分节，按 token 预算切片。
+    - 页 / 幻灯片 / 工作表变化时必然切分，一个片段不跨页；Markdown 标题处切分，过短的小节并入下一小节
+    - 片段达到 target_tokens 后在段落边界 (空行) 切分，任何情况下不超过 max_tokens
+    - 只有被硬上限切断的段落才带 overlap_tokens 的上文；同一小节的后续片段以小节标题开头补充上下文
+    纯文本/Markdown 没有位置信息时，以最近的标题作为位置 (Section: 标题)。
+    """
+    lines = []           # 当前片段: [(line_no, line, tokens)]
+    used = 0             # 当前片段 token 数 (含标题前缀)
+    location = None      # 当前片段的位置 (片段开始处所在的位置/小节)
+    loc = None           # 当前行所在的位置/小节
+    block_location = None
+    heading = None       # 当前小节标题行，续写片段以它开头
+    prefix = None        # 当前片段的标题前缀 (片段不是从标题开始时)
+    section = None       # 无位置文档的 Markdown 小节
+    line_no = 0
+
+    def _emit():
+        content = "\n".join(l for _, l, _ in lines).strip()
+        if not content:
+            return None
+        return {
+            "text": f"{prefix}\n{content}" if prefix else content,
+            "line_start": lines[0][0],
+            "line_end": lines[-1][0],
+            "location": location,
+        }
+
+    def _start(carry=()):
+        """开始新片段：续写同一小节时带上标题前缀与重叠行。"""
+        nonlocal lines, used, prefix, location
+        location = loc
+        prefix = heading if heading and not (carry and carry[0][1] == heading) else None
+        lines = list(carry)
+        used = sum(t for _, _, t in lines) + (estimate_tokens(prefix) if prefix else 0)
+
+    def _overlap():
+        tail, size = [], 0
+        for item in reversed(lines):
+            if size + item[2] > overlap_tokens or not item[1].strip():
+                break
+            tail.insert(0, item)
+            size += item[2]
+        return tail
+
+    for block in blocks:
+        for line in block.text.splitlines():
+            line_no += 1
+            match = _HEADING_RE.match(line.strip())
+            if block.location != UNKNOWN_LOCATION:
+                section = None
+            elif match:
+                section = f"Section: {match.group(2).strip()}"
+            previous, loc = loc, block.location if block.location != UNKNOWN_LOCATION else (section or UNKNOWN_LOCATION)
+
+            moved = block.location != block_location   # 页/幻灯片/工作表变化
+            block_location = block.location
+            if moved or loc != previous or match:
+                # 页等位置变化必然切分；过短的标题小节 (如只有文档标题) 并入下一小节
+                if lines and (moved or used >= min_tokens):
+                    chunk = _emit()
+                    if chunk: yield chunk
+                    lines = []
+                if not lines:
+                    prefix, used = None, 0
+                if moved:
+                    heading = None
+                if match:
+                    heading = line.strip()
+
+            tokens = estimate_tokens(line)
+            if tokens > max_tokens:
+                # 超长单行：先结束当前片段，再按硬上限切开，最后一段留作新片段的开头
+                if lines:
+                    chunk = _emit()
+                    if chunk: yield chunk
+                pieces = _split_long_line(line, max_tokens)
+                for piece in pieces[:-1]:
+                    yield {"text": piece, "line_start": line_no, "line_end": line_no, "location": loc}
+                line = pieces[-1] if pieces else ""
+                tokens = estimate_tokens(line)
+                _start()
+            elif used + tokens > max_tokens:
+                # 段落中途被硬上限切断：带上重叠的上文
+                chunk = _emit()
+                carry = _overlap()
+                if chunk: yield chunk
+                _start(carry)
+                if used + tokens > max_tokens:
+                    _start()
+
+            if not lines and not line.strip():
+                continue
+            if not lines:
+                location = loc
+            lines.append((line_no, line, tokens))
+            used += tokens
+            if used >= target_tokens and not line.strip():
+                # 达到目标长度后在段落边界切分，不需要重叠
+                chunk = _emit()
+                if chunk: yield chunk
+                _start()
+
+    if lines:
+        chunk = _emit()
+        if chunk: yield chunk
+
+
+def chunk_text_by_lines(text, chunk_size=20, overlap=5):
+    """
+    旧版切片 (固定 20 行窗口，重叠 5 行)，保留用于对比报告。
+    按行切分文本，并尝试提取语义化的位置信息（如 Slide 1, Page 2, Sheet Name）。
+    返回: List[dict] -> [{'text': '...', 'lines': '10-30', 'location': 'Slide 5'}]
+    """
+    lines = text.splitlines()
+    chunks = []
+    total_lines = len(lines)
+
+    # 预扫描：建立行号到位置的映射
+    line_location_map = {}
+    current_location = "Unknown Location"
+
+    # 匹配模式: --- Slide 1 ---, --- Page 1 ---, --- Sheet: Sheet1 ---
+    loc_pattern = re.compile(r'^--- (Slide \d+|Page \d+|Sheet: .+) ---$')
+
+    for i, line in enumerate(lines):
+        match = loc_pattern.match(line.strip())
+        if match:
+            current_location = match.group(1)
+        line_location_map[i] = current_location
+
+    for i in range(0, total_lines, chunk_size - overlap):
+        end = min(i + chunk_size, total_lines)
+        chunk_lines = lines[i:end]
+        chunk_content = "\n".join(chunk_lines).strip()
+
+        if not chunk_content: continue
+
+        start_loc = line_location_map.get(i, "Unknown")
+        end_loc = line_location_map.get(end-1, "Unknown")
+
+        if start_loc == end_loc:
+            location = start_loc
+        else:
+            location = f"{start_loc} -> {end_loc}"
+
+        chunks.append({
+            "text": chunk_content,
+            "line_start": i + 1,
+            "line_end": end,
+            "location": location
+        })
+
+        if end == total_lines: break
+
+    return chunks
+
+
+def chunk_blocks_by_lines(blocks, chunk_size=20, overlap=5):
+    """
+    旧版流式切片 (chunk_text_by_lines 的流式实现)，保留用于对比报告。
+    消费 TextBlock 流，按行滑动窗口切片，内存中只保留一个窗口的行。
+    """
+    step = chunk_size - overlap
+    window = []          # [(line_no, location, line)]
+    line_no = 0
+    emitted_upto = 0     # 已输出到的最大行号
+
+    def _make_chunk(lines):
+        content = "\n".join(l for _, _, l in lines).strip()
+        if not content:
+            return None
+        start_loc, end_loc = lines[0][1], lines[-1][1]
+        return {
+            "text": content,
+            "line_start": lines[0][0],
+            "line_end": lines[-1][0],
+            "location": start_loc if start_loc == end_loc else f"{start_loc} -> {end_loc}"
+        }
+
+    for block in blocks:
+        for line in block.text.splitlines():
+            line_no += 1
+            window.append((line_no, block.location, line))
+            if len(window) == chunk_size:
+                chunk = _make_chunk(window)
+                emitted_upto = line_no
+                if chunk: yield chunk
+                del window[:step]
+
+    # 尾部：还有未输出过的行才补最后一个窗口
+    if window and window[-1][0] > emitted_upto:
+        chunk = _make_chunk(window)
+        if chunk: yield chunk
+
+
+# 对比报告中的切片策略
+CHUNKERS = {
+    "lines-20-5": chunk_blocks_by_lines,
+    "structured": chunk_blocks,
+}
+
+
+def _chunk_stats(docs, chunker):
+    """docs: {path: [TextBlock]} -> (统计, 全部片段行)"""
+    rows, tokens, source_chars, chunk_chars = [], [], 0, 0
+    for path, blocks in docs.items():
+        source_chars += sum(len(b.text) for b in blocks)
+        for chunk in chunker(blocks):
+            rows.append({"text": chunk["text"], "source": path, "location": chunk["location"]})
+            tokens.append(estimate_tokens(chunk["text"]))
+            chunk_chars += len(chunk["text"])
+    n = len(rows) or 1
+    return {
+        "docs": len(docs),
+        "chunks": len(rows),
+        "chunks_per_doc": len(rows) / (len(docs) or 1),
+        "avg_tokens": sum(tokens) / n,
+        "max_tokens": max(tokens, default=0),
+        "over_limit": sum(t > CHUNK_MAX_TOKENS for t in tokens),
+        "cross_location": sum("->" in r["location"] for r in rows),
+        "redundancy": chunk_chars / (source_chars or 1) - 1,   # 重复向量化的文本比例
+    }, rows
+
+
+def compare_chunkers(paths, cases=None, embed_fn=None, k=5):
+    """
+    用同一批文档对比各切片策略：片段数/文档、token 分布、超过模型上限的片段、
+    跨位置片段与重复向量化比例；给出评测集与 embed_fn 时，另在内存中暴力检索计算 hit@k / MRR。
+    返回 {策略名: 统计}。
+    """
+    docs = {path: list(iter_document_blocks(path)) for path in paths}
+    report = {}
+    for name, chunker in CHUNKERS.items():
+        stats, rows = _chunk_stats(docs, chunker)
+        if cases and embed_fn and rows:
+            matrix = np.asarray(embed_fn([r["text"] for r in rows]), dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+
+            def _search(query, n, matrix=matrix, rows=rows):
+                q = np.asarray(embed_fn([query])[0], dtype=np.float32)
+                order = np.argsort(-(matrix @ (q / (np.linalg.norm(q) + 1e-12))))[:n]
+                return [rows[i] for i in order]
+
+            stats["eval"] = evaluation.evaluate(cases, _search, k)
+        report[name] = stats
+    return report
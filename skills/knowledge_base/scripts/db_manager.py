@@ -1,115 +1,336 @@
 import os
+import threading
+from datetime import timedelta
+
 import lancedb
 from fastembed import TextEmbedding
 
+from skills.knowledge_base.scripts.meta_store import MetaStore
+from skills.knowledge_base.scripts.manifest import IngestManifest
+from skills.knowledge_base.scripts.catalog import SourceCatalog
+from skills.knowledge_base.scripts.dedup import ChunkDedup, PendingIndex, simhash
+from skills.knowledge_base.scripts.filters import sql_literal
+from skills.knowledge_base.scripts import vector_precision
+from skills.knowledge_base.scripts import schema_migrations
+from skills.knowledge_base.scripts.index_manager import IndexMaintainer
+from skills.knowledge_base.scripts.embedding_cache import EmbeddingCache, CACHE_ENABLED
+from skills.knowledge_base.scripts.result_cache import ResultCache, RESULT_CACHE_ENABLED
+from skills.knowledge_base.scripts import embedding_engine
+from skills.knowledge_base.scripts.archive_store import ArchiveStore
+
 # 配置常量
 # [修正] 使用 .zx-cli 作为用户数据目录
 BASE_DIR = os.path.expanduser("~/.zx-cli")
 DB_PATH = os.path.join(BASE_DIR, "memory/lancedb_store")
-DOCS_ARCHIVE_PATH = os.path.join(BASE_DIR, "documents") # 影子文档库
+DOCS_ARCHIVE_PATH = os.path.join(BASE_DIR, "documents") # 影子文档库 (按内容哈希分片存放，见 archive_store)
 
-EMBEDDING_MODEL_NAME = "BAAI/bge-small-zh-v1.5" # 优秀的中文模型，体积适中
+EMBEDDING_MODEL_NAME = embedding_engine.EMBED_MODEL # 默认 BAAI/bge-small-zh-v1.5，ZX_KB_EMBED_MODEL 覆盖
+META_DB_NAME = "kb_meta.sqlite3" # 清单等元数据，与向量库放在同一目录下
+
+# 常驻进程内表句柄会被长期复用，0 表示每次读取前都确认最新版本，
+# 保证其他进程 (如 ingest.py) 的写入能被立即看到
+READ_CONSISTENCY_INTERVAL = timedelta(seconds=0)
 
 class DBManager:
     _instance = None
+    _instance_lock = threading.Lock()
     
-    def __init__(self):
+    def __init__(self, verbose=True):
         # 确保目录存在
         for path in [DB_PATH, DOCS_ARCHIVE_PATH]:
             if not os.path.exists(path):
                 os.makedirs(path, exist_ok=True)
             
-        self.db = lancedb.connect(DB_PATH)
+        self.db_path = DB_PATH
+        self.db = lancedb.connect(DB_PATH, read_consistency_interval=READ_CONSISTENCY_INTERVAL)
+        # 已打开的表句柄缓存，避免每次查询重复 open_table
+        self._tables = {}
+        self._tables_lock = threading.Lock()
+        self.meta = MetaStore(os.path.join(os.path.dirname(DB_PATH), META_DB_NAME))
+        self.manifest = IngestManifest(self.meta)
+        self.catalog = SourceCatalog(self.meta)
+        self.dedup = ChunkDedup(self.meta)
+        self.archive = ArchiveStore(self.meta, DOCS_ARCHIVE_PATH, self.manifest)
+        self.index_maintainer = IndexMaintainer()
         # 初始化 Embedding 模型 (会自动下载)
-        print(f"🔄 [System] Loading Embedding Model: {EMBEDDING_MODEL_NAME}...")
-        self.embedding_model = TextEmbedding(model_name=EMBEDDING_MODEL_NAME)
-        print("✅ Embedding Model Ready.")
+        # 批大小 / ONNX 线程数 / 数据并行进程数见 embedding_engine (ZX_KB_EMBED_*)
+        self.embedding_engine = embedding_engine.EmbeddingEngine(TextEmbedding, EMBEDDING_MODEL_NAME)
+        if verbose: print(f"🔄 [System] Loading Embedding Model: {self.embedding_engine.describe()}...")
+        self.embedding_model = self.embedding_engine.model
+        # 两级向量缓存 (内存 LRU + SQLite)，ZX_KB_EMBED_CACHE=0 关闭
+        self.embedding_cache = EmbeddingCache(self.meta, EMBEDDING_MODEL_NAME) if CACHE_ENABLED else None
+        # 检索结果缓存 (按表版本失效)，ZX_KB_RESULT_CACHE=0 关闭
+        self.result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
+        if verbose: print("✅ Embedding Model Ready.")
 
     @classmethod
-    def get_instance(cls):
+    def get_instance(cls, verbose=True):
+        # 双重检查锁：多个检索线程并发首次访问时只加载一次模型
         if cls._instance is None:
-            cls._instance = DBManager()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = DBManager(verbose=verbose)
         return cls._instance
 
     def get_table(self, table_name="documents"):
         """获取或创建表。Schema: vector, text, source, line_range, metadata"""
         # LanceDB 支持自动 Schema 推断，我们直接用 Pydantic 或者 PyArrow 定义更稳健
         # 但为了简单，我们让它自动推断 (Lazy Mode)
+        tbl = self._tables.get(table_name)
+        if tbl is not None:
+            return tbl
         try:
-            return self.db.open_table(table_name)
+            tbl = self.db.open_table(table_name)
         except:
             # 表不存在，返回 None，由调用方负责 create_table
             return None
+        with self._tables_lock:
+            self._tables[table_name] = tbl
+        return tbl
+
+    def list_tables(self):
+        """列出所有集合名"""
+        names, token = [], None
+        while True:
+            page = self.db.list_tables(page_token=token)
+            names.extend(page.tables)
+            token = page.page_token
+            if not token:
+                return names
+
+    def table_versions(self, table_names):
+        """
+        各表当前版本 {表名: (表标识, 版本号)} (会确认其他进程的最新写入)，不存在的表不出现。
+        带上表标识：删表重建 (含其他进程重建) 后版本号从头开始，不会与旧表的版本号混淆
+        """
+        versions = {}
+        for name in table_names:
+            tbl = self.get_table(name)
+            if tbl is not None:
+                versions[name] = (schema_migrations.table_id(tbl), tbl.version)
+        return versions
+
+    def table_path(self, table_name):
+        """表在磁盘上的目录 (含所有版本的数据文件)"""
+        return os.path.join(self.db_path, f"{table_name}.lance")
+
+    def _forget_table(self, table_name):
+        """表被删除后清理句柄缓存"""
+        with self._tables_lock:
+            self._tables.pop(table_name, None)
+
+    def _forget_results(self, table_name):
+        """表被删除或整表重写后丢弃涉及它的检索结果缓存"""
+        if self.result_cache is not None:
+            self.result_cache.invalidate_table(table_name)
 
     def check_schema_compatibility(self, table_name, sample_data):
-        """检查表结构是否与新数据兼容"""
+        """
+        写入前检查表结构：按版本化迁移原地补列 (保留已有向量)，
+        迁移表之外的新字段补为可空列。结构版本已是最新且无新字段时只读 schema，不扫描数据。
+        """
         tbl = self.get_table(table_name)
         if not tbl: return True
         
         try:
-            # 获取表的第一条数据来看看 keys
-            # LanceDB 0.25+ schema 获取方式
-            schema = tbl.schema
-            existing_fields = set(schema.names)
-            new_fields = set(sample_data.keys())
-            
-            # 检查是否有新字段是旧表没有的
-            missing_in_db = new_fields - existing_fields
-            if missing_in_db:
-                print(f"⚠️ [Schema Warning] Table '{table_name}' is missing fields: {missing_in_db}")
-                print(f"♻️ Auto-migrating: Dropping old table to apply new schema...")
-                self.db.drop_table(table_name)
-                return False # Table dropped, caller should create new
+            self.migrate_table(table_name)
+            added = schema_migrations.add_unknown_fields(tbl, sample_data)
+            if added:
+                print(f"♻️ [Schema] Added nullable columns to '{table_name}': {added}")
             return True
         except Exception as e:
             print(f"Schema check failed: {e}")
             return True # Assume compatible to avoid accidental deletion
 
-    def create_table(self, table_name, data):
-        """创建新表"""
+    def migrate_table(self, table_name):
+        """把表升级到当前结构版本，返回执行的迁移步骤"""
+        tbl = self.get_table(table_name)
+        if tbl is None:
+            return []
+        applied = schema_migrations.migrate(tbl)
+        for version, description, columns in applied:
+            print(f"♻️ [Schema] '{table_name}' v{version} {description}: {columns or 'no new columns'}")
+        return applied
+
+    def create_table(self, table_name, data, hashes=None, precision=None, refs=()):
+        """
+        创建新表 (hashes: {source: 内容哈希}，记入来源目录；refs: 近重复片段的引用行)。
+        precision: 向量存储精度 float32 / float16 / int8，默认取 ZX_KB_VECTOR_PRECISION
+        """
         # data 是一个 list of dict，包含 'vector' 字段和其他字段
         # LanceDB 0.25+ 推荐使用 pydantic mode 或者 pyarrow table
-        # 这里我们使用自动推断模式
-        return self.db.create_table(table_name, data=data)
+        # 向量列按精度显式构造，缺失的可空迁移列建表时补齐
+        precision = vector_precision.check_precision(precision or vector_precision.DEFAULT_PRECISION)
+        table_data = schema_migrations.fill_new_table(vector_precision.rows_to_arrow(data, precision))
+        tbl = self.db.create_table(table_name, data=table_data)
+        # 结构版本之外记录表标识，以及生成向量的模型与维度，换模型后不会把不同向量空间写进同一张表
+        schema_migrations.stamp_version(tbl, extra={**schema_migrations.new_table_id(), **embedding_engine.model_metadata(
+            self.embedding_engine.model_name, len(data[0]["vector"]))})
+        with self._tables_lock:
+            self._tables[table_name] = tbl
+        # 新表的目录从零开始增量维护，无需全表扫描
+        self.catalog.clear(table_name)
+        self.catalog.apply_write(table_name, list(data) + list(refs), hashes=hashes)
+        self.catalog.mark_built(table_name)
+        self.dedup.clear(table_name)
+        self._track_chunks(table_name, data, (), refs)
+        return tbl
+
+    def replace_source_chunks(self, table_name, data, stale_sources=(), hashes=None, refs=()):
+        """
+        写入新片段，并在同一次提交中删除 stale_sources 的旧片段 (原子替换)。
+        依赖 chunk_id 列做 merge_insert，读者不会看到新旧片段并存或全部缺失的中间状态。
+        refs: 近重复片段的引用行 (不写向量，只登记在 chunk_refs 中)。
+        """
+        tbl = self.get_table(table_name)
+        if tbl is None:
+            return self.create_table(table_name, data, hashes, refs=refs)
+        embedding_engine.check_table_model(tbl, table_name, self.embedding_engine.model_name)
+        # 按表的存储精度编码向量 (float16 / int8)，查询时透明处理
+        data = vector_precision.encode_rows(data, vector_precision.table_precision(tbl))
+        if not stale_sources:
+            if data:
+                tbl.add(data)
+        else:
+            predicate = f"source IN ({', '.join(sql_literal(s) for s in stale_sources)})"
+            (tbl.merge_insert("chunk_id")
+                .when_matched_update_all()
+                .when_not_matched_insert_all()
+                .when_not_matched_by_source_delete(predicate)
+                .execute(data))
+        self.catalog.apply_write(table_name, list(data) + list(refs), stale_sources, hashes)
+        self._track_chunks(table_name, data, stale_sources, refs)
+        return tbl
+
+    def append_chunks(self, table_name, data):
+        """
+        追加片段，不替换来源已有的片段 (情景记忆按轮次持续写入同一会话日志)。
+        来源目录累加片段数，片段指纹照常登记。
+        """
+        tbl = self.get_table(table_name)
+        if tbl is None:
+            return self.create_table(table_name, data)
+        if not data:
+            return tbl
+        embedding_engine.check_table_model(tbl, table_name, self.embedding_engine.model_name)
+        self.check_schema_compatibility(table_name, data[0])
+        data = vector_precision.encode_rows(data, vector_precision.table_precision(tbl))
+        tbl.add(data)
+        self.catalog.apply_append(table_name, data)
+        self._track_chunks(table_name, data)
+        return tbl
+
+    def _track_chunks(self, table_name, rows, stale_sources=(), refs=()):
+        """
+        写入后登记片段指纹与去重引用。被替换的旧来源先释放；
+        失去被引用片段的引用 (包括指向写入失败片段的) 重新指向相似片段或提升为独立片段。
+        """
+        orphans = self.dedup.release_sources(table_name, stale_sources)
+        self.dedup.record(table_name, [r for r in rows if r.get("chunk_id")])
+        known = self.dedup.existing(table_name, {r["canonical_id"] for r in refs})
+        self.dedup.record(table_name, [], [r for r in refs if r["canonical_id"] in known])
+        orphans += [r for r in refs if r["canonical_id"] not in known]
+        if orphans:
+            self._resolve_orphans(table_name, orphans)
+        if refs and self.result_cache is not None:
+            # 引用只登记在 SQLite，只写引用时表版本不变，按版本失效的结果缓存需要清空
+            self.result_cache.clear()
+
+    def _resolve_orphans(self, table_name, orphans):
+        pending, repointed, promote = PendingIndex(), [], []
+        for ref in orphans:
+            fp = simhash(ref["text"])
+            match = self.dedup.lookup(table_name, fp, pending=pending)
+            if match:
+                repointed.append({**ref, "canonical_id": match[0], "similarity": match[2]})
+            else:
+                pending.add(ref["chunk_id"], ref["source"], fp)
+                promote.append({k: ref.get(k) for k in ("chunk_id", "source", "text", "line_range",
+                                                        "location", "type", "ingested_at")})
+        if promote:
+            tbl = self.get_table(table_name)
+            vectors = self.embed_documents([r["text"] for r in promote])
+            rows = [{"vector": v, **r} for r, v in zip(promote, vectors)]
+            tbl.add(vector_precision.encode_rows(rows, vector_precision.table_precision(tbl)))
+            self.dedup.record(table_name, rows)
+            print(f"♻️ [Dedup] Promoted {len(rows)} referenced chunks in '{table_name}'")
+        self.dedup.record(table_name, [], repointed)
+
+    def overwrite_table(self, table_name, data):
+        """整表重写为新版本 (精度转换等)，来源目录、清单、结构版本与模型记录不变"""
+        old = self.get_table(table_name)
+        version = schema_migrations.schema_version(old) if old is not None else None
+        model = embedding_engine.model_metadata(*embedding_engine.table_model(old)) if old is not None else {}
+        tbl = self.db.create_table(table_name, data=data, mode="overwrite")
+        schema_migrations.stamp_version(tbl, version, extra={**schema_migrations.new_table_id(), **model})
+        with self._tables_lock:
+            self._tables[table_name] = tbl
+        self._forget_results(table_name)
+        return tbl
+
+    def maintain_indexes(self, table_name, background=True):
+        """写入后调用：按行数阈值建索引，未索引行过多时后台增量重建"""
+        return self.index_maintainer.schedule(self, table_name, background=background)
+
+    def _embed_uncached(self, texts):
+        return self.embedding_engine.embed(texts)
 
     def embed_documents(self, texts: list[str]):
-        """批量计算向量"""
-        # FastEmbed 返回的是 generator，转为 list
-        return list(self.embedding_model.embed(texts))
+        """批量计算向量 (命中缓存的文本跳过推理)"""
+        if self.embedding_cache is None:
+            return self._embed_uncached(texts)
+        return self.embedding_cache.embed(texts, self._embed_uncached)
 
-    def embed_query(self, text: str):
-        """计算查询向量"""
+    def embed_query(self, text: str, use_cache=True):
+        """计算查询向量 (use_cache=False 时跳过向量缓存，真正跑一次推理)"""
         # embed 返回 list of vector，取第一个
-        return list(self.embedding_model.embed([text]))[0]
+        if not use_cache:
+            return self._embed_uncached([text])[0]
+        return self.embed_documents([text])[0]
 
-    def delete_by_source(self, table_name, source_file):
-        """按源文件名删除记录"""
+    def delete_by_source(self, table_name, source_file, keep_archive=False):
+        """按源文件名删除记录，并释放本集合对归档副本的引用 (最后一个引用释放时删除归档文件)"""
         tbl = self.get_table(table_name)
         if not tbl: return False
         # LanceDB 删除语法
-        tbl.delete(f"source = '{source_file}'")
+        tbl.delete(f"source = {sql_literal(source_file)}")
+        self.manifest.remove_source(table_name, source_file)
+        self.catalog.remove_source(table_name, source_file)
+        orphans = self.dedup.release_sources(table_name, [source_file])
+        if orphans:
+            self._resolve_orphans(table_name, orphans)
+        if not keep_archive:
+            # 升级前入库的归档没有引用记录：先按来源目录补登记其他集合的引用，避免误删
+            for other in self.catalog.collections_for_source(source_file):
+                self.archive.acquire(other, source_file)
+            self.archive.release(table_name, source_file)
         return True
 
-    def list_sources(self, table_name):
-        """列出所有源文件及其片段数"""
+    def ensure_catalog(self, table_name, refresh=False):
+        """
+        确保来源目录可用。升级前已存在的表 (或 refresh=True) 全量扫描重建一次，
+        之后随写入/删除增量维护。表不存在时返回 False。
+        """
         tbl = self.get_table(table_name)
-        if not tbl: return {}
-        
-        try:
-            # 使用 to_list() 获取数据，避免 pandas 依赖
-            # limit 设大一点以获取所有记录 (LanceDB 目前没有 select distinct count)
-            # 或者更好的做法是 iter batches，但为了简单先 limit
-            results = tbl.search().select(["source"]).limit(10000).to_list()
-            
-            from collections import Counter
-            sources = [r['source'] for r in results]
-            return dict(Counter(sources))
-        except Exception as e:
-            print(f"Error listing sources: {e}")
-            return {}
+        if not tbl: return False
+        if refresh or not self.catalog.is_built(table_name):
+            hashes = {e.source: e.content_hash for e in self.manifest.entries(table_name)}
+            self.catalog.rebuild(table_name, tbl, hashes, refs=self.dedup.refs(table_name))
+        return True
+
+    def list_sources(self, table_name):
+        """列出所有源文件及其片段数 (读取来源目录，与总行数无关)"""
+        if not self.ensure_catalog(table_name): return {}
+        return self.catalog.counts(table_name)
 
     def reset_table(self, table_name):
         """删除整个表"""
+        self._forget_table(table_name)
+        self._forget_results(table_name)
+        self.manifest.clear(table_name)
+        self.catalog.clear(table_name)
+        self.dedup.clear(table_name)
+        self.archive.release_collection(table_name)
         try:
             self.db.drop_table(table_name)
             return True
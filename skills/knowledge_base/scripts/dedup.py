@@ -0,0 +1,239 @@
+import os
+import hashlib
+from functools import lru_cache
+from collections import defaultdict
+
+import numpy as np
+
+from skills.knowledge_base.scripts.embedding_cache import normalize_text
+
+# 近重复片段抑制配置 (均可通过环境变量覆盖)
+DEDUP_ENABLED = os.environ.get("ZX_KB_DEDUP", "1") != "0"
+# SimHash 相似度阈值 = 1 - 汉明距离 / 64；默认 0.95 即最多 3 位不同
+DEDUP_THRESHOLD = float(os.environ.get("ZX_KB_DEDUP_THRESHOLD", "0.95"))
+SHINGLE_SIZE = 3             # 字符 n-gram，中英文通用
+BANDS = 4                    # 64 位指纹切成 4 段 x 16 位作为候选索引：距离 <= 3 时至少一段完全相同
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS chunk_fingerprints (
+    collection TEXT NOT NULL,
+    chunk_id   TEXT NOT NULL,
+    source     TEXT NOT NULL,
+    simhash    INTEGER NOT NULL,
+    b0 INTEGER NOT NULL, b1 INTEGER NOT NULL, b2 INTEGER NOT NULL, b3 INTEGER NOT NULL,
+    PRIMARY KEY (collection, chunk_id)
+);
+CREATE INDEX IF NOT EXISTS idx_fp_source ON chunk_fingerprints (collection, source);
+CREATE INDEX IF NOT EXISTS idx_fp_b0 ON chunk_fingerprints (collection, b0);
+CREATE INDEX IF NOT EXISTS idx_fp_b1 ON chunk_fingerprints (collection, b1);
+CREATE INDEX IF NOT EXISTS idx_fp_b2 ON chunk_fingerprints (collection, b2);
+CREATE INDEX IF NOT EXISTS idx_fp_b3 ON chunk_fingerprints (collection, b3);
+CREATE TABLE IF NOT EXISTS chunk_refs (
+    collection   TEXT NOT NULL,
+    chunk_id     TEXT NOT NULL,
+    source       TEXT NOT NULL,
+    canonical_id TEXT NOT NULL,
+    similarity   REAL NOT NULL,
+    text         TEXT NOT NULL,
+    line_range   TEXT,
+    location     TEXT,
+    type         TEXT,
+    ingested_at  TEXT,
+    PRIMARY KEY (collection, chunk_id)
+);
+CREATE INDEX IF NOT EXISTS idx_refs_source ON chunk_refs (collection, source);
+CREATE INDEX IF NOT EXISTS idx_refs_canonical ON chunk_refs (collection, canonical_id);
+"""
+
+REF_FIELDS = ("chunk_id", "source", "text", "line_range", "location", "type", "ingested_at")
+
+
+@lru_cache(maxsize=8192)
+def simhash(text):
+    """
+    64 位 SimHash：规范化文本的字符 3-gram 逐位加权投票 (numpy 向量化)。
+    入库时查重与写入后登记各算一次，缓存最近的结果。
+    """
+    text = normalize_text(text)
+    if len(text) <= SHINGLE_SIZE:
+        shingles = [text]
+    else:
+        shingles = [text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)]
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, 64)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+def similarity(a, b):
+    return 1 - bin(a ^ b).count("1") / 64
+
+
+def _bands(fp):
+    return [(fp >> (16 * i)) & 0xFFFF for i in range(BANDS)]
+
+
+def _to_sql(fp):
+    """SQLite INTEGER 为有符号 64 位"""
+    return fp - (1 << 64) if fp >= 1 << 63 else fp
+
+
+def _from_sql(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class PendingIndex:
+    """一次入库过程中已接收、尚未落盘的片段指纹 (同批/同文件内去重)。"""
+
+    def __init__(self):
+        self._bands = [defaultdict(list) for _ in range(BANDS)]
+
+    def add(self, chunk_id, source, fp):
+        for i, band in enumerate(_bands(fp)):
+            self._bands[i][band].append((chunk_id, source, fp))
+
+    def candidates(self, fp):
+        seen = {}
+        for i, band in enumerate(_bands(fp)):
+            for item in self._bands[i].get(band, ()):
+                seen[item[0]] = item
+        return seen.values()
+
+
+class ChunkDedup:
+    """
+    近重复片段抑制：每个已写入向量的片段记录 SimHash 指纹 (按 16 位分段建索引查候选)；
+    新片段与已有片段相似度达到阈值时不再向量化，而是作为引用 (chunk_refs) 指向已有片段。
+    引用保留自身的来源/位置与正文，被引用的片段删除时可提升为独立片段。
+    """
+
+    def __init__(self, meta, threshold=DEDUP_THRESHOLD):
+        self.meta = meta
+        self.threshold = threshold
+        self.meta.ensure_schema(_DDL)
+
+    def _best(self, fp, candidates):
+        best = None
+        for chunk_id, source, other in candidates:
+            score = similarity(fp, other)
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (chunk_id, source, score)
+        return best
+
+    def lookup(self, collection, fp, exclude=(), pending=None):
+        """
+        返回 (canonical_id, source, similarity) 或 None。
+        exclude: 已落盘片段中不参与匹配的来源 (即将被替换的旧版本)；pending 中的片段总是参与。
+        """
+        exclude = set(exclude)
+        rows = self.meta.query(
+            "SELECT chunk_id, source, simhash FROM chunk_fingerprints WHERE collection = ? AND "
+            "(b0 = ? OR b1 = ? OR b2 = ? OR b3 = ?)",
+            (collection, *_bands(fp)),
+        )
+        candidates = [(r["chunk_id"], r["source"], _from_sql(r["simhash"])) for r in rows if r["source"] not in exclude]
+        if pending is not None:
+            candidates.extend(pending.candidates(fp))
+        return self._best(fp, candidates)
+
+    def record(self, collection, rows, refs=()):
+        """写入成功后登记：rows 为已写入向量的片段，refs 为引用行 (含 canonical_id / similarity)。"""
+        with self.meta.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_fingerprints "
+                "(collection, chunk_id, source, simhash, b0, b1, b2, b3) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(collection, r["chunk_id"], r["source"], _to_sql(fp), *_bands(fp))
+                 for r in rows for fp in [simhash(r["text"])]],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_refs "
+                "(collection, chunk_id, source, canonical_id, similarity, text, line_range, location, type, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(collection, r["chunk_id"], r["source"], r["canonical_id"], r["similarity"], r["text"],
+                  r.get("line_range"), r.get("location"), r.get("type"), r.get("ingested_at")) for r in refs],
+            )
+
+    def existing(self, collection, chunk_ids):
+        """chunk_ids 中已登记为向量片段的 ID"""
+        found = set()
+        chunk_ids = list(chunk_ids)
+        for i in range(0, len(chunk_ids), 500):
+            part = chunk_ids[i:i + 500]
+            rows = self.meta.query(
+                f"SELECT chunk_id FROM chunk_fingerprints WHERE collection = ? AND chunk_id IN "
+                f"({', '.join('?' * len(part))})", (collection, *part),
+            )
+            found.update(r["chunk_id"] for r in rows)
+        return found
+
+    def release_sources(self, collection, sources):
+        """
+        来源被删除或替换时清理其指纹与引用，返回失去被引用片段的引用行 (其他来源的)，
+        由调用方重新指向或提升为独立片段。
+        """
+        sources = list(sources)
+        if not sources:
+            return []
+        marks = ", ".join("?" * len(sources))
+        with self.meta.transaction() as conn:
+            orphans = conn.execute(
+                f"SELECT r.* FROM chunk_refs r JOIN chunk_fingerprints f "
+                f"ON f.collection = r.collection AND f.chunk_id = r.canonical_id "
+                f"WHERE r.collection = ? AND f.source IN ({marks}) AND r.source NOT IN ({marks})",
+                (collection, *sources, *sources),
+            ).fetchall()
+            conn.execute(f"DELETE FROM chunk_refs WHERE collection = ? AND source IN ({marks})", (collection, *sources))
+            conn.execute(f"DELETE FROM chunk_fingerprints WHERE collection = ? AND source IN ({marks})",
+                         (collection, *sources))
+            conn.executemany("DELETE FROM chunk_refs WHERE collection = ? AND chunk_id = ?",
+                             [(collection, r["chunk_id"]) for r in orphans])
+        return [{k: r[k] for k in REF_FIELDS} for r in orphans]
+
+    def rebuild(self, collection, tbl, batch_rows=8192):
+        """为升级前已有的表补登记指纹 (流式读取，不改动已有片段)，返回登记数。"""
+        if "chunk_id" not in tbl.schema.names:
+            return 0
+        self.meta.execute("DELETE FROM chunk_fingerprints WHERE collection = ?", (collection,))
+        total = 0
+        for batch in tbl.search().select(["chunk_id", "source", "text"]).limit(None).to_batches(batch_rows):
+            rows = batch.to_pylist()
+            self.record(collection, rows)
+            total += len(rows)
+        return total
+
+    def refs(self, collection, source=None):
+        sql, params = "SELECT * FROM chunk_refs WHERE collection = ?", [collection]
+        if source:
+            sql += " AND source = ?"
+            params.append(source)
+        return [dict(r) for r in self.meta.query(sql, params)]
+
+    def refs_matching(self, collection, clause, params=(), limit=None):
+        """满足过滤条件 (SQLite 子句，见 filters.FilterExpr.sqlite_clause) 的引用行"""
+        sql = f"SELECT * FROM chunk_refs WHERE collection = ? AND ({clause})"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(r) for r in self.meta.query(sql, (collection, *params))]
+
+    def clear(self, collection):
+        with self.meta.transaction() as conn:
+            conn.execute("DELETE FROM chunk_fingerprints WHERE collection = ?", (collection,))
+            conn.execute("DELETE FROM chunk_refs WHERE collection = ?", (collection,))
+
+    def stats(self, collection):
+        chunks = self.meta.query_one(
+            "SELECT COUNT(*) AS n FROM chunk_fingerprints WHERE collection = ?", (collection,))["n"]
+        refs = self.meta.query_one("SELECT COUNT(*) AS n FROM chunk_refs WHERE collection = ?", (collection,))["n"]
+        top = self.meta.query(
+            "SELECT f.source AS source, COUNT(*) AS n FROM chunk_refs r JOIN chunk_fingerprints f "
+            "ON f.collection = r.collection AND f.chunk_id = r.canonical_id "
+            "WHERE r.collection = ? GROUP BY f.source ORDER BY n DESC LIMIT 5", (collection,),
+        )
+        total = chunks + refs
+        return {
+            "vectors": chunks,
+            "refs": refs,
+            "ratio": refs / total if total else 0.0,
+            "threshold": self.threshold,
+            "top_canonical": [(r["source"], r["n"]) for r in top],
+        }
@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# 向量缓存配置 (均可通过环境变量覆盖)
+CACHE_ENABLED = os.environ.get("ZX_KB_EMBED_CACHE", "1") != "0"
+MEMORY_ENTRIES = int(os.environ.get("ZX_KB_EMBED_CACHE_MEMORY", "4096"))      # 内存 LRU 条数
+DISK_ENTRIES = int(os.environ.get("ZX_KB_EMBED_CACHE_DISK", "200000"))        # 磁盘缓存条数上限
+EVICT_BATCH = 1000  # 磁盘超限时一次多淘汰一些，避免每次写入都触发淘汰
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    key       TEXT PRIMARY KEY,
+    model     TEXT NOT NULL,
+    dim       INTEGER NOT NULL,
+    vector    BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_lru ON embedding_cache (last_used);
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """全半角统一 + 空白折叠，格式上的细微差异不影响命中。"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def cache_key(model_name, text):
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    两级向量缓存：内存 LRU 在前，SQLite 磁盘缓存在后，键为 (模型名, 规范化文本哈希)。
+    重复提问与重新入库时未改动的片段直接复用向量，跳过 ONNX 推理。
+    """
+
+    def __init__(self, meta, model_name, memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES):
+        self.meta = meta
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.meta.ensure_schema(_DDL)
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_many(self, texts):
+        """返回与 texts 对齐的向量列表，未命中的位置为 None。"""
+        keys = [cache_key(self.model_name, t) for t in texts]
+        results = [None] * len(texts)
+        pending = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+        if not pending:
+            return results
+
+        found = {}
+        key_list = list(pending)
+        # SQLite 单条语句的参数个数有限，分批查询
+        for start in range(0, len(key_list), 500):
+            part = key_list[start:start + 500]
+            rows = self.meta.query(
+                f"SELECT key, vector FROM embedding_cache WHERE key IN ({', '.join('?' * len(part))})", part
+            )
+            for row in rows:
+                found[row["key"]] = np.frombuffer(row["vector"], dtype=np.float32).copy()
+        if found:
+            now = time.time()
+            self.meta.executemany("UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                                  [(now, k) for k in found])
+
+        for key, positions in pending.items():
+            vector = found.get(key)
+            if vector is None:
+                self.misses += len(positions)
+                continue
+            self._remember(key, vector)
+            self.disk_hits += len(positions)
+            for i in positions:
+                results[i] = vector
+        return results
+
+    def put_many(self, texts, vectors):
+        rows, now = [], time.time()
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            key = cache_key(self.model_name, text)
+            self._remember(key, vector)
+            rows.append((key, self.model_name, vector.shape[0], vector.tobytes(), now))
+        if rows:
+            self.meta.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._evict()
+
+    def _evict(self):
+        """磁盘缓存超出上限时淘汰最久未使用的条目。"""
+        count = self.meta.query_one("SELECT COUNT(*) AS n FROM embedding_cache")["n"]
+        if count <= self.disk_entries:
+            return 0
+        excess = count - self.disk_entries + min(EVICT_BATCH, self.disk_entries)
+        return self.meta.execute(
+            "DELETE FROM embedding_cache WHERE key IN "
+            "(SELECT key FROM embedding_cache ORDER BY last_used ASC LIMIT ?)", (excess,)
+        )
+
+    def embed(self, texts, compute):
+        """
+        带缓存的批量向量化：只把未命中的文本交给 compute(texts) -> vectors 推理。
+        同一批内重复的文本也只推理一次。
+        """
+        vectors = self.get_many(texts)
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(normalize_text(texts[i]), []).append(i)
+        if missing:
+            todo = [texts[positions[0]] for positions in missing.values()]
+            computed = [np.asarray(v, dtype=np.float32) for v in compute(todo)]
+            self.put_many(todo, computed)
+            for positions, vector in zip(missing.values(), computed):
+                for i in positions:
+                    vectors[i] = vector
+        return vectors
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        return self.meta.execute("DELETE FROM embedding_cache")
+
+    def stats(self):
+        with self._lock:
+            memory = len(self._memory)
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        disk = self.meta.query_one("SELECT COUNT(*) AS n FROM embedding_cache")["n"]
+        return {
+            "model": self.model_name,
+            "memory_entries": memory,
+            "disk_entries": disk,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,134 @@
+import os
+import time
+
+# 向量化引擎配置 (均可通过环境变量覆盖)
+DEFAULT_MODEL = "BAAI/bge-small-zh-v1.5"   # 优秀的中文模型，体积适中；未记录模型的旧表均由它生成
+EMBED_MODEL = os.environ.get("ZX_KB_EMBED_MODEL", DEFAULT_MODEL)
+EMBED_BATCH = int(os.environ.get("ZX_KB_EMBED_BATCH", "256"))   # 每次 ONNX 推理的文本数
+# ONNX Runtime 算子内线程数，未设置时由 onnxruntime 自行决定
+EMBED_THREADS = int(os.environ["ZX_KB_EMBED_THREADS"]) if os.environ.get("ZX_KB_EMBED_THREADS") else None
+# 数据并行的推理进程数 (每个进程单线程、各自加载一份模型)，0 表示全部核心，未设置时不启用
+EMBED_PARALLEL = int(os.environ["ZX_KB_EMBED_PARALLEL"]) if os.environ.get("ZX_KB_EMBED_PARALLEL") else None
+# 每次并行推理要启动进程池并加载模型，每个进程至少分到这么多批才值得
+PARALLEL_MIN_BATCHES = 4
+
+# 表元数据：记录生成向量的模型与维度 (写在 vector 列上，与结构版本并列)
+MODEL_KEY = "zx:embedding_model"
+DIM_KEY = "zx:embedding_dim"
+VECTOR_COLUMN = "vector"
+
+
+def _workers(parallel):
+    return (os.cpu_count() or 1) if parallel == 0 else parallel
+
+
+class EmbeddingEngine:
+    """
+    可调的向量化引擎：模型、批大小、ONNX 线程数与数据并行进程数。
+    fastembed 每次并行调用都会新建进程池，因此只有文本数足够多 (入库攒批) 时才走并行，
+    查询与零散写入仍在本进程内推理。
+    """
+
+    def __init__(self, model_cls, model_name=EMBED_MODEL, batch_size=EMBED_BATCH,
+                 threads=EMBED_THREADS, parallel=EMBED_PARALLEL):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads
+        self.parallel = parallel
+        kwargs = {"threads": threads} if threads else {}
+        self.model = model_cls(model_name=model_name, **kwargs)
+
+    @property
+    def parallel_min_texts(self):
+        """触发数据并行的最少文本数，未启用并行时为 None"""
+        if self.parallel is None:
+            return None
+        return self.batch_size * _workers(self.parallel) * PARALLEL_MIN_BATCHES
+
+    def embed(self, texts):
+        texts = list(texts)
+        min_texts = self.parallel_min_texts
+        parallel = self.parallel if min_texts is not None and len(texts) >= min_texts else None
+        # FastEmbed 返回的是 generator，转为 list
+        return list(self.model.embed(texts, batch_size=self.batch_size, parallel=parallel))
+
+    def describe(self):
+        threads = self.threads or "auto"
+        parallel = "off" if self.parallel is None else _workers(self.parallel)
+        return f"{self.model_name} (batch={self.batch_size}, threads={threads}, parallel={parallel})"
+
+
+def table_model(tbl):
+    """表记录的 (模型, 维度)；升级前创建、未记录模型的表视为默认模型，维度取自向量列"""
+    field = tbl.schema.field(VECTOR_COLUMN)
+    metadata = field.metadata or {}
+    model = metadata.get(MODEL_KEY.encode())
+    dim = metadata.get(DIM_KEY.encode())
+    if dim is None:
+        dim = getattr(field.type, "list_size", None)
+    return (model.decode() if model else DEFAULT_MODEL), (int(dim) if dim is not None else None)
+
+
+def model_metadata(model_name, dim):
+    """写入表元数据的模型记录 (建表时随结构版本一起写入)"""
+    return {MODEL_KEY: model_name, DIM_KEY: str(dim)}
+
+
+def check_table_model(tbl, table_name, model_name):
+    """写入前确认表由当前模型生成，不同模型的向量混在一张表里检索结果没有意义"""
+    recorded, dim = table_model(tbl)
+    if recorded != model_name:
+        raise ValueError(
+            f"集合 '{table_name}' 由 {recorded} ({dim} 维) 生成，当前模型为 {model_name}。"
+            f"请换用其他集合名，或改回 ZX_KB_EMBED_MODEL={recorded}。"
+        )
+
+
+def bench_texts(count=512, seed_texts=None):
+    """基准测试文本：长度接近真实片段 (数百字) 的中英混合段落"""
+    seeds = seed_texts or [
+        "星云数据库副本延迟排查：先看复制队列长度，再检查网络带宽与磁盘写入延迟。",
+        "The ingest pipeline parses documents in worker processes and embeds chunks in batches.",
+        "会议纪要：下周五灰度发布，索引压缩比约 4 倍，检索 p95 延迟目标 50ms 以内。",
+    ]
+    return [f"{seeds[i % len(seeds)]} 第 {i} 段。" * 6 for i in range(count)]
+
+
+def benchmark(model_cls, configs, texts, model_name=EMBED_MODEL, repeat=1):
+    """
+    按不同 (batch_size, threads, parallel) 组合测量向量化吞吐量，用于确定入库机器的规格。
+    每个组合先预热一次 (模型加载不计入)；并行组合每次调用都会新建进程池，这部分开销与实际入库一致，计入耗时。
+    返回 [{配置, 维度, 耗时, 每秒向量数}]。
+    """
+    results = []
+    for config in configs:
+        engine = EmbeddingEngine(model_cls, model_name=model_name, batch_size=config.get("batch_size") or EMBED_BATCH,
+                                 threads=config.get("threads"), parallel=config.get("parallel"))
+        # 基准测试总是按配置执行并行，不受 PARALLEL_MIN_BATCHES 门槛影响
+        def run():
+            return list(engine.model.embed(texts, batch_size=engine.batch_size, parallel=engine.parallel))
+        dim = len(run()[0]) if texts else 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        seconds = (time.perf_counter() - start) / repeat
+        results.append({
+            "config": engine.describe(),
+            "batch_size": engine.batch_size,
+            "threads": engine.threads,
+            "parallel": engine.parallel,
+            "dim": dim,
+            "texts": len(texts),
+            "seconds": seconds,
+            "per_s": len(texts) / seconds if seconds else 0.0,
+        })
+    return results
+
+
+def parse_grid(batches="64,256", threads="", parallel=""):
+    """命令行参数 -> 配置组合。空值或 auto/off 表示默认 (threads 由 onnxruntime 决定，不并行)"""
+    def _values(text):
+        items = [v.strip() for v in str(text).split(",") if v.strip()]
+        return [None if v in ("auto", "off") else int(v) for v in items] or [None]
+    return [{"batch_size": b, "threads": t, "parallel": p}
+            for b in _values(batches) for t in _values(threads) for p in _values(parallel)]
@@ -0,0 +1,67 @@
+import json
+import time
+
+from skills.knowledge_base.scripts.metrics import summarize_latencies
+
+
+def load_eval_set(path):
+    """
+    读取评测集 (JSONL)，每行: {"query": "...", "expected": ["命中片段应包含的关键字或文件名", ...]}
+    expected 也可以是单个字符串。
+    """
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            case = json.loads(line)
+            expected = case.get("expected", [])
+            case["expected"] = [expected] if isinstance(expected, str) else list(expected)
+            cases.append(case)
+    return cases
+
+
+def is_relevant(row, expected):
+    """结果片段正文或来源包含任一期望关键字即视为相关。"""
+    haystack = f"{row.get('text', '')}\n{row.get('source', '')}"
+    return any(e in haystack for e in expected)
+
+
+def evaluate(cases, search_fn, k=5):
+    """
+    对一个检索函数 search_fn(query, k) -> rows 计算:
+    - hit_rate: top-k 中至少一条相关的查询占比
+    - mrr: 首条相关结果名次倒数的均值
+    - precision: top-k 中相关结果占比的均值
+    以及逐查询延迟分位数。
+    """
+    hits, rr, precision, latencies = 0, 0.0, 0.0, []
+    for case in cases:
+        start = time.perf_counter()
+        rows = search_fn(case["query"], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        flags = [is_relevant(r, case["expected"]) for r in rows[:k]]
+        if any(flags):
+            hits += 1
+            rr += 1.0 / (flags.index(True) + 1)
+        precision += sum(flags) / k
+    n = len(cases) or 1
+    return {
+        "queries": len(cases),
+        "hit_rate": hits / n,
+        "mrr": rr / n,
+        "precision": precision / n,
+        **summarize_latencies(latencies),
+    }
+
+
+def format_report(title, results, k):
+    """results: {配置名: evaluate() 结果}"""
+    lines = [f"--- {title} (k={k}) ---"]
+    for name, r in results.items():
+        lines.append(
+            f"{name:<14} hit@{k}={r['hit_rate']:.3f}  mrr={r['mrr']:.3f}  P@{k}={r['precision']:.3f}  "
+            f"p50={r['p50_ms']:.1f}ms  p95={r['p95_ms']:.1f}ms"
+        )
+    return "\n".join(lines)
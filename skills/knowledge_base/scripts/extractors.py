@@ -0,0 +1,138 @@
+import os
+import csv
+import io
+import textwrap
+from dataclasses import dataclass
+
+# 尝试导入可选依赖 (与 agent_core.tools 一致)
+try:
+    import docx
+    import pypdf
+    import openpyxl
+    from pptx import Presentation
+    HAS_OFFICE_DEPS = True
+except ImportError:
+    HAS_OFFICE_DEPS = False
+
+UNKNOWN_LOCATION = "Unknown Location"
+WRAP_WIDTH = 120          # 与 read_file 保持一致的长行折行宽度
+TEXT_BLOCK_LINES = 200    # 纯文本每个块的行数
+SHEET_BLOCK_ROWS = 200    # Excel 每个块的行数
+
+OFFICE_EXTS = {".docx", ".pdf", ".xlsx", ".pptx"}
+
+
+@dataclass
+class TextBlock:
+    """抽取出的一段文本及其在原文档中的位置 (Page 3 / Slide 2 / Sheet: 销售 ...)。"""
+    location: str
+    text: str
+
+
+def _wrap(line):
+    return textwrap.fill(line, width=WRAP_WIDTH) if len(line) > WRAP_WIDTH else line
+
+
+def iter_pdf_blocks(file_path):
+    """逐页抽取 PDF，每页一个块。"""
+    reader = pypdf.PdfReader(file_path)
+    for i, page in enumerate(reader.pages):
+        page_text = page.extract_text() or ""
+        lines = [_wrap(line) for line in page_text.splitlines()]
+        img_count = len(page.images)
+        if img_count > 0:
+            lines.append(f"[IMAGE_PLACEHOLDER: Page {i+1} 包含 {img_count} 张图片]")
+        yield TextBlock(f"Page {i+1}", "\n".join(lines))
+
+
+def iter_pptx_blocks(file_path):
+    """逐页抽取幻灯片文本与备注，每页一个块。"""
+    prs = Presentation(file_path)
+    for i, slide in enumerate(prs.slides):
+        slide_text = []
+        for shape in slide.shapes:
+            if hasattr(shape, "text") and shape.text.strip():
+                slide_text.append(shape.text.strip())
+        if slide.has_notes_slide:
+            notes = slide.notes_slide.notes_text_frame.text.strip()
+            if notes: slide_text.append(f"[备注]: {notes}")
+        if slide_text:
+            yield TextBlock(f"Slide {i+1}", "\n".join(slide_text))
+
+
+def iter_xlsx_blocks(file_path, rows_per_block=SHEET_BLOCK_ROWS):
+    """以只读模式流式遍历工作表，每 rows_per_block 行一个块，不整体加载工作簿。"""
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            location = f"Sheet: {ws.title}"
+            si = io.StringIO()
+            writer = csv.writer(si)
+            count = 0
+            for row in ws.iter_rows(values_only=True):
+                writer.writerow(row)
+                count += 1
+                if count >= rows_per_block:
+                    yield TextBlock(location, si.getvalue().rstrip("\r\n"))
+                    si = io.StringIO()
+                    writer = csv.writer(si)
+                    count = 0
+            if count:
+                yield TextBlock(location, si.getvalue().rstrip("\r\n"))
+    finally:
+        wb.close()
+
+
+def iter_docx_blocks(file_path):
+    """按标题分节抽取 Word 文档，位置记为最近的标题。"""
+    document = docx.Document(file_path)
+    location = UNKNOWN_LOCATION
+    lines = []
+    for para in document.paragraphs:
+        text = para.text.strip()
+        if para.style.name.startswith("Heading") and text:
+            if lines:
+                yield TextBlock(location, "\n".join(lines))
+                lines = []
+            location = f"Section: {text}"
+        if not text:
+            lines.append("")
+            continue
+        lines.extend(textwrap.fill(text, width=WRAP_WIDTH).splitlines() if len(text) > WRAP_WIDTH else [text])
+    img_count = len(document.inline_shapes)
+    if img_count > 0:
+        lines.append(f"[系统提示: 该文档包含 {img_count} 张图片]")
+    if lines:
+        yield TextBlock(location, "\n".join(lines))
+
+
+def iter_text_blocks(file_path, lines_per_block=TEXT_BLOCK_LINES):
+    """逐行流式读取纯文本，不受行数上限限制。"""
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        lines = []
+        for line in f:
+            lines.append(line.rstrip("\r\n"))
+            if len(lines) >= lines_per_block:
+                yield TextBlock(UNKNOWN_LOCATION, "\n".join(lines))
+                lines = []
+        if lines:
+            yield TextBlock(UNKNOWN_LOCATION, "\n".join(lines))
+
+
+def iter_document_blocks(file_path):
+    """
+    单次遍历文档，按顺序产出 TextBlock。
+    与 read_file 分页读取不同，这里每个文档只解析一次，内存占用与单个块大小相关。
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in OFFICE_EXTS:
+        if not HAS_OFFICE_DEPS:
+            raise RuntimeError(f"缺少 Office 解析依赖，无法读取 {ext} 文件")
+        if ext == ".pdf":
+            return iter_pdf_blocks(file_path)
+        if ext == ".pptx":
+            return iter_pptx_blocks(file_path)
+        if ext == ".xlsx":
+            return iter_xlsx_blocks(file_path)
+        return iter_docx_blocks(file_path)
+    return iter_text_blocks(file_path)
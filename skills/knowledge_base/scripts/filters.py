@@ -0,0 +1,139 @@
+import re
+import datetime
+
+# 可下推的过滤字段 (均建有标量索引，见 index_manager.SCALAR_INDEXES)
+FILTER_KEYS = ("source", "type", "location", "since", "until")
+
+
+def sql_literal(value):
+    """转为 SQL 字符串字面量 (转义单引号)，防止路径中的引号破坏过滤表达式。"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def glob_to_like(pattern):
+    """
+    glob -> LIKE：* 对应 %，? 对应 _，原文中的 % _ \\ 按字面量转义。
+    """
+    out = []
+    for ch in pattern:
+        if ch == "*":
+            out.append("%")
+        elif ch == "?":
+            out.append("_")
+        elif ch in ("%", "_", "\\"):
+            out.append("\\" + ch)
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _has_wildcard(pattern):
+    return "*" in pattern or "?" in pattern
+
+
+def _match_expr(column, pattern):
+    """无通配符时用等值比较 (可直接走 BTree 索引)，否则转成 LIKE。"""
+    if not _has_wildcard(pattern):
+        return f"{column} = {sql_literal(pattern)}"
+    return f"{column} LIKE {sql_literal(glob_to_like(pattern))}"
+
+
+def _glob_regex(pattern):
+    """glob -> 正则 (只有 * ? 是通配符，与 glob_to_like 一致)"""
+    return re.compile("".join(".*" if ch == "*" else "." if ch == "?" else re.escape(ch) for ch in pattern), re.S)
+
+
+class FilterExpr(str):
+    """
+    build_filter 的结果：可直接当作 LanceDB 过滤表达式使用的字符串，同时保留原始条件
+    [(列, 操作, 值)]，用于在 SQLite 中按相同条件匹配近重复引用片段 (chunk_refs，见 dedup)。
+    """
+
+    def __new__(cls, expr, conditions):
+        obj = super().__new__(cls, expr)
+        obj.conditions = conditions
+        return obj
+
+    def sqlite_clause(self):
+        """同样的条件编译为 SQLite WHERE 子句与参数 (GLOB 区分大小写，与 LanceDB 的 LIKE 一致)"""
+        clauses, params = [], []
+        for column, op, value in self.conditions:
+            if op == "match" and _has_wildcard(value):
+                clauses.append(f"{column} GLOB ?")
+                params.append(value.replace("[", "[[]"))
+            elif op == "match":
+                clauses.append(f"{column} = ?")
+                params.append(value)
+            elif op == "in":
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        return " AND ".join(clauses), params
+
+    def matches(self, row):
+        """结果行是否满足条件 (缺少的列视为不满足)"""
+        for column, op, value in self.conditions:
+            actual = row.get(column)
+            if actual is None:
+                return False
+            if op == "match":
+                ok = _glob_regex(value).fullmatch(actual) is not None
+            elif op == "in":
+                ok = actual in value
+            elif op == ">=":
+                ok = actual >= value
+            else:
+                ok = actual <= value
+            if not ok:
+                return False
+        return True
+
+
+def _date_bound(value, end=False):
+    """接受 YYYY-MM-DD 或完整 ISO 时间；只给日期时 until 包含当天。"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    value = str(value).strip()
+    datetime.datetime.fromisoformat(value)  # 校验格式，非法时抛 ValueError
+    if end and len(value) == 10:
+        return value + "T23:59:59"
+    return value
+
+
+def build_filter(source=None, type=None, location=None, since=None, until=None):
+    """
+    把检索过滤条件编译成 LanceDB 过滤表达式 (作为 prefilter 下推，走标量索引)。
+    - source: 来源路径 glob，如 "*.pdf"、"*白皮书*"；不含 "/" 时按文件名匹配
+    - type: 片段类型，字符串或列表
+    - location: 位置 glob，如 "Page 3"、"Sheet: *"
+    - since / until: 入库时间范围 (YYYY-MM-DD 或 ISO 时间)
+    全部为空时返回 None。
+    """
+    clauses, conditions = [], []
+    if source:
+        if "/" not in source and not source.startswith("*"):
+            # 只给了文件名：按完整文件名匹配路径的最后一段 (a.md 不会匹配 data.md)
+            source = "*/" + source
+        clauses.append(_match_expr("source", source))
+        conditions.append(("source", "match", source))
+    if type:
+        types = [type] if isinstance(type, str) else list(type)
+        if len(types) == 1:
+            clauses.append(f"type = {sql_literal(types[0])}")
+        else:
+            clauses.append(f"type IN ({', '.join(sql_literal(t) for t in types)})")
+        conditions.append(("type", "in", types))
+    if location:
+        clauses.append(_match_expr("location", location))
+        conditions.append(("location", "match", location))
+    if since:
+        clauses.append(f"ingested_at >= {sql_literal(_date_bound(since))}")
+        conditions.append(("ingested_at", ">=", _date_bound(since)))
+    if until:
+        clauses.append(f"ingested_at <= {sql_literal(_date_bound(until, end=True))}")
+        conditions.append(("ingested_at", "<=", _date_bound(until, end=True)))
+    if not clauses:
+        return None
+    return FilterExpr(" AND ".join(f"({c})" for c in clauses) if len(clauses) > 1 else clauses[0], conditions)
@@ -0,0 +1,246 @@
+import os
+import time
+import threading
+
+from lancedb.index import IvfPq, HnswSq, FTS, BTree, Bitmap
+
+from skills.knowledge_base.scripts.metrics import summarize_latencies
+from skills.knowledge_base.scripts.vector_precision import table_precision
+from skills.knowledge_base.scripts.maintenance import compact_if_fragmented
+
+# 向量索引生命周期配置 (均可通过环境变量覆盖)
+VECTOR_COLUMN = "vector"
+VECTOR_INDEX_NAME = "vector_idx"
+INDEX_TYPE = os.environ.get("ZX_KB_INDEX_TYPE", "IVF_PQ")            # IVF_PQ / IVF_HNSW_SQ
+INDEX_MIN_ROWS = int(os.environ.get("ZX_KB_INDEX_MIN_ROWS", "10000"))  # 行数低于该值时暴力扫描更快更准
+REINDEX_UNINDEXED_ROWS = int(os.environ.get("ZX_KB_REINDEX_UNINDEXED_ROWS", "2000"))
+# 查询参数：nprobes 越大召回越高、越慢；refine_factor 用原始向量对候选重排
+NPROBES = int(os.environ.get("ZX_KB_NPROBES", "20"))
+REFINE_FACTOR = int(os.environ.get("ZX_KB_REFINE_FACTOR", "5")) or None
+HNSW_EF = int(os.environ.get("ZX_KB_HNSW_EF", "64"))
+# 全文索引：LanceDB 原生倒排索引，中文按字符二元组 (ngram=2) 切分，
+# 无需分词词典即可命中专有名词与编号；小写化与 ASCII 折叠照常保留
+FTS_COLUMN = "text"
+FTS_INDEX_NAME = "text_idx"
+# 标量索引：检索过滤与按来源删除时下推为索引查询，而不是全表扫描。
+# 低基数的 type 用 BITMAP，其余用 BTREE (支持等值、范围与前缀 LIKE)
+SCALAR_INDEXES = {
+    "source": BTree,
+    "type": Bitmap,
+    "location": BTree,
+    "ingested_at": BTree,
+}
+
+def _num_sub_vectors(dim):
+    """PQ 子向量数需整除维度，优先每个子向量 16 维。"""
+    for width in (16, 8, 32, 4, 2, 1):
+        if dim % width == 0:
+            return dim // width
+    return 1
+
+
+def _vector_dim(tbl):
+    field = tbl.schema.field(VECTOR_COLUMN)
+    return field.type.list_size
+
+
+def get_index_stats(tbl):
+    """返回向量索引统计，未建索引时返回 None。"""
+    try:
+        return tbl.index_stats(VECTOR_INDEX_NAME)
+    except Exception:
+        return None
+
+
+def vector_index_status(tbl):
+    """汇总表的行数与索引覆盖情况。"""
+    rows = tbl.count_rows()
+    stats = get_index_stats(tbl)
+    return {
+        "rows": rows,
+        "indexed": stats is not None,
+        "index_type": stats.index_type if stats else None,
+        "distance_type": stats.distance_type if stats else None,
+        "num_indexed_rows": stats.num_indexed_rows if stats else 0,
+        "num_unindexed_rows": stats.num_unindexed_rows if stats else rows,
+        "min_rows": INDEX_MIN_ROWS,
+    }
+
+
+def build_vector_index(tbl, index_type=INDEX_TYPE):
+    """(重新) 训练并构建向量索引。"""
+    if index_type == "IVF_HNSW_SQ":
+        config = HnswSq(distance_type="l2")
+    else:
+        config = IvfPq(distance_type="l2", num_sub_vectors=_num_sub_vectors(_vector_dim(tbl)))
+    tbl.create_index(VECTOR_COLUMN, config=config, replace=True, name=VECTOR_INDEX_NAME)
+
+
+def get_fts_stats(tbl):
+    """返回全文索引统计，未建索引时返回 None。"""
+    try:
+        return tbl.index_stats(FTS_INDEX_NAME)
+    except Exception:
+        return None
+
+
+def build_fts_index(tbl):
+    """(重新) 构建全文索引。"""
+    config = FTS(base_tokenizer="ngram", ngram_min_length=2, ngram_max_length=2, stem=False, remove_stop_words=False)
+    tbl.create_index(FTS_COLUMN, config=config, replace=True, name=FTS_INDEX_NAME)
+
+
+def has_fts_index(tbl):
+    """全文索引是否已建。新写入的行在合并前走扫描，结果仍完整。"""
+    return get_fts_stats(tbl) is not None
+
+
+def _index_columns(tbl):
+    """已建索引覆盖的列名集合"""
+    columns = set()
+    for index in tbl.list_indices():
+        columns.update(index.columns)
+    return columns
+
+def ensure_scalar_indexes(tbl):
+    """为表中存在且尚未建索引的过滤列建标量索引，返回新建的列名列表。"""
+    existing = set(tbl.schema.names)
+    indexed = _index_columns(tbl)
+    created = []
+    for column, config in SCALAR_INDEXES.items():
+        if column in existing and column not in indexed:
+            tbl.create_index(column, config=config(), replace=True, name=f"{column}_idx")
+            created.append(column)
+    return created
+
+
+def maybe_update_index(tbl):
+    """
+    索引生命周期决策：
+    - 无向量索引且行数达到阈值 -> 建索引 (int8 量化表除外)
+    - 未索引行过多 -> 增量合并 (optimize)；若超过已索引行数，说明分布已明显变化，重新训练
+    - 全文索引随表一起维护：缺失则补建，未索引行过多时随 optimize 合并
+    - 过滤列的标量索引缺失则补建 (optimize 会一并合并新行)
+    返回执行的动作列表: built / rebuilt / optimized / fts_built / scalar_built
+    """
+    actions = []
+    indexable = table_precision(tbl) != "int8"  # int8 量化表不支持 ANN 索引，始终流式扫描
+    stats = get_index_stats(tbl)
+    if stats is None:
+        if indexable and tbl.count_rows() >= INDEX_MIN_ROWS:
+            build_vector_index(tbl)
+            actions.append("built")
+    elif stats.num_unindexed_rows > stats.num_indexed_rows:
+        build_vector_index(tbl, stats.index_type or INDEX_TYPE)
+        actions.append("rebuilt")
+    elif stats.num_unindexed_rows >= REINDEX_UNINDEXED_ROWS:
+        tbl.optimize()
+        actions.append("optimized")
+
+    fts = get_fts_stats(tbl)
+    if fts is None:
+        build_fts_index(tbl)
+        actions.append("fts_built")
+    elif fts.num_unindexed_rows >= REINDEX_UNINDEXED_ROWS and "optimized" not in actions:
+        tbl.optimize()
+        actions.append("optimized")
+
+    if ensure_scalar_indexes(tbl):
+        actions.append("scalar_built")
+    return actions
+
+
+def apply_search_params(builder, nprobes=None, refine_factor=None):
+    """为向量查询设置 ANN 参数 (无索引时 LanceDB 会忽略)。"""
+    builder = builder.nprobes(nprobes or NPROBES)
+    refine = REFINE_FACTOR if refine_factor is None else refine_factor
+    if refine:
+        builder = builder.refine_factor(refine)
+    if INDEX_TYPE == "IVF_HNSW_SQ":
+        builder = builder.ef(HNSW_EF)
+    return builder
+
+
+class IndexMaintainer:
+    """
+    后台表维护：写入后调度 maybe_update_index，小碎片过多时顺带压缩并清理旧版本。
+    同一张表同时只跑一个任务。
+    """
+
+    def __init__(self):
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, db, table_name, background=True):
+        with self._lock:
+            if table_name in self._running:
+                return None
+            self._running.add(table_name)
+        if not background:
+            return self._run(db, table_name)
+        thread = threading.Thread(target=self._run, args=(db, table_name), name=f"kb-index-{table_name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, db, table_name):
+        try:
+            tbl = db.get_table(table_name)
+            if tbl is None:
+                return []
+            actions = maybe_update_index(tbl)
+            # optimize 已包含碎片合并，未执行时再按碎片数判断是否需要压缩
+            if "optimized" not in actions and compact_if_fragmented(tbl):
+                actions.append("compacted")
+            if actions:
+                print(f"🗂️ [Index] {table_name}: {', '.join(actions)}")
+            return actions
+        except Exception as e:
+            print(f"⚠️ [Index] {table_name} maintenance failed: {e}")
+            return []
+        finally:
+            with self._lock:
+                self._running.discard(table_name)
+
+
+def _sample_query_vectors(tbl, samples):
+    rows = tbl.search().select([VECTOR_COLUMN]).limit(samples).to_list()
+    return [r[VECTOR_COLUMN] for r in rows]
+
+
+def benchmark_index(tbl, k=10, samples=50, nprobes_list=(5, 10, 20, 50), refine_factors=(None, 5)):
+    """
+    召回率 vs 延迟报告：用表内向量作为查询，以暴力扫描结果为真值，
+    对比不同 nprobes / refine_factor 组合的 recall@k 与平均/p95 延迟。
+    """
+    queries = _sample_query_vectors(tbl, samples)
+    if not queries:
+        return []
+
+    def _timed(build):
+        start = time.perf_counter()
+        ids = [r["_rowid"] for r in build().with_row_id(True).to_list()]
+        return ids, (time.perf_counter() - start) * 1000
+
+    truth, brute_ms = [], []
+    for q in queries:
+        ids, ms = _timed(lambda: tbl.search(q).bypass_vector_index().limit(k))
+        truth.append(set(ids))
+        brute_ms.append(ms)
+    report = [{"config": "brute-force", "recall": 1.0, **summarize_latencies(brute_ms)}]
+
+    if get_index_stats(tbl) is None:
+        return report
+    expected = sum(len(gt) for gt in truth) or 1
+    for nprobes in nprobes_list:
+        for refine in refine_factors:
+            hits, lat = 0, []
+            for q, gt in zip(queries, truth):
+                ids, ms = _timed(lambda: apply_search_params(tbl.search(q), nprobes, refine or 0).limit(k))
+                hits += len(gt & set(ids))
+                lat.append(ms)
+            report.append({
+                "config": f"nprobes={nprobes}, refine={refine or '-'}",
+                "recall": hits / expected,
+                **summarize_latencies(lat),
+            })
+    return report
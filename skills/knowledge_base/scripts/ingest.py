@@ -1,8 +1,15 @@
 import os
 import sys
 import glob
-import shutil
+import time
+import queue
 import hashlib
+import argparse
+import datetime
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # [关键修复] 先计算并添加项目根目录，再进行后续 import
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -11,165 +18,481 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 # 现在可以安全地导入了
-from skills.knowledge_base.scripts.db_manager import DBManager, DOCS_ARCHIVE_PATH
-from agent_core.tools import read_file
+from skills.knowledge_base.scripts.db_manager import DBManager, DOCS_ARCHIVE_PATH, EMBEDDING_MODEL_NAME
+from skills.knowledge_base.scripts.manifest import ManifestEntry
+from skills.knowledge_base.scripts.extractors import iter_document_blocks
+# 切片策略版本 (CHUNKER_VERSION) 变化时，清单据此判定旧向量失效
+from skills.knowledge_base.scripts.chunker import chunk_blocks, CHUNKER_VERSION
+from skills.knowledge_base.scripts.dedup import DEDUP_ENABLED, PendingIndex, simhash
+from skills.knowledge_base.scripts.archive_store import hash_file, store_file
 
-def chunk_text_by_lines(text, chunk_size=20, overlap=5):
-    """
-    按行切分文本，并尝试提取语义化的位置信息（如 Slide 1, Page 2, Sheet Name）。
-    返回: List[dict] -> [{'text': '...', 'lines': '10-30', 'location': 'Slide 5'}]
-    """
-    lines = text.splitlines()
-    chunks = []
-    total_lines = len(lines)
-    
-    # 预扫描：建立行号到位置的映射
-    line_location_map = {}
-    current_location = "Unknown Location"
-    
-    import re
-    # 匹配模式: --- Slide 1 ---, --- Page 1 ---, --- Sheet: Sheet1 ---
-    loc_pattern = re.compile(r'^--- (Slide \d+|Page \d+|Sheet: .+) ---$')
-    
-    for i, line in enumerate(lines):
-        match = loc_pattern.match(line.strip())
-        if match:
-            current_location = match.group(1)
-        line_location_map[i] = current_location
-    
-    for i in range(0, total_lines, chunk_size - overlap):
-        end = min(i + chunk_size, total_lines)
-        chunk_lines = lines[i:end]
-        chunk_content = "\n".join(chunk_lines).strip()
-        
-        if not chunk_content: continue
-        
-        start_loc = line_location_map.get(i, "Unknown")
-        end_loc = line_location_map.get(end-1, "Unknown")
-        
-        if start_loc == end_loc:
-            location = start_loc
-        else:
-            location = f"{start_loc} -> {end_loc}"
-            
-        chunks.append({
-            "text": chunk_content,
-            "line_start": i + 1,
-            "line_end": end,
-            "location": location
-        })
-        
-        if end == total_lines: break
-        
-    return chunks
-
-def archive_file(file_path):
-    """将文件归档到影子目录，返回归档后的绝对路径"""
+# 流水线参数
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)  # 解析进程数
+EMBED_BATCH_SIZE = 256       # 跨文件攒批的向量化批大小 (片段数)
+WRITE_BATCH_ROWS = 4096      # 合并写入阈值：攒够这么多行才 append 一次
+WRITE_QUEUE_SIZE = 8         # 向量化 -> 写入 的有界队列 (按文件计)
+PROGRESS_INTERVAL = 5.0      # 进度报告间隔 (秒)
+
+SUPPORTED_EXTENSIONS = ('.docx', '.pdf', '.xlsx', '.pptx', '.md', '.txt')
+
+def compute_file_hash(file_path):
+    """内容哈希 (完整 SHA-256，分块流式计算，大文件不整体读入内存)，同时是归档的内容地址"""
+    return hash_file(file_path)
+
+def archive_file(file_path, content_hash=None, archive_dir=None):
+    """将文件按内容地址归档到影子目录，返回归档后的绝对路径 (相同内容只存一份)"""
     try:
-        with open(file_path, "rb") as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()[:8]
-        
-        filename = os.path.basename(file_path)
-        new_filename = f"{file_hash}_{filename}"
-        new_path = os.path.join(DOCS_ARCHIVE_PATH, new_filename)
-        
-        if not os.path.exists(new_path):
-            shutil.copy2(file_path, new_path)
-            print(f"📦 Archived to: {new_path}")
-        else:
+        content_hash = content_hash or compute_file_hash(file_path)
+        new_path, method = store_file(file_path, content_hash, archive_dir or DOCS_ARCHIVE_PATH)
+        if method == "existing":
             print(f"📦 Used existing archive: {new_path}")
-            
+        else:
+            print(f"📦 Archived to: {new_path} ({method})")
         return new_path
     except Exception as e:
         print(f"⚠️ Archive failed: {e}. Using original path.")
         return file_path
 
-def ingest_file(file_path, collection_name="documents"):
-    # 1. 归档 (Copy-on-Ingest)
-    target_path = archive_file(file_path)
-    print(f"📄 Processing: {target_path}")
-    
-    # 2. 调用 Core Tool 读取文件 (使用归档后的路径)
-    full_content = ""
-    start_line = 1
-    page_size = 1000 
-    
-    while True:
-        # 使用 read_file.func 直接调用
-        part = read_file.func(target_path, start_line=start_line, end_line=start_line + page_size)
-        
-        body = part
-        if "--- 文件元数据 ---" in part:
-            body = part.split("--- 文件元数据 ---")[1].split("\n", 4)[-1]
-        if "[SYSTEM WARNING]" in body:
-            body = body.split("[SYSTEM WARNING]")[0]
-            
-        full_content += body
-        
-        if "[SYSTEM WARNING]" not in part: 
-            break
-        start_line += page_size
-        if start_line > 10000:
-            print("⚠️ File too large (>10k lines), stopping.")
-            break
-
-    # 3. 切片
-    chunks = chunk_text_by_lines(full_content)
-    print(f"   -> Split into {len(chunks)} chunks.")
-    
-    if not chunks: return
-
-    # 4. 向量化 & 存储
-    db = DBManager.get_instance()
-    vectors = db.embed_documents([c['text'] for c in chunks])
-    
-    # 使用归档路径作为 Source
-    final_source = target_path
-
-    data = []
-    for i, chunk in enumerate(chunks):
-        data.append({
-            "vector": vectors[i],
+def make_chunk_id(source, index):
+    """片段 ID：由 source (归档路径已含内容哈希) 与序号确定，跨文件唯一"""
+    return hashlib.md5(f"{source}\0{index}".encode("utf-8")).hexdigest()
+
+@dataclass
+class ParsedFile:
+    """解析阶段的产出 (可跨进程传递)"""
+    path: str
+    size: int
+    mtime: float
+    content_hash: str
+    source: str = ""
+    chunks: list = field(default_factory=list)
+    unchanged: bool = False
+    parse_seconds: float = 0.0
+    rows: list = field(default_factory=list)
+    refs: list = field(default_factory=list)   # 近重复片段：只登记引用，不向量化
+    shared: bool = False                       # 相同内容已由其他路径入库：只登记清单，不重复向量化与写入
+
+    @property
+    def complete(self):
+        return len(self.rows) + len(self.refs) == len(self.chunks)
+
+def _parse_file(abs_path, archive_dir, known_hash=None):
+    """
+    解析阶段 (在进程池中运行)：哈希 -> 归档 -> 流式抽取 -> 切片。
+    内容哈希与清单一致时提前返回，不做归档与解析。
+    """
+    start = time.perf_counter()
+    st = os.stat(abs_path)
+    content_hash = compute_file_hash(abs_path)
+    parsed = ParsedFile(path=abs_path, size=st.st_size, mtime=st.st_mtime, content_hash=content_hash)
+    if known_hash and known_hash == content_hash:
+        parsed.unchanged = True
+        return parsed
+
+    # 归档 (Copy-on-Ingest)，使用归档路径作为 Source
+    parsed.source = archive_file(abs_path, content_hash, archive_dir)
+    parsed.chunks = list(chunk_blocks(iter_document_blocks(parsed.source)))
+    parsed.parse_seconds = time.perf_counter() - start
+    return parsed
+
+class IngestPipeline:
+    """
+    分阶段流水线入库：
+      解析 (进程池) -> 跨文件攒批向量化 (主线程) -> 合并写入 (写线程)。
+    各阶段之间用有界队列/在途上限做背压；一个文件的片段只在全部向量化完成后才参与写入，
+    因此变化文件的“新片段写入 + 旧片段删除”仍在同一次提交中完成。
+    """
+
+    def __init__(self, collection="documents", workers=None, embed_batch_size=EMBED_BATCH_SIZE,
+                 write_batch_rows=WRITE_BATCH_ROWS, progress_interval=PROGRESS_INTERVAL):
+        self.collection = collection
+        self.workers = DEFAULT_WORKERS if workers is None else workers
+        self.write_batch_rows = write_batch_rows
+        self.progress_interval = progress_interval
+        self.db = DBManager.get_instance()
+        # 开启数据并行推理 (ZX_KB_EMBED_PARALLEL) 时攒够每个进程几批再向量化，摊薄进程池启动开销
+        self.embed_batch_size = max(embed_batch_size, self.db.embedding_engine.parallel_min_texts or 0)
+        self.manifest = self.db.manifest
+        self.stats = {"added": 0, "replaced": 0, "skipped": 0, "empty": 0, "failed": 0}
+        self.statuses = {}
+        self.timings = {"parse": 0.0, "embed": 0.0, "write": 0.0}
+        self.chunks_done = 0
+        self.deduped = 0
+        # 近重复抑制：本次入库已接收但未落盘的指纹；全部片段都是引用的文件等下一次向量化后再写入
+        self.dedup = self.db.dedup if DEDUP_ENABLED else None
+        self._pending = PendingIndex()
+        self._deferred = []
+        self._entries = {}
+        self._accepted = {}   # 本次入库已接收向量化的 source -> 原始路径
+        self._lock = threading.Lock()
+        self._schema_checked = False
+        # 本次入库的时间戳，写入每个片段的 ingested_at 列，用于按时间范围过滤
+        self.started_at = datetime.datetime.now().isoformat(timespec="seconds")
+
+    # --- 阶段 0: 清单快速跳过 ---
+    def _plan(self, files):
+        todo = []
+        for f in files:
+            abs_path = os.path.abspath(f)
+            try:
+                st = os.stat(abs_path)
+            except OSError as e:
+                print(f"❌ Error processing {f}: {e}")
+                self._finish(abs_path, "failed")
+                continue
+            entry = self.manifest.get(self.collection, abs_path)
+            self._entries[abs_path] = entry
+            if self.manifest.is_fresh(entry, st.st_size, st.st_mtime, CHUNKER_VERSION, EMBEDDING_MODEL_NAME):
+                print(f"⏭️ Unchanged, skipped: {f}")
+                self._finish(abs_path, "skipped")
+                continue
+            known = entry.content_hash if entry and entry.same_pipeline(CHUNKER_VERSION, EMBEDDING_MODEL_NAME) else None
+            todo.append((abs_path, known))
+        return todo
+
+    def _finish(self, path, status):
+        with self._lock:
+            self.statuses[path] = status
+            self.stats[status] += 1
+
+    # --- 阶段 1: 解析 (进程池，有在途上限) ---
+    def _iter_parsed(self, todo):
+        archive_dir = DOCS_ARCHIVE_PATH
+        if self.workers <= 1 or len(todo) <= 1:
+            for abs_path, known in todo:
+                try:
+                    yield _parse_file(abs_path, archive_dir, known)
+                except Exception as e:
+                    print(f"❌ Error processing {abs_path}: {e}")
+                    self._finish(abs_path, "failed")
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        max_in_flight = self.workers * 2
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx) as pool:
+            pending = {}
+            items = iter(todo)
+            while True:
+                while len(pending) < max_in_flight:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    pending[pool.submit(_parse_file, item[0], archive_dir, item[1])] = item[0]
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    abs_path = pending.pop(fut)
+                    try:
+                        yield fut.result()
+                    except Exception as e:
+                        print(f"❌ Error processing {abs_path}: {e}")
+                        self._finish(abs_path, "failed")
+
+    # --- 阶段 2: 跨文件攒批向量化 ---
+    def _chunk_row(self, parsed, i, chunk):
+        return {
             "text": chunk['text'],
-            "source": final_source, 
+            "source": parsed.source,
             "line_range": f"{chunk['line_start']}-{chunk['line_end']}",
-            "location": chunk['location'], 
-            "type": "document"
-        })
-        
-    # 5. 写入 DB
-    is_compatible = db.check_schema_compatibility(collection_name, data[0])
-    
-    tbl = db.get_table(collection_name)
-    if tbl and is_compatible:
-        tbl.add(data)
-    else:
-        db.create_table(collection_name, data)
-        
-    print(f"✅ Ingested {len(data)} vectors to '{collection_name}'.")
+            "location": chunk['location'],
+            "type": "document",
+            "chunk_id": make_chunk_id(parsed.source, i),
+            "ingested_at": self.started_at,
+        }
+
+    def _is_duplicate(self, parsed, i, chunk, exclude):
+        """与已入库或本次已接收的片段近重复时记为引用，返回 True；否则登记指纹等待向量化。"""
+        fp = simhash(chunk["text"])
+        match = self.dedup.lookup(self.collection, fp, exclude, self._pending)
+        if match is None:
+            self._pending.add(make_chunk_id(parsed.source, i), parsed.source, fp)
+            return False
+        parsed.refs.append({**self._chunk_row(parsed, i, chunk), "canonical_id": match[0], "similarity": match[2]})
+        return True
 
-def main(input_path, collection="documents"):
+    def _embed_flush(self, buffer, write_q):
+        """buffer: [(parsed, chunk_index, chunk)]，一次性向量化后按文件送入写队列"""
+        if buffer:
+            start = time.perf_counter()
+            vectors = self.db.embed_documents([c["text"] for _, _, c in buffer])
+            self.timings["embed"] += time.perf_counter() - start
+            for (parsed, i, chunk), vec in zip(buffer, vectors):
+                parsed.rows.append({"vector": vec, **self._chunk_row(parsed, i, chunk)})
+            # 该文件所有片段都已向量化 -> 整体交给写线程 (put 在队列满时阻塞，形成背压)
+            for parsed in {id(p): p for p, _, _ in buffer}.values():
+                if parsed.complete:
+                    write_q.put(parsed)
+            buffer.clear()
+        # 只有引用的文件排在其引用的片段之后写入
+        for parsed in self._deferred:
+            write_q.put(parsed)
+        self._deferred.clear()
+
+    # --- 阶段 3: 合并写入 ---
+    def _writer(self, write_q):
+        ready = []
+        ready_rows = 0
+        while True:
+            parsed = write_q.get()
+            if parsed is not None:
+                ready.append(parsed)
+                ready_rows += len(parsed.rows)
+            if ready and (parsed is None or ready_rows >= self.write_batch_rows):
+                self._write_safely(ready)
+                ready, ready_rows = [], 0
+            if parsed is None:
+                return
+
+    def _write_safely(self, files):
+        """
+        写入一批并吞下异常：写入后的登记 (清单、归档引用) 出错时把尚未完成的文件记为失败，
+        写线程继续消费队列，否则生产者会永远阻塞在有界队列的 put 上。
+        """
+        try:
+            self._write_batch(files)
+        except Exception as e:
+            print(f"❌ Error recording batch of {len(files)} files: {e}")
+            for parsed in files:
+                if parsed.path not in self.statuses:
+                    self._finish(parsed.path, "failed")
+
+    def _write_batch(self, files):
+        start = time.perf_counter()
+        rows, refs, seen = [], [], set()
+        stale = []
+        batch_paths = {parsed.path for parsed in files}
+        for parsed in files:
+            entry = self._entries.get(parsed.path)
+            if parsed.shared:
+                # 共用的片段保持不动，只有换了内容且旧归档无人使用时才删除旧片段
+                if entry and entry.source != parsed.source and not self._shared_elsewhere(entry, batch_paths):
+                    stale.append(entry.source)
+                continue
+            if entry and (entry.source == parsed.source or not self._shared_elsewhere(entry, batch_paths)):
+                stale.append(entry.source)
+            if parsed.source not in stale and self.db.catalog.get(self.collection, parsed.source):
+                # 清单里没有却已有片段 (上次写入后登记失败)：按相同片段 ID 替换，不重复追加
+                stale.append(parsed.source)
+            for row in parsed.rows:
+                # 同一归档文件被多个路径引用时，片段 ID 相同，只保留一份
+                if row["chunk_id"] not in seen:
+                    seen.add(row["chunk_id"])
+                    rows.append(row)
+            for ref in parsed.refs:
+                if ref["chunk_id"] not in seen:
+                    seen.add(ref["chunk_id"])
+                    refs.append(ref)
+        try:
+            if not self._schema_checked and rows:
+                self._schema_checked = True
+                self.db.check_schema_compatibility(self.collection, rows[0])
+            hashes = {parsed.source: parsed.content_hash for parsed in files if not parsed.shared}
+            if rows or refs or stale:
+                self.db.replace_source_chunks(self.collection, rows, stale, hashes, refs=refs)
+        except Exception as e:
+            print(f"❌ Error writing batch of {len(files)} files: {e}")
+            for parsed in files:
+                self._finish(parsed.path, "failed")
+            return
+        self.timings["write"] += time.perf_counter() - start
+
+        for parsed in files:
+            entry = self._entries.get(parsed.path)
+            if parsed.shared:
+                original = self._accepted.get(parsed.source)
+                if original and self.statuses.get(original) == "failed":
+                    # 同一次入库中先写入的副本失败了，片段并不存在
+                    self._finish(parsed.path, "failed")
+                    continue
+                self._record(parsed, [make_chunk_id(parsed.source, i) for i in range(len(parsed.chunks))])
+            else:
+                self._record(parsed, [r["chunk_id"] for r in parsed.rows + parsed.refs])
+            self._release_stale(entry, parsed)
+            with self._lock:
+                self.chunks_done += len(parsed.rows) + len(parsed.refs)
+                self.deduped += len(parsed.refs)
+            self._finish(parsed.path, "replaced" if entry else "added")
+        dedup_note = f" ({len(refs)} near-duplicate chunks stored as references)" if refs else ""
+        print(f"✅ Ingested {len(rows)} vectors to '{self.collection}'{dedup_note}.")
+
+    def _shared_elsewhere(self, entry, replacing=()):
+        """
+        旧 source 是否仍被本集合的其他路径使用 (不同目录下同名同内容的文件共用一个归档)，是则保留其片段。
+        replacing: 同一批中也在被替换的路径，不算作仍在使用。
+        """
+        others = set(self.manifest.paths_for_source(self.collection, entry.source)) - {entry.path} - set(replacing)
+        return bool(others)
+
+    def _ingested_copy(self, parsed):
+        """
+        相同内容 (同一归档 source，片段 ID 相同) 是否已由其他路径入库：本次入库已接收，
+        或清单中有其他路径以相同的切片器与模型入库。是则不再向量化，避免重复行。
+        """
+        if parsed.source in self._accepted:
+            return True
+        for path in self.manifest.paths_for_source(self.collection, parsed.source):
+            other = self.manifest.get(self.collection, path) if path != parsed.path else None
+            if other and other.same_pipeline(CHUNKER_VERSION, EMBEDDING_MODEL_NAME):
+                return True
+        return False
+
+    def _record(self, parsed, chunk_ids):
+        self.manifest.upsert(ManifestEntry(
+            collection=self.collection, path=parsed.path, source=parsed.source,
+            content_hash=parsed.content_hash, size=parsed.size, mtime=parsed.mtime,
+            chunker_version=CHUNKER_VERSION, embedding_model=EMBEDDING_MODEL_NAME, chunk_ids=chunk_ids,
+        ))
+        self.db.archive.acquire(self.collection, parsed.source)
+
+    def _release_stale(self, entry, parsed):
+        """文件内容变化后，旧归档不再被本集合的任何路径引用时释放 (其他集合仍引用则保留文件)"""
+        if entry is None or entry.source == parsed.source:
+            return
+        self.db.archive.release(self.collection, entry.source)
+
+    def _handle_parsed(self, parsed, buffer, write_q):
+        entry = self._entries.get(parsed.path)
+        self.timings["parse"] += parsed.parse_seconds
+        if parsed.unchanged:
+            self.manifest.touch(self.collection, parsed.path, parsed.size, parsed.mtime)
+            print(f"⏭️ Unchanged, skipped: {parsed.path}")
+            self._finish(parsed.path, "skipped")
+            return
+        print(f"📄 Processing: {parsed.source}")
+        print(f"   -> Split into {len(parsed.chunks)} chunks.")
+        if not parsed.chunks:
+            # 空文件也记录清单，旧片段 (如有) 一并清除
+            if entry and not self._shared_elsewhere(entry):
+                self.db.delete_by_source(self.collection, entry.source, keep_archive=entry.source == parsed.source)
+            self._record(parsed, [])
+            self._finish(parsed.path, "empty")
+            return
+        if self._ingested_copy(parsed):
+            # 排在已接收的副本之后写入，只登记清单
+            print("   -> Same content already ingested from another path, recording path only.")
+            parsed.shared = True
+            self._deferred.append(parsed)
+            return
+        self._accepted[parsed.source] = parsed.path
+        # 旧版本的片段即将被替换，不作为去重目标
+        exclude = {parsed.source} | ({entry.source} if entry else set())
+        for i, chunk in enumerate(parsed.chunks):
+            if self.dedup and self._is_duplicate(parsed, i, chunk, exclude):
+                continue
+            buffer.append((parsed, i, chunk))
+            if len(buffer) >= self.embed_batch_size:
+                self._embed_flush(buffer, write_q)
+        if parsed.refs:
+            print(f"   -> {len(parsed.refs)} near-duplicate chunks stored as references.")
+        if not parsed.rows and parsed.complete:
+            self._deferred.append(parsed)
+
+    def _report(self, done, total, elapsed, final=False):
+        files_rate = done / elapsed if elapsed > 0 else 0.0
+        chunks_rate = self.chunks_done / elapsed if elapsed > 0 else 0.0
+        prefix = "🏁 Throughput" if final else "⏱️ Progress"
+        print(f"{prefix}: {done}/{total} files, {self.chunks_done} chunks in {elapsed:.1f}s "
+              f"({files_rate:.2f} files/s, {chunks_rate:.1f} chunks/s)")
+
+    def run(self, files):
+        start = time.perf_counter()
+        total = len(files)
+        todo = self._plan(files)
+        write_q = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        writer = threading.Thread(target=self._writer, args=(write_q,), name="kb-ingest-writer", daemon=True)
+        writer.start()
+        buffer = []
+        last_report = start
+        try:
+            for parsed in self._iter_parsed(todo):
+                try:
+                    self._handle_parsed(parsed, buffer, write_q)
+                except Exception as e:
+                    print(f"❌ Error processing {parsed.path}: {e}")
+                    self._finish(parsed.path, "failed")
+                now = time.perf_counter()
+                if self.progress_interval and now - last_report >= self.progress_interval:
+                    self._report(len(self.statuses), total, now - start)
+                    last_report = now
+            try:
+                self._embed_flush(buffer, write_q)
+            except Exception as e:
+                print(f"❌ Error embedding final batch: {e}")
+                for path in {p.path for p, _, _ in buffer}:
+                    self._finish(path, "failed")
+        finally:
+            write_q.put(None)
+            writer.join()
+        if self.stats["added"] or self.stats["replaced"]:
+            # CLI 进程即将退出，同步完成索引维护
+            self.db.maintain_indexes(self.collection, background=False)
+        if total > 1:
+            self._report(len(self.statuses), total, time.perf_counter() - start, final=True)
+        return self.stats
+
+def ingest_file(file_path, collection_name="documents"):
+    """
+    增量入库单个文件，返回状态: added / replaced / skipped / empty / failed。
+    未变化的文件 (清单中 stat 或内容哈希一致) 直接跳过，不重新切片和向量化。
+    """
+    pipeline = IngestPipeline(collection_name, workers=0)
+    pipeline.run([file_path])
+    return pipeline.statuses.get(os.path.abspath(file_path), "failed")
+
+def remove_file(file_path, collection_name="documents"):
+    """
+    源文件被删除后同步删除其片段 (按清单中的原始路径找到归档 source)，并清理归档副本。
+    未入库过的文件返回 False。
+    """
+    db = DBManager.get_instance()
+    abs_path = os.path.abspath(file_path)
+    entry = db.manifest.get(collection_name, abs_path)
+    if entry is None:
+        return False
+    if set(db.manifest.paths_for_source(collection_name, entry.source)) - {abs_path}:
+        # 其他位置还有相同内容的副本，片段继续保留
+        db.manifest.remove_path(collection_name, abs_path)
+        return True
+    # 删除片段并释放归档引用 (其他集合仍引用时保留归档文件)
+    db.delete_by_source(collection_name, entry.source)
+    return True
+
+def collect_files(input_path):
+    """递归查找支持的格式"""
+    files = []
+    for ext in SUPPORTED_EXTENSIONS:
+        files.extend(glob.glob(os.path.join(input_path, '**', f'*{ext}'), recursive=True))
+    return files
+
+def print_summary(stats):
+    """打印本次入库汇总"""
+    print(
+        f"📊 Summary: added {stats['added']}, replaced {stats['replaced']}, "
+        f"skipped {stats['skipped']}, empty {stats['empty']}, failed {stats['failed']}."
+    )
+
+def main(input_path, collection="documents", workers=None):
+    stats = {"added": 0, "replaced": 0, "skipped": 0, "empty": 0, "failed": 0}
     if os.path.isfile(input_path):
-        ingest_file(input_path, collection)
+        stats = IngestPipeline(collection, workers=0).run([input_path])
     elif os.path.isdir(input_path):
-        # 递归查找支持的格式
-        exts = ['*.docx', '*.pdf', '*.xlsx', '*.pptx', '*.md', '*.txt']
-        files = []
-        for ext in exts:
-            files.extend(glob.glob(os.path.join(input_path, '**', ext), recursive=True))
-            
+        files = collect_files(input_path)
         print(f"🔍 Found {len(files)} files in {input_path}")
-        for f in files:
-            try:
-                ingest_file(f, collection)
-            except Exception as e:
-                print(f"❌ Error processing {f}: {e}")
+        stats = IngestPipeline(collection, workers=workers).run(files)
+    print_summary(stats)
+    return stats
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python ingest.py <file_or_dir> [collection_name]")
-        sys.exit(1)
-    
-    target = sys.argv[1]
-    coll = sys.argv[2] if len(sys.argv) > 2 else "documents"
-    main(target, coll)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Knowledge Base Ingestion")
+    parser.add_argument("input_path", help="文件或目录路径")
+    parser.add_argument("collection", nargs="?", default="documents", help="集合名称")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="解析进程数 (默认按 CPU 核数)")
+    parser.add_argument("--watch", action="store_true", help="持续监听目录，增量同步变化与删除的文件")
+    parser.add_argument("--poll", action="store_true", help="监听时强制使用轮询 (不使用 watchdog)")
+    args = parser.parse_args()
+    if args.watch:
+        from skills.knowledge_base.scripts.watcher import watch
+        watch(args.input_path, args.collection, args.workers or 0, use_watchdog=False if args.poll else None)
+    else:
+        main(args.input_path, args.collection, args.workers)
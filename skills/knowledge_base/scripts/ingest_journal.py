@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import datetime
+import subprocess
+
+# 注意：本模块在 CLI 退出路径上导入，只依赖标准库 (不加载 lancedb / 嵌入模型)
+from skills.knowledge_base.scripts.meta_store import MetaStore
+
+# 入库任务日志：会话归档只写一条记录即可退出，由后台进程或下次启动时补做入库
+JOURNAL_PATH = os.path.join(os.path.expanduser("~/.zx-cli"), "memory", "ingest_journal.sqlite3")
+DRAIN_LOG_PATH = os.path.join(os.path.expanduser("~/.zx-cli"), "memory", "logs", "ingest_journal.log")
+MAX_ATTEMPTS = int(os.environ.get("ZX_KB_JOURNAL_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = float(os.environ.get("ZX_KB_JOURNAL_RETRY_SECONDS", "30"))   # 第 n 次失败后等待 base * 2^(n-1)
+LEASE_SECONDS = 1800         # 认领超过该时长仍未完成 (进程被杀) 的任务可被重新认领
+KEEP_DONE_DAYS = 30
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_journal (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    path        TEXT NOT NULL,
+    collection  TEXT NOT NULL,
+    status      TEXT NOT NULL,          -- pending / running / done / failed
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,                   -- added / replaced / skipped / empty
+    last_error  TEXT,
+    enqueued_at TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    next_run_at REAL NOT NULL DEFAULT 0,
+    claimed_by  INTEGER,
+    claimed_at  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_journal_status ON ingest_journal (status, next_run_at);
+"""
+
+OK_RESULTS = ("added", "replaced", "skipped", "empty")
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # 无权限发信号，但进程存在
+    return True
+
+
+class IngestJournal:
+    """
+    持久化的入库队列 (SQLite)。每条任务记录状态、尝试次数、结果与最近一次错误：
+    - enqueue: 退出路径上调用，只插入一行
+    - claim: 原子认领最早的可执行任务 (待执行、到达重试时间的失败任务、认领者已退出的任务)
+    - complete / fail: 记录结果；失败按指数退避重试，超过 MAX_ATTEMPTS 次标记为 failed
+    """
+
+    def __init__(self, path=None):
+        self.path = path or JOURNAL_PATH
+        self.meta = MetaStore(self.path)
+        self.meta.ensure_schema(_DDL)
+
+    def enqueue(self, path, collection="episodic_memory"):
+        now = _now()
+        with self.meta.transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO ingest_journal (path, collection, status, enqueued_at, updated_at) "
+                "VALUES (?, ?, 'pending', ?, ?)", (os.path.abspath(path), collection, now, now),
+            )
+            return cur.lastrowid
+
+    def claim(self, worker=None):
+        """认领一条任务并标记为 running，没有可执行任务时返回 None。"""
+        worker = worker or os.getpid()
+        now = time.time()
+        with self.meta.transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM ingest_journal WHERE (status = 'pending' AND next_run_at <= ?) "
+                "OR status = 'running' ORDER BY id", (now,),
+            ).fetchall()
+            for row in rows:
+                if row["status"] == "running" and _pid_alive(row["claimed_by"]) \
+                        and now - (row["claimed_at"] or 0) < LEASE_SECONDS:
+                    continue
+                conn.execute(
+                    "UPDATE ingest_journal SET status = 'running', claimed_by = ?, claimed_at = ?, updated_at = ? "
+                    "WHERE id = ?", (worker, now, _now(), row["id"]),
+                )
+                return dict(row)
+        return None
+
+    def complete(self, task_id, result):
+        self.meta.execute(
+            "UPDATE ingest_journal SET status = 'done', result = ?, attempts = attempts + 1, last_error = NULL, "
+            "claimed_by = NULL, updated_at = ? WHERE id = ?", (result, _now(), task_id),
+        )
+
+    def fail(self, task_id, error):
+        with self.meta.transaction() as conn:
+            row = conn.execute("SELECT attempts FROM ingest_journal WHERE id = ?", (task_id,)).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+            next_run = time.time() + RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            conn.execute(
+                "UPDATE ingest_journal SET status = ?, attempts = ?, last_error = ?, next_run_at = ?, "
+                "claimed_by = NULL, updated_at = ? WHERE id = ?",
+                (status, attempts, str(error)[:500], next_run, _now(), task_id),
+            )
+        return status
+
+    def retry_failed(self):
+        """把永久失败的任务重新放回队列 (如修复依赖之后)。"""
+        return self.meta.execute(
+            "UPDATE ingest_journal SET status = 'pending', attempts = 0, next_run_at = 0, updated_at = ? "
+            "WHERE status = 'failed'", (_now(),),
+        )
+
+    def prune(self, keep_days=KEEP_DONE_DAYS):
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=keep_days)).isoformat(timespec="seconds")
+        return self.meta.execute("DELETE FROM ingest_journal WHERE status = 'done' AND updated_at < ?", (cutoff,))
+
+    def has_work(self):
+        """是否有待执行或可能中断的任务 (启动时决定要不要拉起后台进程)。"""
+        return self.meta.query_one(
+            "SELECT 1 FROM ingest_journal WHERE status IN ('pending', 'running') LIMIT 1"
+        ) is not None
+
+    def get(self, task_id):
+        row = self.meta.query_one("SELECT * FROM ingest_journal WHERE id = ?", (task_id,))
+        return dict(row) if row else None
+
+    def counts(self):
+        rows = self.meta.query("SELECT status, COUNT(*) AS n FROM ingest_journal GROUP BY status")
+        return {r["status"]: r["n"] for r in rows}
+
+    def entries(self, status=None, limit=20):
+        sql, params = "SELECT * FROM ingest_journal", []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(r) for r in self.meta.query(sql, params)]
+
+
+def _default_ingest(path, collection):
+    from skills.knowledge_base.scripts.ingest import ingest_file
+    from skills.knowledge_base.scripts.turn_memory import backfill_session
+    # 按轮次写的会话日志只补齐缺失的轮次，其余文件 (退出时整段归档的会话) 按普通文档入库
+    result = backfill_session(path, collection)
+    return result if result is not None else ingest_file(path, collection)
+
+
+def drain(journal, ingest_fn=None, max_tasks=None):
+    """
+    依次执行可认领的任务直到队列为空 (或达到 max_tasks)，返回 {结果: 数量}。
+    ingest_fn(path, collection) 返回 ingest_file 的状态；抛异常或返回 failed 视为失败。
+    """
+    ingest_fn = ingest_fn or _default_ingest
+    summary = {}
+    done = 0
+    while max_tasks is None or done < max_tasks:
+        task = journal.claim()
+        if task is None:
+            break
+        done += 1
+        if not os.path.exists(task["path"]):
+            journal.fail(task["id"], f"file not found: {task['path']}")
+            outcome = "missing"
+        else:
+            try:
+                result = ingest_fn(task["path"], task["collection"])
+            except Exception as e:
+                result, error = "failed", e
+            else:
+                error = f"ingest returned {result}"
+            if result in OK_RESULTS:
+                journal.complete(task["id"], result)
+                outcome = result
+            else:
+                outcome = "retry" if journal.fail(task["id"], error) == "pending" else "failed"
+        summary[outcome] = summary.get(outcome, 0) + 1
+    journal.prune()
+    return summary
+
+
+def spawn_drainer(log_path=None):
+    """
+    拉起独立的后台进程执行 drain (不随 CLI 退出而终止，输出写入日志)。
+    进程被杀也没关系：未完成的任务留在日志中，下次启动时继续。
+    """
+    log_path = log_path or DRAIN_LOG_PATH
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manage.py")
+    with open(log_path, "a", encoding="utf-8") as log:
+        return subprocess.Popen(
+            [sys.executable, script, "journal", "--drain"],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True, close_fds=True,
+        )
@@ -0,0 +1,98 @@
+import os
+import time
+from datetime import timedelta
+
+from skills.knowledge_base.scripts.metrics import summarize_latencies
+from skills.knowledge_base.scripts.vector_precision import (
+    table_precision, int8_search, decode_vectors, VECTOR_COLUMN, SCALE_COLUMN,
+)
+
+# 表维护配置 (均可通过环境变量覆盖)
+# 旧版本保留天数：更早的版本在 optimize 时被清理 (正在读旧版本的其他进程需在窗口内完成)
+VERSION_RETENTION_DAYS = float(os.environ.get("ZX_KB_VERSION_RETENTION_DAYS", "7"))
+# 小碎片数达到该值时，写入后的后台维护顺带压缩
+COMPACT_SMALL_FRAGMENTS = int(os.environ.get("ZX_KB_COMPACT_SMALL_FRAGMENTS", "32"))
+PROBE_ROUNDS = 20
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def table_health(tbl, path=None):
+    """碎片、版本与磁盘占用概况。path 为表目录 (含所有旧版本文件)。"""
+    stats = tbl.stats()
+    fragments = stats["fragment_stats"]
+    return {
+        "rows": stats["num_rows"],
+        "fragments": fragments["num_fragments"],
+        "small_fragments": fragments["num_small_fragments"],
+        "versions": len(tbl.list_versions()),
+        "data_bytes": stats["total_bytes"],
+        "disk_bytes": _dir_size(path) if path else None,
+    }
+
+
+def needs_compaction(tbl, threshold=COMPACT_SMALL_FRAGMENTS):
+    return tbl.stats()["fragment_stats"]["num_small_fragments"] >= threshold
+
+
+def compact_if_fragmented(tbl, threshold=COMPACT_SMALL_FRAGMENTS, retention_days=VERSION_RETENTION_DAYS):
+    """写入后的机会式维护：小碎片过多时合并碎片并清理过期版本，返回是否执行。"""
+    if not needs_compaction(tbl, threshold):
+        return False
+    tbl.optimize(cleanup_older_than=timedelta(days=retention_days))
+    return True
+
+
+def probe_latency(tbl, rounds=PROBE_ROUNDS, k=10):
+    """用表内向量作为查询，测量向量检索延迟分位数。"""
+    columns = [c for c in (VECTOR_COLUMN, SCALE_COLUMN) if c in tbl.schema.names]
+    samples = tbl.search().select(columns).limit(rounds).to_arrow()
+    if samples.num_rows == 0:
+        return summarize_latencies([])
+    int8 = table_precision(tbl) == "int8"
+    latencies = []
+    for vec in decode_vectors(samples):
+        start = time.perf_counter()
+        if int8:
+            int8_search(tbl, vec, k)
+        else:
+            tbl.search(vec).limit(k).to_list()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize_latencies(latencies)
+
+
+def optimize_collection(db, table_name, retention_days=VERSION_RETENTION_DAYS, probe=True):
+    """
+    手动维护一个集合：
+    1. 记录碎片数、版本数、磁盘占用与检索延迟
+    2. 合并小碎片 (compaction)，清理早于保留窗口的旧版本，并把新行合并进已有索引
+    3. 按索引生命周期规则补建/重建索引
+    4. 再次记录，返回前后对比
+    """
+    tbl = db.get_table(table_name)
+    if tbl is None:
+        raise ValueError(f"知识库 '{table_name}' 不存在")
+    path = db.table_path(table_name)
+    before = table_health(tbl, path)
+    if probe:
+        before["latency"] = probe_latency(tbl)
+
+    start = time.perf_counter()
+    tbl.optimize(cleanup_older_than=timedelta(days=retention_days))
+    actions = db.maintain_indexes(table_name, background=False) or []
+    elapsed = time.perf_counter() - start
+
+    after = table_health(tbl, path)
+    if probe:
+        after["latency"] = probe_latency(tbl)
+    return {"before": before, "after": after, "index_actions": actions, "seconds": elapsed,
+            "retention_days": retention_days}
@@ -8,34 +8,59 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(CURRENT_DIR)))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
+from fastembed import TextEmbedding
+
 from skills.knowledge_base.scripts.db_manager import DBManager
+from skills.knowledge_base.scripts import index_manager
+from skills.knowledge_base.scripts import evaluation
+from skills.knowledge_base.scripts import vector_precision
+from skills.knowledge_base.scripts import maintenance
+from skills.knowledge_base.scripts import schema_migrations
+from skills.knowledge_base.scripts import chunker
+from skills.knowledge_base.scripts import embedding_engine
+from skills.knowledge_base.scripts import archive_store
+from skills.knowledge_base.scripts.ingest_journal import IngestJournal, drain
+from skills.knowledge_base.scripts.query import search_rows, SEARCH_MODES
+from skills.knowledge_base.scripts.rerank import get_reranker
+
+def _format_size(num_bytes):
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f}{unit}" if unit == "B" else f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}GB"
 
-def list_knowledge(collection="documents"):
+def list_knowledge(collection="documents", refresh=False):
     db = DBManager.get_instance()
-    stats = db.list_sources(collection)
-    if not stats:
+    # 清单来自来源目录 (SQLite)，耗时与向量库总行数无关
+    if not db.ensure_catalog(collection, refresh=refresh):
         return f"知识库 '{collection}' 为空或不存在。"
-    
     output = [f"--- 知识库 '{collection}' 索引清单 ---"]
-    total_chunks = 0
-    for source, count in stats.items():
-        output.append(f"- {source} ({count} 片段)")
-        total_chunks += count
-    output.append(f"\n总计: {len(stats)} 个文件, {total_chunks} 个片段。")
+    files = total_chunks = total_bytes = 0
+    # 分页流式读取，逐条生成输出行
+    for e in db.catalog.iter_entries(collection):
+        output.append(f"- {e['source']} ({e['chunks']} 片段, {_format_size(e['bytes'])}, 入库于 {e['ingested_at']})")
+        files += 1
+        total_chunks += e["chunks"]
+        total_bytes += e["bytes"]
+    if not files:
+        return f"知识库 '{collection}' 为空或不存在。"
+    output.append(f"\n总计: {files} 个文件, {total_chunks} 个片段, {_format_size(total_bytes)}。")
     return "\n".join(output)
 
 def delete_knowledge(source_file, collection="documents"):
     db = DBManager.get_instance()
-    # 简单的存在性检查（通过 list）
-    stats = db.list_sources(collection)
+    # 存在性检查走来源目录的主键 / 文件名索引，不扫描向量表
+    if not db.ensure_catalog(collection):
+        return f"错误: 知识库中未找到文件 '{source_file}'。"
     
     # 这里的 source_file 是归档后的绝对路径
     # 如果用户传的是文件名（如 'report.pdf'），我们可能需要模糊匹配？
     # 为了精确，我们要求用户传完整路径。或者 manage list 返回的就是完整路径。
     
-    if source_file not in stats:
+    if db.catalog.get(collection, source_file) is None:
         # 尝试匹配文件名
-        matches = [s for s in stats.keys() if os.path.basename(s) == source_file]
+        matches = db.catalog.find_by_name(collection, source_file)
         if len(matches) == 1:
             source_file = matches[0] # 自动修正为完整路径
         elif len(matches) > 1:
@@ -45,20 +70,257 @@ def delete_knowledge(source_file, collection="documents"):
         
     db.delete_by_source(collection, source_file)
     
-    # [新增] 物理删除归档文件
-    # 如果 source_file 存在于 DOCS_ARCHIVE_PATH 中，则删除
-    # 注意 source_file 可能是绝对路径
-    if os.path.exists(source_file) and os.path.isfile(source_file):
-        try:
-            os.remove(source_file)
+    # 归档副本按引用计数清理 (delete_by_source 已释放本集合的引用)，其他集合仍引用时保留
+    if archive_store.is_archived(source_file, db.archive.archive_dir):
+        if os.path.exists(source_file):
+            msg = (f"✅ 已从知识库删除: {os.path.basename(source_file)} "
+                   f"(归档副本仍被 {db.archive.refcount(source_file)} 个集合引用，予以保留)")
+        else:
             msg = f"✅ 已成功从知识库及归档目录删除: {os.path.basename(source_file)}"
-        except Exception as e:
-            msg = f"⚠️ 已从知识库删除，但物理文件删除失败: {e}"
+    # 归档目录之外的来源 (如会话日志) 是用户自己的文件，只删除索引
+    elif os.path.exists(source_file):
+        msg = f"✅ 已从知识库删除索引: {os.path.basename(source_file)} (源文件不在归档目录中，予以保留)"
     else:
         msg = f"✅ 已成功从知识库删除索引 (文件已不存在): {source_file}"
         
     return msg
 
+def index_knowledge(collection="documents", build=False, bench=False, k=10, samples=50):
+    """查看向量索引状态，可选强制建索引与召回/延迟对比"""
+    db = DBManager.get_instance()
+    tbl = db.get_table(collection)
+    if not tbl:
+        return f"知识库 '{collection}' 为空或不存在。"
+
+    output = []
+    if build:
+        index_manager.build_vector_index(tbl)
+        output.append(f"✅ 已为 '{collection}' 构建 {index_manager.INDEX_TYPE} 索引。")
+
+    status = index_manager.vector_index_status(tbl)
+    output.append(f"--- 知识库 '{collection}' 向量索引 ---")
+    output.append(f"总行数: {status['rows']} (建索引阈值: {status['min_rows']})")
+    if status["indexed"]:
+        output.append(f"索引: {status['index_type']} ({status['distance_type']})")
+        output.append(f"已索引: {status['num_indexed_rows']} | 未索引: {status['num_unindexed_rows']}")
+    else:
+        output.append("索引: 无 (暴力扫描)")
+    output.append(f"查询参数: nprobes={index_manager.NPROBES}, refine_factor={index_manager.REFINE_FACTOR}")
+
+    if bench:
+        output.append(f"\n--- Recall@{k} vs Latency ({samples} queries) ---")
+        for row in index_manager.benchmark_index(tbl, k=k, samples=samples):
+            output.append(f"{row['config']:<28} recall={row['recall']:.3f}  mean={row['mean_ms']:.2f}ms  p95={row['p95_ms']:.2f}ms")
+    return "\n".join(output)
+
+def precision_knowledge(collection="documents", target=None, report=False, k=10, samples=50):
+    """查看/转换集合的向量存储精度，可选输出各精度的体积与召回对比"""
+    db = DBManager.get_instance()
+    tbl = db.get_table(collection)
+    if not tbl:
+        return f"知识库 '{collection}' 为空或不存在。"
+
+    output = []
+    if target:
+        result = vector_precision.convert_table(db, collection, target)
+        tbl = db.get_table(collection)
+        if result["from"] == result["to"]:
+            output.append(f"ℹ️ '{collection}' 已是 {target}，无需转换。")
+        else:
+            output.append(
+                f"✅ 已将 '{collection}' 从 {result['from']} 转换为 {result['to']} ({result['rows']} 行): "
+                f"{_format_size(result['before_bytes'])} -> {_format_size(result['after_bytes'])}"
+            )
+    output.append(f"--- 知识库 '{collection}' 向量精度: {vector_precision.table_precision(tbl)} ---")
+
+    if report:
+        output.append(f"\n--- 精度对比 (recall@{k}, {samples} queries，以 float32 暴力检索为真值) ---")
+        for row in vector_precision.precision_report(tbl, k=k, samples=samples):
+            output.append(
+                f"{row['precision']:<8} {row['bytes_per_vector']:>5} B/向量  向量总量 {_format_size(row['vector_bytes']):>9}  "
+                f"节省 {row['reduction']:.0%}  recall={row['recall']:.3f}"
+            )
+    return "\n".join(output)
+
+def schema_knowledge(collection="all", migrate=False):
+    """查看各集合的结构版本，--migrate 原地升级到最新 (只补列，不重算向量)"""
+    db = DBManager.get_instance()
+    names = db.list_tables() if collection == "all" else [collection]
+    output = [f"--- 表结构版本 (最新 v{schema_migrations.SCHEMA_VERSION}) ---"]
+    for name in names:
+        tbl = db.get_table(name)
+        if not tbl:
+            output.append(f"知识库 '{name}' 为空或不存在。")
+            continue
+        if migrate:
+            for version, description, columns in db.migrate_table(name):
+                output.append(f"♻️ {name}: v{version} {description} {columns}")
+        version = schema_migrations.schema_version(tbl)
+        status = "✅" if version >= schema_migrations.SCHEMA_VERSION else "⚠️ 待迁移"
+        model, dim = embedding_engine.table_model(tbl)
+        output.append(f"{name}: v{version} {status} | {model} ({dim} 维)")
+    return "\n".join(output)
+
+def optimize_knowledge(collection="documents", retention_days=maintenance.VERSION_RETENTION_DAYS, probe=True):
+    """合并碎片、清理旧版本、按需重建索引，输出前后对比"""
+    db = DBManager.get_instance()
+    names = db.list_tables() if collection == "all" else [collection]
+    output = []
+    for name in names:
+        if not db.get_table(name):
+            output.append(f"知识库 '{name}' 为空或不存在。")
+            continue
+        result = maintenance.optimize_collection(db, name, retention_days, probe)
+        before, after = result["before"], result["after"]
+        output.append(f"--- 维护 '{name}' (保留 {retention_days:g} 天内的版本, 耗时 {result['seconds']:.2f}s) ---")
+        output.append(f"碎片: {before['fragments']} -> {after['fragments']} (小碎片 {before['small_fragments']} -> {after['small_fragments']})")
+        output.append(f"版本: {before['versions']} -> {after['versions']}")
+        output.append(f"磁盘: {_format_size(before['disk_bytes'])} -> {_format_size(after['disk_bytes'])}")
+        if probe:
+            output.append(
+                f"检索延迟 p50/p95: {before['latency']['p50_ms']:.1f}/{before['latency']['p95_ms']:.1f}ms -> "
+                f"{after['latency']['p50_ms']:.1f}/{after['latency']['p95_ms']:.1f}ms"
+            )
+        if result["index_actions"]:
+            output.append(f"索引: {', '.join(result['index_actions'])}")
+    return "\n".join(output)
+
+def eval_knowledge(eval_set, collection="documents", k=5, modes=SEARCH_MODES, rerank=False):
+    """在固定评测集上对比各检索模式的质量与延迟；rerank=True 时追加各模式精排前后的对比"""
+    db = DBManager.get_instance()
+    tbl = db.get_table(collection)
+    if not tbl:
+        return f"知识库 '{collection}' 为空或不存在。"
+    cases = evaluation.load_eval_set(eval_set)
+    if rerank:
+        get_reranker().load()
+    results = {}
+    for mode in modes:
+        results[mode] = evaluation.evaluate(cases, lambda q, n: search_rows(db, tbl, q, n, mode), k)
+        if rerank:
+            results[f"{mode}+rerank"] = evaluation.evaluate(
+                cases, lambda q, n: search_rows(db, tbl, q, n, mode, rerank=True), k)
+    return evaluation.format_report(f"检索评测 '{collection}' ({len(cases)} queries)", results, k)
+
+def chunks_knowledge(input_path, eval_set=None, k=5):
+    """对比旧的固定行窗口切片与结构感知切片；给出评测集时附带检索质量"""
+    from skills.knowledge_base.scripts.ingest import collect_files
+    files = [input_path] if os.path.isfile(input_path) else collect_files(input_path)
+    if not files:
+        return f"未找到可切片的文件: {input_path}"
+    cases = evaluation.load_eval_set(eval_set) if eval_set else None
+    embed_fn = DBManager.get_instance().embed_documents if cases else None
+    report = chunker.compare_chunkers(files, cases, embed_fn, k)
+
+    output = [f"--- 切片对比 ({len(files)} 个文件，token 上限 {chunker.CHUNK_MAX_TOKENS}) ---"]
+    for name, r in report.items():
+        output.append(
+            f"{name:<12} 片段 {r['chunks']:>5} ({r['chunks_per_doc']:.1f}/文档)  平均 {r['avg_tokens']:.0f} tokens  "
+            f"最大 {r['max_tokens']}  超上限 {r['over_limit']}  跨位置 {r['cross_location']}  重复 {r['redundancy']:.0%}"
+        )
+    if cases:
+        output.append("")
+        output.append(evaluation.format_report(f"切片检索评测 ({len(cases)} queries, 向量检索)",
+                                               {name: r["eval"] for name, r in report.items()}, k))
+    return "\n".join(output)
+
+def dedup_knowledge(collection="documents", rebuild=False):
+    """近重复片段统计：向量片段数、引用数与去重比例"""
+    db = DBManager.get_instance()
+    tbl = db.get_table(collection)
+    if not tbl:
+        return f"知识库 '{collection}' 为空或不存在。"
+    output = []
+    if rebuild:
+        count = db.dedup.rebuild(collection, tbl)
+        output.append(f"✅ 已为 '{collection}' 登记 {count} 个片段指纹 (已有的重复片段保持不变，之后的入库据此去重)。")
+    stats = db.dedup.stats(collection)
+    output.append(f"--- 近重复抑制 '{collection}' (SimHash 相似度 >= {stats['threshold']:.2f}) ---")
+    output.append(f"向量片段: {stats['vectors']} | 引用片段: {stats['refs']} | 去重比例: {stats['ratio']:.1%}")
+    for source, count in stats["top_canonical"]:
+        output.append(f"  {os.path.basename(source)}: 被引用 {count} 次")
+    return "\n".join(output)
+
+def journal_knowledge(run_drain=False, retry=False, limit=10):
+    """记忆入库任务日志：各状态任务数与最近的失败；--drain 执行全部可执行任务"""
+    journal = IngestJournal()
+    output = []
+    if retry:
+        count = journal.retry_failed()
+        output.append(f"🔁 已把 {count} 个失败任务放回队列。")
+    if run_drain:
+        summary = drain(journal)
+        detail = ", ".join(f"{k} {v}" for k, v in sorted(summary.items())) or "无可执行任务"
+        output.append(f"✅ 入库任务执行完毕: {detail}")
+    counts = journal.counts()
+    output.append("--- 记忆入库任务日志 ---")
+    output.append(" | ".join(f"{s}: {counts.get(s, 0)}" for s in ("pending", "running", "done", "failed")))
+    problems = [e for e in journal.entries(limit=limit) if e["last_error"]]
+    for e in problems:
+        output.append(f"  #{e['id']} [{e['status']}] {os.path.basename(e['path'])} "
+                      f"(尝试 {e['attempts']} 次): {e['last_error']}")
+    return "\n".join(output)
+
+def cache_knowledge(clear=False):
+    """查看或清空向量缓存"""
+    db = DBManager.get_instance()
+    cache = db.embedding_cache
+    if cache is None:
+        return "向量缓存已关闭 (ZX_KB_EMBED_CACHE=0)。"
+    if clear:
+        removed = cache.clear()
+        return f"✅ 已清空向量缓存 ({removed} 条)。"
+    stats = cache.stats()
+    return "\n".join([
+        f"--- 向量缓存 ({stats['model']}) ---",
+        f"内存: {stats['memory_entries']} 条 | 磁盘: {stats['disk_entries']} 条",
+        f"本进程命中: 内存 {stats['memory_hits']} / 磁盘 {stats['disk_hits']} / 未命中 {stats['misses']}",
+    ])
+
+def embed_bench_knowledge(batches="64,256", threads="", parallel="", count=512, model=None):
+    """按批大小 / ONNX 线程数 / 并行进程数的组合测量向量化吞吐量 (embeddings/s)，用于确定入库机器规格"""
+    model = model or embedding_engine.EMBED_MODEL
+    texts = embedding_engine.bench_texts(count)
+    results = embedding_engine.benchmark(TextEmbedding, embedding_engine.parse_grid(batches, threads, parallel),
+                                         texts, model_name=model)
+    dim = results[0]["dim"] if results else 0
+    output = [f"--- 向量化吞吐量: {model} ({dim} 维, {len(texts)} 段, CPU 核数 {os.cpu_count()}) ---"]
+    best = max(results, key=lambda r: r["per_s"], default=None)
+    for row in results:
+        threads_label = row["threads"] or "auto"
+        parallel_label = "off" if row["parallel"] is None else row["parallel"]
+        mark = "  ⭐" if row is best else ""
+        output.append(f"batch={row['batch_size']:<5} threads={threads_label:<5} parallel={parallel_label:<5} "
+                      f"{row['per_s']:>8.1f} embeddings/s  ({row['seconds']:.2f}s){mark}")
+    if best:
+        env = [f"ZX_KB_EMBED_BATCH={best['batch_size']}"]
+        if best["threads"]:
+            env.append(f"ZX_KB_EMBED_THREADS={best['threads']}")
+        if best["parallel"] is not None:
+            env.append(f"ZX_KB_EMBED_PARALLEL={best['parallel']}")
+        output.append(f"\n建议: {' '.join(env)}")
+    return "\n".join(output)
+
+def archive_knowledge(gc=False):
+    """查看内容寻址归档的占用与引用，--gc 回收没有任何集合引用的归档文件"""
+    db = DBManager.get_instance()
+    output = []
+    if gc:
+        # 先确保各集合的来源目录可用，据此补登记升级前入库的旧归档引用
+        referenced = set()
+        for name in db.list_tables():
+            if db.ensure_catalog(name):
+                referenced.update((name, source) for source in db.catalog.counts(name))
+        removed = db.archive.gc(referenced)
+        output.append(f"✅ 已回收 {removed} 个未被引用的归档文件。")
+    stats = db.archive.stats()
+    output += [
+        f"--- 文档归档 ({db.archive.archive_dir}) ---",
+        f"文件: {stats['files']} 个 | 实际存储: {stats['objects']} 份, {_format_size(stats['physical_bytes'])}",
+        f"引用: {stats['refs']} 个 (集合, 文件) | 去重节省: {_format_size(stats['saved_bytes'])}",
+    ]
+    return "\n".join(output)
+
 def main():
     parser = argparse.ArgumentParser(description="Knowledge Base Management Tool")
     subparsers = parser.add_subparsers(dest="command", required=True)
@@ -66,18 +328,109 @@ def main():
     # List command
     cmd_list = subparsers.add_parser("list", help="List all indexed files")
     cmd_list.add_argument("--collection", "-c", default="documents")
+    cmd_list.add_argument("--refresh", action="store_true", help="Rebuild the source catalog from the table")
     
     # Delete command
     cmd_del = subparsers.add_parser("delete", help="Delete a file from index")
     cmd_del.add_argument("filename", help="Exact filename to delete (e.g., 'report.pdf')")
     cmd_del.add_argument("--collection", "-c", default="documents")
     
+    # Index command
+    cmd_idx = subparsers.add_parser("index", help="Show vector index status")
+    cmd_idx.add_argument("--collection", "-c", default="documents")
+    cmd_idx.add_argument("--build", action="store_true", help="Force (re)build the vector index")
+    cmd_idx.add_argument("--bench", action="store_true", help="Report recall@k vs latency against brute force")
+    cmd_idx.add_argument("--k", type=int, default=10)
+    cmd_idx.add_argument("--samples", type=int, default=50)
+    
+    # Eval command
+    cmd_eval = subparsers.add_parser("eval", help="Compare search modes on a fixed eval set")
+    cmd_eval.add_argument("eval_set", help="JSONL file: {\"query\": ..., \"expected\": [...]}")
+    cmd_eval.add_argument("--collection", "-c", default="documents")
+    cmd_eval.add_argument("--k", type=int, default=5)
+    cmd_eval.add_argument("--modes", default=",".join(SEARCH_MODES))
+    cmd_eval.add_argument("--rerank", action="store_true", help="Also report each mode with cross-encoder reranking")
+    
+    # Precision command
+    cmd_prec = subparsers.add_parser("precision", help="Show or convert vector storage precision")
+    cmd_prec.add_argument("--collection", "-c", default="documents")
+    cmd_prec.add_argument("--set", dest="target", choices=vector_precision.PRECISIONS, help="Convert the collection")
+    cmd_prec.add_argument("--report", action="store_true", help="Compare size and recall across precisions")
+    cmd_prec.add_argument("--k", type=int, default=10)
+    cmd_prec.add_argument("--samples", type=int, default=50)
+    
+    # Schema command
+    cmd_schema = subparsers.add_parser("schema", help="Show schema versions, optionally migrate in place")
+    cmd_schema.add_argument("--collection", "-c", default="all", help="Collection name, or 'all'")
+    cmd_schema.add_argument("--migrate", action="store_true")
+    
+    # Optimize command
+    cmd_opt = subparsers.add_parser("optimize", help="Compact fragments, prune old versions, refresh indexes")
+    cmd_opt.add_argument("--collection", "-c", default="documents", help="Collection name, or 'all'")
+    cmd_opt.add_argument("--retention-days", type=float, default=maintenance.VERSION_RETENTION_DAYS)
+    cmd_opt.add_argument("--no-probe", action="store_true", help="Skip the before/after latency probe")
+    
+    # Chunks command
+    cmd_chunks = subparsers.add_parser("chunks", help="Compare the line-window and structure-aware chunkers")
+    cmd_chunks.add_argument("input_path", help="File or directory")
+    cmd_chunks.add_argument("--eval", dest="eval_set", help="Eval set (JSONL) for retrieval quality")
+    cmd_chunks.add_argument("--k", type=int, default=5)
+    
+    # Dedup command
+    cmd_dedup = subparsers.add_parser("dedup", help="Show near-duplicate suppression stats")
+    cmd_dedup.add_argument("--collection", "-c", default="documents")
+    cmd_dedup.add_argument("--rebuild", action="store_true", help="Fingerprint chunks ingested before dedup existed")
+    
+    # Journal command
+    cmd_journal = subparsers.add_parser("journal", help="Show the episodic-memory ingest journal")
+    cmd_journal.add_argument("--drain", action="store_true", help="Run all due ingest tasks now")
+    cmd_journal.add_argument("--retry", action="store_true", help="Requeue permanently failed tasks")
+    cmd_journal.add_argument("--limit", type=int, default=10)
+    
+    # Cache command
+    cmd_cache = subparsers.add_parser("cache", help="Show or clear the embedding cache")
+    cmd_cache.add_argument("--clear", action="store_true")
+    
+    # Archive command
+    cmd_archive = subparsers.add_parser("archive", help="Show document archive usage and refcounts")
+    cmd_archive.add_argument("--gc", action="store_true", help="Remove archived files no collection references")
+    
+    # Embed-bench command
+    cmd_ebench = subparsers.add_parser("embed-bench", help="Measure embeddings/s across batch, thread and process settings")
+    cmd_ebench.add_argument("--batch", default="64,256", help="Comma-separated batch sizes")
+    cmd_ebench.add_argument("--threads", default="", help="Comma-separated ONNX thread counts ('auto' = onnxruntime default)")
+    cmd_ebench.add_argument("--parallel", default="", help="Comma-separated worker process counts ('off', 0 = all cores)")
+    cmd_ebench.add_argument("--texts", type=int, default=512, help="Number of synthetic passages to embed")
+    cmd_ebench.add_argument("--model", default=None, help="Embedding model (default: ZX_KB_EMBED_MODEL)")
+    
     args = parser.parse_args()
     
     if args.command == "list":
-        print(list_knowledge(args.collection))
+        print(list_knowledge(args.collection, args.refresh))
     elif args.command == "delete":
         print(delete_knowledge(args.filename, args.collection))
+    elif args.command == "index":
+        print(index_knowledge(args.collection, args.build, args.bench, args.k, args.samples))
+    elif args.command == "eval":
+        print(eval_knowledge(args.eval_set, args.collection, args.k, args.modes.split(","), args.rerank))
+    elif args.command == "precision":
+        print(precision_knowledge(args.collection, args.target, args.report, args.k, args.samples))
+    elif args.command == "schema":
+        print(schema_knowledge(args.collection, args.migrate))
+    elif args.command == "optimize":
+        print(optimize_knowledge(args.collection, args.retention_days, not args.no_probe))
+    elif args.command == "chunks":
+        print(chunks_knowledge(args.input_path, args.eval_set, args.k))
+    elif args.command == "dedup":
+        print(dedup_knowledge(args.collection, args.rebuild))
+    elif args.command == "journal":
+        print(journal_knowledge(args.drain, args.retry, args.limit))
+    elif args.command == "cache":
+        print(cache_knowledge(args.clear))
+    elif args.command == "archive":
+        print(archive_knowledge(args.gc))
+    elif args.command == "embed-bench":
+        print(embed_bench_knowledge(args.batch, args.threads, args.parallel, args.texts, args.model))
 
 if __name__ == "__main__":
     main()
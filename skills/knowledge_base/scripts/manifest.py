@@ -0,0 +1,115 @@
+import json
+import datetime
+from dataclasses import dataclass, field
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    collection      TEXT NOT NULL,
+    path            TEXT NOT NULL,
+    source          TEXT NOT NULL,
+    content_hash    TEXT NOT NULL,
+    size            INTEGER NOT NULL,
+    mtime           REAL NOT NULL,
+    chunker_version TEXT NOT NULL,
+    embedding_model TEXT NOT NULL,
+    chunk_ids       TEXT NOT NULL,
+    ingested_at     TEXT NOT NULL,
+    PRIMARY KEY (collection, path)
+);
+CREATE INDEX IF NOT EXISTS idx_manifest_source ON ingest_manifest (collection, source);
+"""
+
+
+@dataclass
+class ManifestEntry:
+    collection: str
+    path: str
+    source: str
+    content_hash: str
+    size: int
+    mtime: float
+    chunker_version: str
+    embedding_model: str
+    chunk_ids: list = field(default_factory=list)
+    ingested_at: str = ""
+
+    def same_pipeline(self, chunker_version, embedding_model):
+        """切片器与模型未变时，旧向量仍然有效。"""
+        return self.chunker_version == chunker_version and self.embedding_model == embedding_model
+
+
+class IngestManifest:
+    """
+    入库清单：记录每个源文件 (按原始路径) 的内容哈希、切片器版本、模型与片段 ID。
+    用于增量入库：未变化的文件 O(1) 跳过，变化的文件整体替换旧片段。
+    """
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.meta.ensure_schema(_DDL)
+
+    def get(self, collection, path):
+        row = self.meta.query_one(
+            "SELECT * FROM ingest_manifest WHERE collection = ? AND path = ?", (collection, path)
+        )
+        return self._to_entry(row) if row else None
+
+    def is_fresh(self, entry, size, mtime, chunker_version, embedding_model):
+        """快速路径：大小与修改时间都没变，则无需重新计算哈希。"""
+        return (
+            entry is not None
+            and entry.size == size
+            and entry.mtime == mtime
+            and entry.same_pipeline(chunker_version, embedding_model)
+        )
+
+    def touch(self, collection, path, size, mtime):
+        """内容没变但 stat 变了 (如 touch/复制)，只刷新 stat 以便下次走快速路径。"""
+        self.meta.execute(
+            "UPDATE ingest_manifest SET size = ?, mtime = ? WHERE collection = ? AND path = ?",
+            (size, mtime, collection, path),
+        )
+
+    def upsert(self, entry):
+        entry.ingested_at = entry.ingested_at or datetime.datetime.now().isoformat(timespec="seconds")
+        self.meta.execute(
+            "INSERT OR REPLACE INTO ingest_manifest "
+            "(collection, path, source, content_hash, size, mtime, chunker_version, embedding_model, chunk_ids, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.collection, entry.path, entry.source, entry.content_hash, entry.size, entry.mtime,
+                entry.chunker_version, entry.embedding_model, json.dumps(entry.chunk_ids), entry.ingested_at,
+            ),
+        )
+
+    def remove_source(self, collection, source):
+        """按入库后的 source (归档路径) 删除清单记录。"""
+        return self.meta.execute(
+            "DELETE FROM ingest_manifest WHERE collection = ? AND source = ?", (collection, source)
+        )
+
+    def remove_path(self, collection, path):
+        return self.meta.execute(
+            "DELETE FROM ingest_manifest WHERE collection = ? AND path = ?", (collection, path)
+        )
+
+    def paths_for_source(self, collection, source):
+        """引用同一归档 source 的原始路径 (内容与文件名相同的多个副本)。"""
+        rows = self.meta.query(
+            "SELECT path FROM ingest_manifest WHERE collection = ? AND source = ?", (collection, source)
+        )
+        return [r["path"] for r in rows]
+
+    def clear(self, collection):
+        """集合被重置/重建时清空其清单，避免误判为“未变化”。"""
+        return self.meta.execute("DELETE FROM ingest_manifest WHERE collection = ?", (collection,))
+
+    def entries(self, collection):
+        rows = self.meta.query("SELECT * FROM ingest_manifest WHERE collection = ?", (collection,))
+        return [self._to_entry(r) for r in rows]
+
+    @staticmethod
+    def _to_entry(row):
+        data = dict(row)
+        data["chunk_ids"] = json.loads(data["chunk_ids"])
+        return ManifestEntry(**data)
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class MetaStore:
+    """
+    知识库元数据存储 (SQLite)。
+    清单、统计等小表需要频繁按主键更新，放在 LanceDB 里每次写入都会产生新版本和碎片，
+    因此统一落在与向量库同目录的 SQLite 文件中。连接可跨线程共享，内部串行化。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent and not os.path.exists(parent):
+            os.makedirs(parent, exist_ok=True)
+        # isolation_level=None: 自动提交，显式事务通过 transaction() 控制
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.RLock()
+
+    def ensure_schema(self, ddl):
+        """执行建表语句 (CREATE TABLE IF NOT EXISTS ...)。"""
+        with self._lock:
+            self._conn.executescript(ddl)
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def executemany(self, sql, seq):
+        with self._lock:
+            return self._conn.executemany(sql, seq).rowcount
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    @contextmanager
+    def transaction(self):
+        """显式事务：块内异常时回滚。"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,20 @@
+import math
+
+
+def percentile(values, pct):
+    """简单分位数计算 (最近邻)，避免引入 numpy 依赖。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def summarize_latencies(values):
+    """延迟列表 (毫秒) -> 均值与 p50/p95/p99。"""
+    return {
+        "mean_ms": sum(values) / len(values) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+    }
@@ -1,5 +1,10 @@
 import sys
 import os
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow.compute as pc
 
 # [关键修复] 先添加路径
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -8,28 +13,233 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 from skills.knowledge_base.scripts.db_manager import DBManager
+from skills.knowledge_base.scripts.index_manager import apply_search_params, has_fts_index, FTS_COLUMN
+from skills.knowledge_base.scripts.filters import build_filter, sql_literal, FILTER_KEYS
+from skills.knowledge_base.scripts.dedup import REF_FIELDS
+from skills.knowledge_base.scripts.rerank import get_reranker, RERANK_ENABLED
+from skills.knowledge_base.scripts.vector_precision import table_precision, int8_search
 
-def search(query, collection_name="documents", limit=5):
-    db = DBManager.get_instance()
-    tbl = db.get_table(collection_name)
-    
-    if not tbl:
-        return f"错误: 知识库 '{collection_name}' 不存在或为空。请先使用 ingest_knowledge 入库。"
-        
-    # 1. 向量化
-    query_vec = db.embed_query(query)
-    
-    # 2. 搜索
-    # LanceDB 的 search API
-    results = tbl.search(query_vec).limit(limit).to_list()
-    
-    if not results:
-        return f"未找到与 '{query}' 相关的结果。"
-        
-    # 3. 格式化输出
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+DEFAULT_MODE = os.environ.get("ZX_KB_SEARCH_MODE", "hybrid")
+RRF_K = 60               # Reciprocal Rank Fusion 平滑常数
+HYBRID_CANDIDATES = 20   # 混合检索时每一路的最少候选数
+ALL_COLLECTIONS = "all"  # 跨集合检索：collection 传 "all" 或逗号分隔的多个集合名
+MAX_BATCH_QUERIES = 10   # 批量检索单次最多的问题数
+MAX_BATCH_WORKERS = 4    # 批量检索的并发线程数
+# 检索结果只读取这些列 (不读向量列)，旧表缺少的列自动跳过
+RESULT_COLUMNS = ("text", "source", "line_range", "location", "type", "chunk_id", "ingested_at")
+REF_SCOPE_MAX = 1000     # 过滤条件命中的近重复引用最多并入这么多个被引用片段
+
+def _row_key(row):
+    """融合时识别同一片段：优先 chunk_id，旧表回退到 source + 行号"""
+    return row.get("chunk_id") or (row.get("source"), row.get("line_range"), row.get("text", "")[:64])
+
+def result_columns(tbl):
+    """表中存在的结果列 (投影)"""
+    names = set(tbl.schema.names)
+    return [c for c in RESULT_COLUMNS if c in names]
+
+def _scored_rows(table, score_column, scores):
+    """
+    Arrow 结果 -> 结果行：分数在 Arrow 中整列计算，只在最后一步把 top-k 转成 dict。
+    """
+    table = table.drop_columns([score_column]).append_column("score", scores)
+    return table.to_pylist()
+
+def vector_search(db, tbl, query, limit, query_vec=None, where=None):
+    if query_vec is None:
+        query_vec = db.embed_query(query)
+    columns = result_columns(tbl)
+    if table_precision(tbl) == "int8":
+        # int8 量化存储：LanceDB 无法直接对 int8 列做 L2 检索，走流式反量化扫描
+        rows = int8_search(tbl, query_vec, limit, where, columns)
+        for row in rows:
+            row["score"] = 1.0 - row.pop("_distance") / 2
+        return rows
+    # LanceDB 的 search API (建有 ANN 索引时按配置的 nprobes / refine_factor 检索)
+    # float16 列可直接用 float32 查询向量检索
+    builder = apply_search_params(tbl.search(query_vec)).select(columns + ["_distance"])
+    if where:
+        # 先过滤再取近邻 (prefilter)，范围内的结果不会被 top-k 截断
+        builder = builder.where(where, prefilter=True)
+    table = builder.limit(limit).to_arrow()
+    # 向量已归一化，L2 距离平方 d = 2 - 2cos，换算回余弦相似度，各表之间可直接比较
+    scores = pc.subtract(1.0, pc.divide(pc.cast(table.column("_distance"), "float64"), 2.0))
+    return _scored_rows(table, "_distance", scores)
+
+def keyword_search(tbl, query, limit, where=None):
+    """全文检索 (BM25)，中文按二元组切分，适合编号、型号、专有名词。需已建全文索引 (见 _fts_ready)"""
+    builder = tbl.search(query, query_type="fts", fts_columns=FTS_COLUMN).select(result_columns(tbl) + ["_score"])
+    if where:
+        builder = builder.where(where, prefilter=True)
+    table = builder.limit(limit).to_arrow()
+    return _scored_rows(table, "_score", pc.cast(table.column("_score"), "float64"))
+
+def _fts_ready(db, tbl):
+    """
+    全文索引是否可用。旧表缺少索引时不在查询中同步构建 (大表耗时很长)，
+    交给后台表维护补建 (index_manager.maybe_update_index)，建好之前退回向量检索。
+    """
+    if has_fts_index(tbl):
+        return True
+    db.maintain_indexes(tbl.name, background=True)
+    return False
+
+def rrf_fuse(result_lists, limit, k=RRF_K):
+    """Reciprocal Rank Fusion：只依赖名次，无需对齐向量距离与 BM25 分数的量纲"""
+    scores, rows = {}, {}
+    for results in result_lists:
+        for rank, row in enumerate(results):
+            key = _row_key(row)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            rows.setdefault(key, row)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**rows[key], "score": scores[key]} for key in ordered]
+
+def _ref_scope(db, tbl, where):
+    """
+    近重复片段只登记为引用 (chunk_refs，见 dedup)，在向量表中没有自己的行。
+    过滤条件命中引用时，把它们指向的片段并入检索范围：返回 (扩展后的 where, {被引用片段 ID: [引用]})。
+    """
+    conditions = getattr(where, "conditions", None)
+    if not conditions or "chunk_id" not in tbl.schema.names:
+        return where, {}
+    clause, params = where.sqlite_clause()
+    refs = {}
+    for ref in db.dedup.refs_matching(tbl.name, clause, params, REF_SCOPE_MAX):
+        refs.setdefault(ref["canonical_id"], []).append(ref)
+    if not refs:
+        return where, {}
+    return f"({where}) OR (chunk_id IN ({', '.join(sql_literal(c) for c in refs)}))", refs
+
+def _resolve_refs(rows, where, refs):
+    """不满足过滤条件的命中是经由引用并入的：换成引用自身的来源、位置与正文 (分数沿用被引用片段)"""
+    resolved = []
+    for row in rows:
+        if where.matches(row):
+            resolved.append(row)
+        elif row.get("chunk_id") in refs:
+            ref = refs[row["chunk_id"]][0]
+            resolved.append({**row, **{k: ref[k] for k in REF_FIELDS}})
+    return resolved
+
+def search_rows(db, tbl, query, limit=5, mode=DEFAULT_MODE, query_vec=None, where=None, rerank=False):
+    """
+    按模式检索，返回带 score 字段的结果行。
+    query_vec 可传入已算好的查询向量；where 为过滤表达式 (见 filters.build_filter)，作为 prefilter 下推，
+    只存为近重复引用的片段按引用的来源参与过滤。
+    rerank=True 时先多取候选，再用交叉编码器精排 (超出延迟预算则保持第一阶段顺序)。
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"不支持的检索模式 '{mode}'，可选: {', '.join(SEARCH_MODES)}")
+    if rerank:
+        reranker = get_reranker()
+        candidates = search_rows(db, tbl, query, max(limit, reranker.candidates), mode, query_vec, where)
+        return reranker.rerank(query, candidates, limit)
+    if mode != "vector" and not _fts_ready(db, tbl):
+        mode = "vector"
+    scope, refs = _ref_scope(db, tbl, where)
+    if mode == "vector":
+        rows = vector_search(db, tbl, query, limit, query_vec, scope)
+    elif mode == "keyword":
+        rows = keyword_search(tbl, query, limit, scope)
+    else:
+        candidates = max(limit * 4, HYBRID_CANDIDATES)
+        rows = rrf_fuse([vector_search(db, tbl, query, candidates, query_vec, scope),
+                         keyword_search(tbl, query, candidates, scope)], limit)
+    return _resolve_refs(rows, where, refs) if refs else rows
+
+def parse_collections(collection, db=None):
+    """解析集合参数："all" 展开为全部集合，逗号分隔为多个集合"""
+    if collection.strip() == ALL_COLLECTIONS:
+        return (db or DBManager.get_instance()).list_tables()
+    names = [c.strip() for c in collection.split(",") if c.strip()]
+    return list(dict.fromkeys(names))
+
+def _normalize_keyword_scores(rows):
+    """BM25 分数依赖各表的词频统计，跨表不可比，按表内最高分归一化到 [0, 1]"""
+    top = max((r["score"] for r in rows), default=0.0)
+    for row in rows:
+        row["score"] = row["score"] / top if top > 0 else 0.0
+    return rows
+
+def _dedup_key(row):
+    """跨集合去重：同一段文字 (如文档内容被贴进对话) 只保留得分最高的一条"""
+    text = " ".join(row.get("text", "").split())
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+def federated_search_rows(db, query, collections, limit=5, mode=DEFAULT_MODE, where=None, query_vec=None, rerank=False):
+    """
+    跨集合检索：查询只向量化一次，各集合并发检索，分数归一化后合并去重取 top-k。
+    - vector: 余弦相似度，本身跨表可比
+    - hybrid: RRF 分数只依赖名次，跨表可比
+    - keyword: BM25 按表内最高分归一化
+    每条结果带 collection 字段。rerank=True 时对合并后的候选统一精排。
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"不支持的检索模式 '{mode}'，可选: {', '.join(SEARCH_MODES)}")
+    tables = [(name, db.get_table(name)) for name in collections]
+    tables = [(name, tbl) for name, tbl in tables if tbl is not None]
+    if not tables:
+        return []
+    if query_vec is None and mode != "keyword":
+        query_vec = db.embed_query(query)
+    reranker = get_reranker() if rerank else None
+    fetch = max(limit, reranker.candidates) if reranker else limit
+
+    def _search_one(item):
+        name, tbl = item
+        rows = search_rows(db, tbl, query, fetch, mode, query_vec, where)
+        if mode == "keyword":
+            rows = _normalize_keyword_scores(rows)
+        for row in rows:
+            row["collection"] = name
+        return rows
+
+    with ThreadPoolExecutor(max_workers=len(tables)) as pool:
+        result_lists = list(pool.map(_search_one, tables))
+
+    best = {}
+    for row in (r for rows in result_lists for r in rows):
+        key = _dedup_key(row)
+        if key not in best or row["score"] > best[key]["score"]:
+            best[key] = row
+    merged = sorted(best.values(), key=lambda r: r["score"], reverse=True)
+    if reranker:
+        return reranker.rerank(query, merged, limit)
+    return merged[:limit]
+
+def cached_search(db, query, collections, limit, mode, where, rerank, compute, query_vec=None, use_cache=True):
+    """
+    带结果缓存的检索：compute(query_vec) 执行实际检索。
+    先读取各表版本再检索，任何写入使版本变化后旧结果自动失效；
+    精确未命中且开启语义缓存时，用问题向量查找相似问题的结果。
+    use_cache=False 时本次检索既不读也不写缓存 (延迟测量)。
+    """
+    cache = db.result_cache
+    if cache is None or not use_cache:
+        return compute(query_vec)
+    params = (tuple(collections), limit, mode, where, bool(rerank))
+    versions = db.table_versions(collections)
+    hit = cache.get(query, params, versions)
+    if hit is not None:
+        return hit
+    if cache.semantic and mode != "keyword":
+        if query_vec is None:
+            query_vec = db.embed_query(query)
+        hit = cache.get_similar(query_vec, params, versions)
+        if hit is not None:
+            return hit
+    cache.miss()
+    results = compute(query_vec)
+    # 精排模型未就绪或超时时是第一阶段顺序，不缓存，模型可用后重新精排
+    if not (rerank and any(not r.get("reranked") for r in results)):
+        cache.put(query, params, versions, results, query_vec)
+    return results
+
+def format_results(query, results):
     output = [f"--- 知识库检索结果 (Query: {query}) ---"]
     for i, res in enumerate(results):
-        score = 1.0 - res.get('_distance', 0) # 距离越小越相似，这里粗略转为分数
         source = res['source']
         lines = res['line_range']
         location = res.get('location', 'Unknown') # 新增
@@ -37,15 +247,114 @@ def search(query, collection_name="documents", limit=5):
         if len(content) > 200: content = content[:200] + "..."
         
         output.append(f"[{i+1}] {content}")
-        output.append(f"    Source: {source} | Loc: {location} | Line: {lines} | Score: {score:.4f}")
+        collection = f"Collection: {res['collection']} | " if res.get('collection') else ""
+        output.append(f"    {collection}Source: {source} | Loc: {location} | Line: {lines} | Score: {res['score']:.4f}")
         
     return "\n".join(output)
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python query.py <query_text> [collection_name]")
-        sys.exit(1)
+def search(query, collection_name="documents", limit=5, mode=None, filters=None, rerank=None, use_cache=True):
+    """
+    mode: 检索模式，默认取 ZX_KB_SEARCH_MODE
+    filters: build_filter 的参数字典，如 {"source": "*.pdf", "since": "2026-01-01"}
+    rerank: 是否启用交叉编码器精排，默认取 ZX_KB_RERANK
+    use_cache: False 时绕过结果缓存与查询向量缓存，测得的是真实检索耗时
+    """
+    mode = mode or DEFAULT_MODE
+    rerank = RERANK_ENABLED if rerank is None else rerank
+    where = build_filter(**(filters or {}))
+    db = DBManager.get_instance()
+    collections = parse_collections(collection_name, db)
+    query_vec = db.embed_query(query, use_cache=False) if not use_cache and mode != "keyword" else None
+    if len(collections) != 1:
+        if not collections:
+            return "错误: 当前没有任何知识库集合。请先使用 ingest_knowledge 入库。"
+        results = cached_search(db, query, collections, limit, mode, where, rerank,
+                                lambda vec: federated_search_rows(db, query, collections, limit, mode, where, vec, rerank),
+                                query_vec, use_cache)
+        if not results:
+            return f"未找到与 '{query}' 相关的结果 (集合: {', '.join(collections)})。"
+        return format_results(query, results)
+    collection_name = collections[0]
+    tbl = db.get_table(collection_name)
+    
+    if not tbl:
+        return f"错误: 知识库 '{collection_name}' 不存在或为空。请先使用 ingest_knowledge 入库。"
         
-    q = sys.argv[1]
-    coll = sys.argv[2] if len(sys.argv) > 2 else "documents"
-    print(search(q, coll))
+    results = cached_search(db, query, collections, limit, mode, where, rerank,
+                            lambda vec: search_rows(db, tbl, query, limit, mode, vec, where, rerank),
+                            query_vec, use_cache)
+    
+    if not results:
+        return f"未找到与 '{query}' 相关的结果。"
+        
+    return format_results(query, results)
+
+def search_many(queries, collection_name="documents", limit=5, mode=None, filters=None, rerank=None):
+    """
+    批量检索：多个问题一次调用。所有问题合并成一个批次向量化，各问题并发检索，
+    结果按问题分组输出，每个问题最多 limit 条。mode 默认取 ZX_KB_SEARCH_MODE。
+    """
+    mode = mode or DEFAULT_MODE
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return "错误: 未提供检索问题。"
+    dropped = queries[MAX_BATCH_QUERIES:]
+    queries = queries[:MAX_BATCH_QUERIES]
+    if len(queries) == 1 and not dropped:
+        return search(queries[0], collection_name, limit, mode, filters, rerank)
+    rerank = RERANK_ENABLED if rerank is None else rerank
+
+    where = build_filter(**(filters or {}))
+    db = DBManager.get_instance()
+    collections = parse_collections(collection_name, db)
+    if not collections:
+        return "错误: 当前没有任何知识库集合。请先使用 ingest_knowledge 入库。"
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"不支持的检索模式 '{mode}'，可选: {', '.join(SEARCH_MODES)}")
+    tbl = None
+    if len(collections) == 1:
+        tbl = db.get_table(collections[0])
+        if not tbl:
+            return f"错误: 知识库 '{collections[0]}' 不存在或为空。请先使用 ingest_knowledge 入库。"
+
+    # 一次批量推理得到所有问题的向量 (纯关键词模式无需向量)
+    vectors = db.embed_documents(queries) if mode != "keyword" else [None] * len(queries)
+
+    def _search_one(item):
+        query, query_vec = item
+        if tbl is not None:
+            compute = lambda vec: search_rows(db, tbl, query, limit, mode, vec, where, rerank)
+        else:
+            compute = lambda vec: federated_search_rows(db, query, collections, limit, mode, where, vec, rerank)
+        return cached_search(db, query, collections, limit, mode, where, rerank, compute, query_vec)
+
+    with ThreadPoolExecutor(max_workers=min(len(queries), MAX_BATCH_WORKERS)) as pool:
+        result_lists = list(pool.map(_search_one, zip(queries, vectors)))
+
+    output = [f"=== 批量检索 ({len(queries)} 个问题, 每个最多 {limit} 条) ==="]
+    for query, results in zip(queries, result_lists):
+        output.append("")
+        output.append(format_results(query, results) if results else f"--- 未找到与 '{query}' 相关的结果 ---")
+    if dropped:
+        output.append(f"\n⚠️ 单次最多 {MAX_BATCH_QUERIES} 个问题，已忽略: {', '.join(dropped)}")
+    return "\n".join(output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knowledge Base Search")
+    parser.add_argument("query", help="检索问题")
+    parser.add_argument("collection", nargs="?", default="documents", help="集合名称，多个用逗号分隔，或 all 表示全部")
+    parser.add_argument("--mode", "-m", choices=SEARCH_MODES, default=DEFAULT_MODE, help="检索模式")
+    parser.add_argument("--limit", "-n", type=int, default=5, help="每个问题的结果数")
+    parser.add_argument("--query", "-q", dest="queries", action="append", default=[], help="追加检索问题 (可重复)，批量检索")
+    parser.add_argument("--source", help="来源文件 glob，如 '*.pdf'、'*白皮书*'")
+    parser.add_argument("--type", help="片段类型，如 document")
+    parser.add_argument("--location", help="位置 glob，如 'Page 3'、'Sheet: *'")
+    parser.add_argument("--since", help="入库时间下限 (YYYY-MM-DD)")
+    parser.add_argument("--until", help="入库时间上限 (YYYY-MM-DD，含当天)")
+    parser.add_argument("--rerank", action="store_true", default=RERANK_ENABLED, help="交叉编码器精排 (默认取 ZX_KB_RERANK)")
+    args = parser.parse_args()
+    filters = {k: getattr(args, k) for k in FILTER_KEYS if getattr(args, k)}
+    if args.rerank:
+        # 一次性进程：同步加载精排模型，延迟预算只约束推理
+        get_reranker().load()
+    print(search_many([args.query] + args.queries, args.collection, args.limit, args.mode, filters, args.rerank))
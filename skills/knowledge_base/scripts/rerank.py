@@ -0,0 +1,150 @@
+import os
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from skills.knowledge_base.scripts.metrics import percentile
+
+# 第二阶段精排配置 (均可通过环境变量覆盖)
+RERANK_ENABLED = os.environ.get("ZX_KB_RERANK", "0") == "1"
+RERANK_MODEL = os.environ.get("ZX_KB_RERANK_MODEL", "BAAI/bge-reranker-base")  # 中英双语交叉编码器
+RERANK_CANDIDATES = int(os.environ.get("ZX_KB_RERANK_CANDIDATES", "20"))      # 精排候选数上限
+RERANK_BUDGET_MS = float(os.environ.get("ZX_KB_RERANK_BUDGET_MS", "300"))     # 超时则退回第一阶段排序
+LATENCY_WINDOW = 200
+
+
+def sigmoid(x):
+    """交叉编码器输出的是 logit，经 sigmoid 校准到 (0, 1)，不同查询之间可比。"""
+    if x >= 0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
+
+
+class Reranker:
+    """
+    本地 ONNX 交叉编码器精排：对第一阶段的候选逐一打分，返回校准后的 top-k。
+    - 候选数有上限 (candidates)，控制推理量
+    - 硬性延迟预算 (budget_ms)：超时、出错或模型尚未加载完成时，直接返回第一阶段的顺序
+    - 超时的任务仍占着唯一的推理线程：跑完之前的查询直接回退，不排在它后面耗尽自己的预算
+    模型加载不计入预算：首次使用时后台加载，加载完成前的查询走回退。
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, candidates=RERANK_CANDIDATES, budget_ms=RERANK_BUDGET_MS):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._loading = None
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-rerank")
+        self._overrun = None   # 超出预算、仍在后台运行的任务
+        self._stats_lock = threading.Lock()
+        self._latencies = []
+        self.reranked = 0
+        self.fallbacks = 0
+
+    @property
+    def is_ready(self):
+        return self._model is not None
+
+    def load(self):
+        """同步加载模型 (CLI 一次性进程与预热时使用)。"""
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                from fastembed.rerank.cross_encoder import TextCrossEncoder
+                self._model = TextCrossEncoder(model_name=self.model_name)
+        return self._model
+
+    def load_async(self):
+        with self._load_lock:
+            if self._model is not None or (self._loading and self._loading.is_alive()):
+                return self._loading
+            self._loading = threading.Thread(target=self._safe_load, name="kb-rerank-load", daemon=True)
+            self._loading.start()
+            return self._loading
+
+    def _safe_load(self):
+        try:
+            self.load()
+        except Exception as e:
+            print(f"⚠️ [Rerank] Failed to load {self.model_name}: {e}")
+
+    def _score(self, query, texts):
+        return list(self._model.rerank(query, texts, batch_size=len(texts)))
+
+    def _fallback(self, rows, limit):
+        with self._stats_lock:
+            self.fallbacks += 1
+        return [{**row, "reranked": False} for row in rows[:limit]]
+
+    def rerank(self, query, rows, limit, budget_ms=None):
+        """
+        rows 为第一阶段按相关度排好序的候选。返回精排后的前 limit 条：
+        score 为校准后的相关概率，first_stage_score 保留原分数，reranked 标记是否经过精排。
+        """
+        if not rows:
+            return rows
+        if self._model is None:
+            self.load_async()
+            return self._fallback(rows, limit)
+
+        overrun = self._overrun
+        if overrun is not None and not overrun.done():
+            # 上一个超时的任务还占着推理线程，排队只会让本次也超时
+            return self._fallback(rows, limit)
+
+        candidates = rows[:self.candidates]
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000
+        start = time.perf_counter()
+        future = self._pool.submit(self._score, query, [r.get("text", "") for r in candidates])
+        try:
+            logits = future.result(timeout=budget)
+        except FutureTimeout:
+            # 超出预算的任务在后台跑完后丢弃
+            self._overrun = future
+            return self._fallback(rows, limit)
+        except Exception as e:
+            print(f"⚠️ [Rerank] Falling back to first-stage order: {e}")
+            return self._fallback(rows, limit)
+
+        with self._stats_lock:
+            self._latencies.append((time.perf_counter() - start) * 1000)
+            del self._latencies[:-LATENCY_WINDOW]
+            self.reranked += 1
+        scored = [
+            {**row, "first_stage_score": row.get("score"), "score": sigmoid(float(logit)), "reranked": True}
+            for row, logit in zip(candidates, logits)
+        ]
+        scored.sort(key=lambda r: r["score"], reverse=True)
+        return scored[:limit]
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = list(self._latencies)
+            return {
+                "model": self.model_name,
+                "ready": self.is_ready,
+                "reranked": self.reranked,
+                "fallbacks": self.fallbacks,
+                "candidates": self.candidates,
+                "budget_ms": self.budget_ms,
+                "p95_ms": percentile(latencies, 95),
+            }
+
+
+_RERANKER = None
+_RERANKER_LOCK = threading.Lock()
+
+
+def get_reranker():
+    """获取进程级单例精排器。"""
+    global _RERANKER
+    if _RERANKER is None:
+        with _RERANKER_LOCK:
+            if _RERANKER is None:
+                _RERANKER = Reranker()
+    return _RERANKER
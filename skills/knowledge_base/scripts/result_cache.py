@@ -0,0 +1,125 @@
+import os
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from skills.knowledge_base.scripts.embedding_cache import normalize_text
+
+# 检索结果缓存配置 (均可通过环境变量覆盖)
+RESULT_CACHE_ENABLED = os.environ.get("ZX_KB_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_ENTRIES = int(os.environ.get("ZX_KB_RESULT_CACHE_ENTRIES", "256"))
+# 语义缓存：换个说法的问题与已缓存问题的向量余弦相似度达到阈值时复用结果 (默认关闭)
+SEMANTIC_CACHE_ENABLED = os.environ.get("ZX_KB_SEMANTIC_CACHE", "0") != "0"
+SEMANTIC_THRESHOLD = float(os.environ.get("ZX_KB_SEMANTIC_THRESHOLD", "0.95"))
+
+
+def _query_key(query, params):
+    return hashlib.sha1(f"{normalize_text(query)}\0{params!r}".encode("utf-8")).hexdigest()
+
+
+def _unit(vec):
+    vec = np.asarray(vec, dtype=np.float32)
+    return vec / (np.linalg.norm(vec) + 1e-12)
+
+
+class ResultCache:
+    """
+    检索结果缓存 (进程内 LRU)：键为 (规范化问题, 检索参数)，每条记录所查各表的 (表标识, 版本号)。
+    读取时与表当前版本不一致即视为失效并删除，任何写入或删表重建 (含其他进程) 之后都不会返回旧结果。
+    开启语义缓存时，精确未命中再按问题向量找参数相同、版本一致且足够相似的记录。
+    """
+
+    def __init__(self, entries=RESULT_CACHE_ENTRIES, semantic=SEMANTIC_CACHE_ENABLED, threshold=SEMANTIC_THRESHOLD):
+        self.entries = entries
+        self.semantic = semantic
+        self.threshold = threshold
+        self._items = OrderedDict()   # key -> (params, versions, 问题单位向量或 None, 结果)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def _valid(self, key, versions):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[1] != versions:
+            del self._items[key]
+            self.invalidated += 1
+            return None
+        self._items.move_to_end(key)
+        return item
+
+    def get(self, query, params, versions):
+        """精确命中：返回结果副本；未命中或已失效返回 None (未命中计数由 get_similar / miss 负责)"""
+        with self._lock:
+            item = self._valid(_query_key(query, params), versions)
+            if item is None:
+                return None
+            self.hits += 1
+            return copy.deepcopy(item[3])
+
+    def get_similar(self, query_vec, params, versions):
+        """语义命中：参数与版本一致的记录中，问题向量余弦相似度最高且达到阈值的一条"""
+        if not self.semantic or query_vec is None:
+            return None
+        q = _unit(query_vec)
+        with self._lock:
+            best, best_score = None, self.threshold
+            for key, (p, _, vec, _) in list(self._items.items()):
+                if p != params or vec is None:
+                    continue
+                score = float(vec @ q)
+                if score >= best_score and self._valid(key, versions) is not None:
+                    best, best_score = key, score
+            if best is None:
+                return None
+            self.semantic_hits += 1
+            return copy.deepcopy(self._items[best][3])
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, query, params, versions, results, query_vec=None):
+        """versions 必须在检索之前读取：检索期间发生写入时，记录的旧版本会让该条目在下次读取时失效"""
+        vec = _unit(query_vec) if self.semantic and query_vec is not None else None
+        with self._lock:
+            key = _query_key(query, params)
+            self._items[key] = (params, dict(versions), vec, copy.deepcopy(results))
+            self._items.move_to_end(key)
+            while len(self._items) > self.entries:
+                self._items.popitem(last=False)
+
+    def invalidate_table(self, table_name):
+        """删除查询过该表的记录，返回删除条数"""
+        with self._lock:
+            stale = [key for key, item in self._items.items() if table_name in item[1]]
+            for key in stale:
+                del self._items[key]
+            self.invalidated += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._items)
+            self._items.clear()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "invalidated": self.invalidated,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "semantic": self.semantic,
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import threading
+from collections import deque
+
+# [关键修复] 先添加路径
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(CURRENT_DIR)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from skills.knowledge_base.scripts.db_manager import DBManager
+from skills.knowledge_base.scripts import query as kb_query
+from skills.knowledge_base.scripts.metrics import percentile
+from skills.knowledge_base.scripts.rerank import get_reranker, RERANK_ENABLED
+
+# 热查询延迟目标 (毫秒)：模型与表句柄常驻后，单次检索应低于该值
+WARM_QUERY_TARGET_MS = float(os.environ.get("ZX_KB_WARM_QUERY_TARGET_MS", "200"))
+# 延迟统计窗口大小
+LATENCY_WINDOW = 200
+
+
+class RetrievalService:
+    """
+    常驻检索引擎：在 Agent 进程内复用同一个 DBManager (模型 + 已打开的表)。
+    替代每次检索都拉起 query.py 子进程的冷启动模式，支持多线程并发查询。
+    """
+
+    def __init__(self):
+        self._ready = threading.Event()
+        self._warmup_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.load_seconds = None
+        self.total_queries = 0
+
+    def warmup(self):
+        """加载 Embedding 模型并完成一次空推理，之后的查询均为热查询。"""
+        if self._ready.is_set():
+            return
+        with self._warmup_lock:
+            if self._ready.is_set():
+                return
+            start = time.perf_counter()
+            db = DBManager.get_instance(verbose=False)
+            # 绕过向量缓存，确保真正跑一次推理
+            list(db.embedding_model.embed(["warmup"]))
+            if RERANK_ENABLED:
+                # 精排模型较大，后台加载，加载完成前的查询按第一阶段顺序返回
+                get_reranker().load_async()
+            self.load_seconds = time.perf_counter() - start
+            self._ready.set()
+
+    def warmup_async(self):
+        """后台预热，不阻塞 CLI 启动。"""
+        thread = threading.Thread(target=self._safe_warmup, name="kb-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _safe_warmup(self):
+        try:
+            self.warmup()
+        except Exception:
+            # 预热失败 (如模型未下载) 不影响主流程，首次查询时会再次尝试并暴露错误
+            pass
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def _timed(self, fn, *args):
+        self.warmup()
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._latencies.append(elapsed_ms)
+            self.total_queries += 1
+        return result
+
+    def search(self, query, collection="documents", limit=5, mode=None, filters=None, rerank=None, use_cache=True):
+        """执行一次检索并记录延迟。线程安全，可被 ToolNode 并发调用。use_cache=False 用于测量真实检索延迟"""
+        return self._timed(kb_query.search, query, collection, limit, mode, filters, rerank, use_cache)
+
+    def search_many(self, queries, collection="documents", limit=5, mode=None, filters=None, rerank=None):
+        """批量检索 (一次向量化、并发检索)，整批记为一次延迟样本。"""
+        return self._timed(kb_query.search_many, queries, collection, limit, mode, filters, rerank)
+
+    def stats(self):
+        """返回最近窗口内的热查询延迟统计。"""
+        with self._stats_lock:
+            latencies = list(self._latencies)
+            total = self.total_queries
+        p95 = percentile(latencies, 95)
+        return {
+            "queries": total,
+            "load_seconds": self.load_seconds,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": p95,
+            "target_ms": WARM_QUERY_TARGET_MS,
+            "within_target": bool(latencies) and p95 <= WARM_QUERY_TARGET_MS,
+            "embedding_cache": self._cache_stats(),
+            "result_cache": self._result_cache_stats(),
+            "rerank": get_reranker().stats() if RERANK_ENABLED else None,
+        }
+
+    def _cache_stats(self):
+        if not self._ready.is_set():
+            return None
+        cache = DBManager.get_instance(verbose=False).embedding_cache
+        return cache.stats() if cache else None
+
+    def _result_cache_stats(self):
+        if not self._ready.is_set():
+            return None
+        cache = DBManager.get_instance(verbose=False).result_cache
+        return cache.stats() if cache else None
+
+
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_service():
+    """获取进程级单例检索服务。"""
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_LOCK:
+            if _SERVICE is None:
+                _SERVICE = RetrievalService()
+    return _SERVICE
+
+
+def measure_warm_latency(query, collection="documents", rounds=20):
+    """测量冷启动耗时与热查询分位数延迟，用于核对延迟目标。"""
+    service = get_service()
+    service.warmup()
+    # 同一查询重复执行：逐次绕过结果缓存与查询向量缓存 (不改动共享状态，并发检索照常走缓存)，
+    # 统计的才是真实检索耗时
+    for _ in range(rounds):
+        service.search(query, collection, use_cache=False)
+    return service.stats()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python retrieval_service.py <query_text> [collection_name] [rounds]")
+        sys.exit(1)
+
+    q = sys.argv[1]
+    coll = sys.argv[2] if len(sys.argv) > 2 else "documents"
+    n = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    s = measure_warm_latency(q, coll, n)
+    verdict = "✅ 达标" if s["within_target"] else "⚠️ 未达标"
+    print(f"--- 热查询延迟 (Collection: {coll}, Rounds: {n}) ---")
+    print(f"冷启动加载: {s['load_seconds']:.2f}s")
+    print(f"p50: {s['p50_ms']:.1f}ms | p95: {s['p95_ms']:.1f}ms | 目标: {s['target_ms']:.0f}ms {verdict}")
+    if s["result_cache"]:
+        rc = s["result_cache"]
+        print(f"结果缓存: 命中率 {rc['hit_rate']:.0%} (精确 {rc['hits']} / 语义 {rc['semantic_hits']} / 未命中 {rc['misses']})")
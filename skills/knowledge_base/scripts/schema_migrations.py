@@ -0,0 +1,131 @@
+import uuid
+
+import pyarrow as pa
+
+from skills.knowledge_base.scripts.vector_precision import VECTOR_COLUMN
+
+# 表结构版本记录在 vector 列的字段元数据中，读取 schema 即可判断是否需要迁移 (不扫描数据)
+SCHEMA_VERSION_KEY = "zx:schema_version"
+# 表标识：建表时生成。删表重建后版本号从头开始，只凭版本号分不清新旧两张表
+TABLE_ID_KEY = "zx:table_id"
+
+# 有序迁移：(版本号, 说明, {列名: SQL 表达式})。
+# 表达式对每一行求值，可引用已有列 (即回填函数)；只新增列，不改写向量。
+# 新增字段时在末尾追加一步，不要修改已发布的步骤。
+MIGRATIONS = [
+    (1, "片段位置与类型", {
+        "line_range": "CAST(NULL AS STRING)",
+        "location": "CAST(NULL AS STRING)",
+        "type": "'document'",
+    }),
+    (2, "片段 ID (merge_insert 原子替换的主键)", {
+        "chunk_id": "md5(concat(source, '|', coalesce(line_range, ''), '|', text))",
+    }),
+    (3, "入库时间 (旧片段未知)", {
+        "ingested_at": "CAST(NULL AS STRING)",
+    }),
+    (4, "情景记忆轮次 (文档片段为空)", {
+        "session_id": "CAST(NULL AS STRING)",
+        "turn_id": "CAST(NULL AS BIGINT)",
+        "turn_started_at": "CAST(NULL AS STRING)",
+        "turn_ended_at": "CAST(NULL AS STRING)",
+    }),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# 迁移表达式为空值的列在建表时可直接补齐，需要显式的 Arrow 类型
+_NULL_TYPES = {"CAST(NULL AS STRING)": pa.string(), "CAST(NULL AS BIGINT)": pa.int64()}
+
+
+def migration_columns():
+    """所有迁移步骤会补齐的列名。"""
+    return {name for _, _, columns in MIGRATIONS for name in columns}
+
+
+def infer_version(names):
+    """未记录版本的旧表：按已有列推断，取前缀连续满足的最高版本。"""
+    names = set(names)
+    version = 0
+    for step, _, columns in MIGRATIONS:
+        if not set(columns) <= names:
+            break
+        version = step
+    return version
+
+
+def fill_new_table(table):
+    """
+    新表的 Arrow 数据：缺失的可空迁移列 (如文档表的情景记忆轮次列) 直接补为空列，
+    建表即为最新版本，首次写入不会再触发迁移、产生额外的表版本。
+    """
+    for _, _, columns in MIGRATIONS:
+        for name, expr in columns.items():
+            if name not in table.schema.names and expr in _NULL_TYPES:
+                table = table.append_column(name, pa.nulls(len(table), _NULL_TYPES[expr]))
+    return table
+
+
+def schema_version(tbl):
+    """读取表记录的结构版本，未记录时按列推断。"""
+    metadata = tbl.schema.field(VECTOR_COLUMN).metadata or {}
+    value = metadata.get(SCHEMA_VERSION_KEY.encode())
+    if value is not None:
+        return int(value)
+    return infer_version(tbl.schema.names)
+
+
+def new_table_id():
+    """新建表的标识 (与结构版本一起写入表元数据)"""
+    return {TABLE_ID_KEY: uuid.uuid4().hex}
+
+
+def table_id(tbl):
+    """表标识；升级前创建、未记录标识的表返回 None"""
+    metadata = tbl.schema.field(VECTOR_COLUMN).metadata or {}
+    value = metadata.get(TABLE_ID_KEY.encode())
+    return value.decode() if value is not None else None
+
+
+def stamp_version(tbl, version=None, extra=None):
+    """把结构版本 (默认按当前列推断) 与 extra 中的其他元数据一次性写入表元数据。"""
+    version = infer_version(tbl.schema.names) if version is None else version
+    metadata = {SCHEMA_VERSION_KEY: str(version), **(extra or {})}
+    tbl.update_field_metadata({"path": VECTOR_COLUMN, "metadata": metadata})
+    return version
+
+
+def migrate(tbl, target=SCHEMA_VERSION):
+    """
+    把表原地升级到 target 版本：依次执行未应用的步骤，只补缺失的列 (add_columns)，
+    已有向量与数据文件保持不变。返回 [(版本号, 说明, 新增列)]，已是最新时为空且不产生新版本。
+    """
+    current = schema_version(tbl)
+    if current >= target:
+        return []
+    applied = []
+    for step, description, columns in MIGRATIONS:
+        if step <= current or step > target:
+            continue
+        existing = set(tbl.schema.names)
+        missing = {name: expr for name, expr in columns.items() if name not in existing}
+        if missing:
+            tbl.add_columns(missing)
+        applied.append((step, description, sorted(missing)))
+    stamp_version(tbl, target)
+    return applied
+
+
+def add_unknown_fields(tbl, sample):
+    """
+    新数据带有迁移表之外的字段时，按样例值推断类型补为可空列 (旧行为 NULL)，不删表。
+    返回新增的列名。
+    """
+    existing = set(tbl.schema.names)
+    fields = [
+        pa.field(name, pa.array([value]).type)
+        for name, value in sample.items()
+        if name not in existing and value is not None
+    ]
+    if fields:
+        tbl.add_columns(fields)
+    return [f.name for f in fields]
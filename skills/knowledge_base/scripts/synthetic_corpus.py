@@ -0,0 +1,146 @@
+import os
+import json
+import random
+
+# 合成语料：基准测试用的确定性文档 (同样的参数总是生成同样的内容)，每个小节约等于一个片段
+CORPUS_FORMATS = ("md", "docx", "pdf", "xlsx")
+SECTIONS_PER_FILE = {"md": 50, "docx": 50, "pdf": 20, "xlsx": 50}   # 每个文件的片段数 (约)
+ROWS_PER_SECTION = 10       # xlsx 每个片段约 10 行
+SECTION_CHARS = 220         # 中文小节正文字数 (约 220 token，介于切片最小值与目标值之间)
+PDF_SECTION_WORDS = 110     # PDF 每页英文单词数 (内置 Helvetica 字体只支持拉丁字符)
+MARKER_FILE = ".corpus.json"
+
+_HANZI = ("数据库副本延迟索引压缩检索向量模型服务集群节点网络带宽磁盘写入读取缓存队列复制日志监控告警部署发布"
+          "灰度回滚版本配置参数线程进程内存存储分片路由负载均衡容量规划成本预算客户合同交付周期方案架构设计评审"
+          "测试验证安全合规审计权限认证加密备份恢复迁移升级维护巡检故障排查根因分析报告会议纪要需求文档接口协议")
+_SYLLABLES = [c + v for c in "bcdfghklmnprstvz" for v in ("a", "e", "i", "o", "u", "ai", "ou")]
+
+
+def _zh_word(rng):
+    return "".join(rng.choice(_HANZI) for _ in range(rng.randint(2, 4)))
+
+
+def _en_word(rng):
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 3)))
+
+
+def _identifier(rng):
+    return f"{rng.choice(['ZX', 'QW', 'NB', 'HX'])}-{rng.randint(1000, 9999)}"
+
+
+def zh_paragraph(rng, chars=SECTION_CHARS):
+    """随机中文段落 (词表足够大，片段之间不会被当作近重复)，夹杂产品编号供关键词检索"""
+    words, length = [], 0
+    while length < chars:
+        word = _identifier(rng) if rng.random() < 0.04 else _zh_word(rng)
+        words.append(word)
+        length += len(word)
+        if rng.random() < 0.12:
+            words.append("，" if rng.random() < 0.6 else "。")
+    return "".join(words) + "。"
+
+
+def en_paragraph(rng, words=PDF_SECTION_WORDS):
+    items = [_identifier(rng) if rng.random() < 0.04 else _en_word(rng) for _ in range(words)]
+    return " ".join(items) + "."
+
+
+def _write_md(path, rng, sections):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(sections):
+            f.write(f"## 小节 {i + 1} {_zh_word(rng)}\n\n{zh_paragraph(rng)}\n\n")
+
+
+def _write_docx(path, rng, sections):
+    import docx
+    document = docx.Document()
+    for i in range(sections):
+        document.add_heading(f"小节 {i + 1} {_zh_word(rng)}", level=2)
+        document.add_paragraph(zh_paragraph(rng))
+    document.save(path)
+
+
+def _write_xlsx(path, rng, sections):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("数据")
+    ws.append(["编号", "名称", "说明", "数量"])
+    for _ in range(sections * ROWS_PER_SECTION):
+        ws.append([_identifier(rng), _zh_word(rng), zh_paragraph(rng, 18), rng.randint(1, 10000)])
+    wb.save(path)
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_lines(text, width=90):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + ([line] if line else [])
+
+
+def _write_pdf(path, rng, sections):
+    """最小的多页文本 PDF (不依赖 PDF 生成库)：每页一个小节，Helvetica 字体"""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i in range(sections):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        lines = [f"Section {i + 1} {_en_word(rng)}"] + _pdf_lines(en_paragraph(rng))
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 780 Td"] + [f"({_pdf_escape(l)}) Tj T*" for l in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for oid in sorted(objects):
+        offsets[oid] = len(out)
+        out += b"%d 0 obj\n" % oid + objects[oid] + b"\nendobj\n"
+    xref = len(out)
+    count = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % count
+    for oid in range(1, count):
+        out += b"%010d 00000 n \n" % offsets[oid]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+_WRITERS = {"md": _write_md, "docx": _write_docx, "pdf": _write_pdf, "xlsx": _write_xlsx}
+
+
+def generate_corpus(out_dir, fmt, chunks, seed=0):
+    """
+    生成约 chunks 个片段的 fmt 格式语料，返回文件列表。
+    目录中已有相同参数生成的语料时直接复用 (大语料生成本身就很慢)。
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"不支持的语料格式 '{fmt}'，可选: {', '.join(CORPUS_FORMATS)}")
+    params = {"format": fmt, "chunks": chunks, "seed": seed, "sections_per_file": SECTIONS_PER_FILE[fmt]}
+    marker = os.path.join(out_dir, MARKER_FILE)
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("params") == params:
+            return [os.path.join(out_dir, name) for name in cached["files"]]
+    os.makedirs(out_dir, exist_ok=True)
+    per_file = SECTIONS_PER_FILE[fmt]
+    files = []
+    for index in range((chunks + per_file - 1) // per_file):
+        sections = min(per_file, chunks - index * per_file)
+        rng = random.Random(f"{seed}-{fmt}-{index}")
+        name = f"doc_{index:06d}.{fmt}"
+        _WRITERS[fmt](os.path.join(out_dir, name), rng, sections)
+        files.append(name)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "files": files}, f)
+    return [os.path.join(out_dir, name) for name in files]
@@ -0,0 +1,263 @@
+import os
+import re
+import queue
+import hashlib
+import datetime
+import threading
+
+# 注意：本模块在 CLI 启动时导入，不加载 lancedb / 嵌入模型 (DBManager 在后台线程中首次写入时才获取)
+from skills.knowledge_base.scripts.extractors import TextBlock
+from skills.knowledge_base.scripts.chunker import chunk_blocks
+
+# 按轮次增量写入情景记忆 (均可通过环境变量覆盖)
+TURN_MEMORY_ENABLED = os.environ.get("ZX_KB_TURN_MEMORY", "1") != "0"
+EPISODIC_COLLECTION = "episodic_memory"
+MAX_TURN_CHARS = int(os.environ.get("ZX_KB_TURN_MAX_CHARS", "6000"))   # 单轮写入上限，保证每轮的向量化工作量有界
+TOOL_RESULT_CHARS = 300      # 每个工具结果只保留摘要
+TURN_QUEUE_SIZE = 32         # 待写入轮次的有界队列，满了不阻塞对话，退出时整体补入库
+TURN_FLUSH_TIMEOUT = 5.0     # 退出时等待队列中剩余轮次写完的最长时间 (秒)
+
+_STOP = object()
+_TURN_HEADER = re.compile(r"^## Turn (\d+) \((.*)\)$")
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def new_session_id():
+    """会话 ID：启动时间 + 随机后缀，同一秒启动的多个 CLI 也不冲突"""
+    return f"{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}-{os.urandom(3).hex()}"
+
+
+def _content(msg):
+    content = msg.content
+    if isinstance(content, list):
+        # 多模态消息：只取文本部分
+        content = "\n".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+    return str(content or "").strip()
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def summarize_turn(messages):
+    """
+    从一轮新增的消息中提取 (用户输入, 最终回答, 工具摘要)。
+    按消息的 type 区分 (human / ai / tool)，不依赖 langchain。没有用户输入时返回 None。
+    """
+    user = next((_content(m) for m in messages if m.type == "human"), None)
+    if not user:
+        return None
+    answer = next((_content(m) for m in reversed(messages) if m.type == "ai" and _content(m)), "")
+    tools = [f"{getattr(m, 'name', None) or 'tool'}: {_clip(_content(m), TOOL_RESULT_CHARS)}"
+             for m in messages if m.type == "tool"]
+    return user, answer, tools
+
+
+def format_turn(user, answer, tools, max_chars=MAX_TURN_CHARS):
+    """一轮对话的正文 (写入会话日志并向量化)，超过 max_chars 时截断回答与工具摘要。"""
+    sections = [f"### User\n{user}", f"### AI\n{answer}"]
+    if tools:
+        sections.append("### Tools\n" + "\n".join(f"- {t}" for t in tools))
+    body = "\n\n".join(sections)
+    return body if len(body) <= max_chars else body[:max_chars] + "\n…(truncated)"
+
+
+def _default_db():
+    from skills.knowledge_base.scripts.db_manager import DBManager
+    return DBManager.get_instance(verbose=False)
+
+
+class TurnRecorder:
+    """
+    按轮次增量写入情景记忆：每轮对话结束后
+    1. 同步追加到会话日志 (Markdown，进程崩溃也不丢已完成的轮次)
+    2. 放入有界队列，由后台线程切片、向量化并追加到 episodic_memory
+       (片段带 session_id / turn_id / 起止时间，来源为会话日志)
+    退出时只需等待队列中剩余的少量轮次，不再整段会话一次性入库。
+    """
+
+    def __init__(self, log_dir, session_id=None, collection=EPISODIC_COLLECTION, db_factory=None):
+        self.session_id = session_id or new_session_id()
+        self.log_path = os.path.abspath(os.path.join(log_dir, f"{self.session_id}_session.md"))
+        self.collection = collection
+        self._db_factory = db_factory or _default_db
+        self._queue = queue.Queue(maxsize=TURN_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._lines = 0      # 会话日志已写入的行数 (片段 line_range 指向日志中的行)
+        self.turns = 0
+        self.stats = {"ingested": 0, "chunks": 0, "failed": 0, "dropped": 0}
+        self.last_error = None
+
+    def record(self, messages, started_at=None, ended_at=None):
+        """记录一轮对话 (本轮新增的消息)，返回 turn_id；没有用户输入时返回 None。不等待向量化。"""
+        turn = summarize_turn(messages)
+        if turn is None:
+            return None
+        with self._lock:
+            self.turns += 1
+            turn_id = self.turns
+            started_at = started_at or _now()
+            ended_at = ended_at or _now()
+            body = format_turn(*turn)
+            first_line = self._append_log(turn_id, started_at, body)
+        item = {"turn_id": turn_id, "body": body, "first_line": first_line,
+                "started_at": started_at, "ended_at": ended_at}
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # 后台写入跟不上时不阻塞对话，退出时整段会话补入库
+            self.stats["dropped"] += 1
+        self._ensure_worker()
+        return turn_id
+
+    def _append_log(self, turn_id, started_at, body):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        lines = []
+        if self._lines == 0:
+            lines.append(f"# Session Log: {self.session_id}")
+        lines += ["", f"## Turn {turn_id} ({started_at})"]
+        first_line = self._lines + len(lines) + 1
+        lines += body.splitlines()
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self._lines += len(lines)
+        return first_line
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="kb-turn-memory", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._ingest(item)
+                self.stats["ingested"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                self.last_error = str(e)
+            finally:
+                self._queue.task_done()
+
+    def _rows(self, item):
+        location = f"Turn {item['turn_id']}"
+        chunks = list(chunk_blocks([TextBlock(location, item["body"])]))
+        offset = item["first_line"] - 1
+        ingested_at = _now()
+        rows = []
+        for i, chunk in enumerate(chunks):
+            chunk_key = f"{self.log_path}\0turn-{item['turn_id']}\0{i}"
+            rows.append({
+                "text": chunk["text"],
+                "source": self.log_path,
+                "line_range": f"{offset + chunk['line_start']}-{offset + chunk['line_end']}",
+                "location": chunk["location"],
+                "type": "turn",
+                "chunk_id": hashlib.md5(chunk_key.encode("utf-8")).hexdigest(),
+                "ingested_at": ingested_at,
+                "session_id": self.session_id,
+                "turn_id": item["turn_id"],
+                "turn_started_at": item["started_at"],
+                "turn_ended_at": item["ended_at"],
+            })
+        return rows
+
+    def _ingest(self, item):
+        rows = self._rows(item)
+        if not rows:
+            return
+        db = self._db_factory()
+        vectors = db.embed_documents([r["text"] for r in rows])
+        db.append_chunks(self.collection, [{"vector": v, **r} for r, v in zip(rows, vectors)])
+        # 已在后台线程中，索引维护与小碎片压缩同步完成 (flush 返回时表已整理好)
+        db.maintain_indexes(self.collection, background=False)
+        self.stats["chunks"] += len(rows)
+
+    def flush(self, timeout=TURN_FLUSH_TIMEOUT):
+        """等待已记录的轮次写完 (最多 timeout 秒)，返回是否全部完成。"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        threading.Thread(target=lambda: (self._queue.join(), done.set()), daemon=True).start()
+        return done.wait(timeout)
+
+    def close(self, timeout=TURN_FLUSH_TIMEOUT):
+        """
+        退出时调用：等待剩余轮次写完并停止后台线程。
+        返回是否需要整段补入库 (有轮次被丢弃、写入失败或超时未完成)。
+        """
+        finished = self.flush(timeout)
+        if self._thread is not None and finished:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        return not finished or bool(self.stats["dropped"] or self.stats["failed"])
+
+
+def parse_session_log(log_path):
+    """
+    从 TurnRecorder 写的会话日志还原各轮 (session_id, [轮次])，轮次与后台写入时的结构相同。
+    不是按轮次写的会话日志 (没有 "## Turn N" 标题) 时返回 (None, [])。
+    """
+    with open(log_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    if not lines or not lines[0].startswith("# Session Log: "):
+        return None, []
+    session_id = lines[0][len("# Session Log: "):].strip()
+    items, body = [], None
+    for number, line in enumerate(lines, start=1):
+        match = _TURN_HEADER.match(line)
+        if match:
+            body = []
+            items.append({"turn_id": int(match.group(1)), "body": body, "first_line": number + 1,
+                          "started_at": match.group(2), "ended_at": match.group(2)})
+        elif body is not None:
+            body.append(line)
+    for item in items:
+        # 每轮之前写入的空行属于分隔，不是正文
+        while item["body"] and not item["body"][-1]:
+            item["body"].pop()
+        item["body"] = "\n".join(item["body"])
+    return (session_id, items) if items else (None, [])
+
+
+def _ingested_turns(db, collection, log_path):
+    from skills.knowledge_base.scripts.filters import sql_literal
+    tbl = db.get_table(collection)
+    if tbl is None or "turn_id" not in tbl.schema.names:
+        return set()
+    rows = (tbl.search().where(f"source = {sql_literal(log_path)} AND type = 'turn'")
+            .select(["turn_id"]).limit(None).to_list())
+    return {r["turn_id"] for r in rows}
+
+
+def backfill_session(log_path, collection=EPISODIC_COLLECTION, db=None):
+    """
+    补齐按轮次写入时失败或被丢弃的轮次：只追加表中还没有的 turn_id，
+    片段结构与 TurnRecorder 后台写入的完全一致 (不会把整段日志再作为普通文档入库一遍)。
+    返回 added / skipped；不是按轮次写的会话日志时返回 None。
+    """
+    log_path = os.path.abspath(log_path)
+    session_id, items = parse_session_log(log_path)
+    if not items:
+        return None
+    db = db or _default_db()
+    recorder = TurnRecorder(os.path.dirname(log_path), session_id=session_id, collection=collection,
+                            db_factory=lambda: db)
+    recorder.log_path = log_path
+    done = _ingested_turns(db, collection, log_path)
+    rows = [row for item in items if item["turn_id"] not in done for row in recorder._rows(item)]
+    if not rows:
+        return "skipped"
+    vectors = db.embed_documents([r["text"] for r in rows])
+    db.append_chunks(collection, [{"vector": v, **r} for r, v in zip(rows, vectors)])
+    db.maintain_indexes(collection, background=False)
+    print(f"🧠 Backfilled {len({r['turn_id'] for r in rows})} turns ({len(rows)} chunks) from {log_path}")
+    return "added"
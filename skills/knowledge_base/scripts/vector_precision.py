@@ -0,0 +1,202 @@
+import os
+import heapq
+
+import numpy as np
+import pyarrow as pa
+
+# 向量存储精度：新建集合时使用 ZX_KB_VECTOR_PRECISION，已有集合沿用表中的实际类型
+PRECISIONS = ("float32", "float16", "int8")
+DEFAULT_PRECISION = os.environ.get("ZX_KB_VECTOR_PRECISION", "float32")
+VECTOR_COLUMN = "vector"
+SCALE_COLUMN = "vector_scale"   # int8 每行的量化比例：向量 ≈ codes * scale
+INT8_SCAN_BATCH = 8192
+
+_ARROW_TYPES = {"float32": pa.float32(), "float16": pa.float16(), "int8": pa.int8()}
+
+
+def check_precision(precision):
+    if precision not in PRECISIONS:
+        raise ValueError(f"不支持的向量精度 '{precision}'，可选: {', '.join(PRECISIONS)}")
+    return precision
+
+
+def table_precision(tbl):
+    """按向量列的元素类型判断表的存储精度。"""
+    value_type = tbl.schema.field(VECTOR_COLUMN).type.value_type
+    for name, arrow_type in _ARROW_TYPES.items():
+        if value_type == arrow_type:
+            return name
+    return "float32"
+
+
+def bytes_per_vector(precision, dim):
+    if precision == "int8":
+        return dim + 4  # codes + float32 scale
+    return dim * (2 if precision == "float16" else 4)
+
+
+def quantize_int8(matrix):
+    """逐行对称标量量化：scale = max|v| / 127。"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes, scales):
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+def roundtrip(matrix, precision):
+    """按目标精度编码再解码，用于评估精度损失。"""
+    if precision == "float16":
+        return np.asarray(matrix, dtype=np.float16).astype(np.float32)
+    if precision == "int8":
+        return dequantize_int8(*quantize_int8(matrix))
+    return np.asarray(matrix, dtype=np.float32)
+
+
+def encode_rows(rows, precision):
+    """写入前按精度转换向量 (行字典列表)。float32 原样返回。"""
+    if precision == "float32" or not rows:
+        return rows
+    matrix = np.stack([np.asarray(r[VECTOR_COLUMN], dtype=np.float32) for r in rows])
+    if precision == "float16":
+        return [{**r, VECTOR_COLUMN: v} for r, v in zip(rows, matrix.astype(np.float16))]
+    codes, scales = quantize_int8(matrix)
+    return [{**r, VECTOR_COLUMN: c, SCALE_COLUMN: float(s)} for r, c, s in zip(rows, codes, scales)]
+
+
+def _vector_arrays(matrix, precision):
+    """float32 矩阵 -> [(列名, Arrow 数组)]，向量列为定长列表。"""
+    dim = matrix.shape[1]
+    if precision == "int8":
+        codes, scales = quantize_int8(matrix)
+        values = pa.array(codes.reshape(-1), type=pa.int8())
+        return [(VECTOR_COLUMN, pa.FixedSizeListArray.from_arrays(values, dim)),
+                (SCALE_COLUMN, pa.array(scales, type=pa.float32()))]
+    values = pa.array(matrix.astype(np.float16 if precision == "float16" else np.float32).reshape(-1),
+                      type=_ARROW_TYPES[precision])
+    return [(VECTOR_COLUMN, pa.FixedSizeListArray.from_arrays(values, dim))]
+
+
+def rows_to_arrow(rows, precision):
+    """
+    行字典列表 -> Arrow 表 (建表用)。自动推断会把 float16/int8 向量当成 float32，
+    因此向量列按精度显式构造。
+    """
+    matrix = np.stack([np.asarray(r[VECTOR_COLUMN], dtype=np.float32) for r in rows])
+    rest = pa.Table.from_pylist([{k: v for k, v in r.items() if k not in (VECTOR_COLUMN, SCALE_COLUMN)} for r in rows])
+    for name, array in _vector_arrays(matrix, precision):
+        rest = rest.append_column(name, array)
+    return rest
+
+
+def decode_vectors(table):
+    """从 Arrow 表 (含 vector 列，int8 时含 scale 列) 还原 float32 矩阵。"""
+    column = table.column(VECTOR_COLUMN).combine_chunks()
+    dim = column.type.list_size
+    values = column.flatten().to_numpy(zero_copy_only=False).reshape(-1, dim)
+    if pa.types.is_int8(column.type.value_type):
+        scales = table.column(SCALE_COLUMN).to_numpy(zero_copy_only=False)
+        return dequantize_int8(values, scales)
+    return values.astype(np.float32)
+
+
+def int8_search(tbl, query_vec, limit, where=None, columns=None):
+    """
+    int8 表的向量检索：LanceDB 不支持 int8 向量列的 L2 检索，
+    这里按批流式扫描 codes + scale，在 numpy 中反量化计算距离，再按 _rowid 取回结果行
+    (columns 指定时只取这些列)。
+    """
+    q = np.asarray(query_vec, dtype=np.float32)
+    builder = tbl.search().select([VECTOR_COLUMN, SCALE_COLUMN]).with_row_id(True)
+    if where:
+        builder = builder.where(where)
+    heap = []  # (-distance, rowid)，保留距离最小的 limit 个
+    for batch in builder.limit(None).to_batches(INT8_SCAN_BATCH):
+        table = pa.Table.from_batches([batch])
+        if table.num_rows == 0:
+            continue
+        dists = ((decode_vectors(table) - q) ** 2).sum(axis=1)
+        rowids = table.column("_rowid").to_numpy()
+        top = np.argpartition(dists, min(limit, len(dists) - 1))[:limit]
+        for i in top:
+            item = (-float(dists[i]), int(rowids[i]))
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+    if not heap:
+        return []
+    distances = {rowid: -neg for neg, rowid in heap}
+    builder = tbl.search().where(f"_rowid IN ({', '.join(str(r) for r in distances)})")
+    if columns:
+        builder = builder.select(list(columns))
+    rows = builder.with_row_id(True).limit(len(distances)).to_list()
+    for row in rows:
+        row["_distance"] = distances[row.pop("_rowid")]
+    return sorted(rows, key=lambda r: r["_distance"])
+
+
+def convert_table(db, table_name, precision):
+    """
+    把已有集合转换为目标精度 (整表重写为新版本，随后重建索引)。
+    int8 -> 更高精度只能还原量化后的近似值。
+    """
+    check_precision(precision)
+    tbl = db.get_table(table_name)
+    if tbl is None:
+        raise ValueError(f"知识库 '{table_name}' 不存在")
+    current = table_precision(tbl)
+    before = tbl.stats()["total_bytes"]
+    if current == precision:
+        return {"from": current, "to": precision, "rows": tbl.count_rows(), "before_bytes": before, "after_bytes": before}
+
+    data = tbl.to_arrow()
+    matrix = decode_vectors(data)
+    rest = data.drop_columns([c for c in (VECTOR_COLUMN, SCALE_COLUMN) if c in data.column_names])
+    for name, array in _vector_arrays(matrix, precision):
+        rest = rest.append_column(name, array)
+    tbl = db.overwrite_table(table_name, rest)
+    db.maintain_indexes(table_name, background=False)
+    return {"from": current, "to": precision, "rows": rest.num_rows,
+            "before_bytes": before, "after_bytes": tbl.stats()["total_bytes"]}
+
+
+def precision_report(tbl, k=10, samples=50, max_rows=50000):
+    """
+    精度对比报告：取表中至多 max_rows 个向量，以 float32 暴力检索为真值，
+    分别模拟 float16 / int8 存储后的 recall@k 与每行向量字节数。
+    (表本身已是低精度时，真值为其解码后的向量。)
+    """
+    data = tbl.search().select([c for c in (VECTOR_COLUMN, SCALE_COLUMN) if c in tbl.schema.names]) \
+        .limit(max_rows).to_arrow()
+    base = decode_vectors(data)
+    if len(base) == 0:
+        return []
+    dim = base.shape[1]
+    k = min(k, len(base))
+    rng = np.random.default_rng(0)
+    queries = base[rng.choice(len(base), size=min(samples, len(base)), replace=False)]
+
+    def _topk(matrix):
+        dists = (queries ** 2).sum(1)[:, None] + (matrix ** 2).sum(1)[None, :] - 2 * queries @ matrix.T
+        return np.argpartition(dists, k - 1, axis=1)[:, :k]
+
+    truth = [set(row) for row in _topk(base)]
+    total_rows = tbl.count_rows()
+    report = []
+    for precision in PRECISIONS:
+        approx = _topk(roundtrip(base, precision))
+        hits = sum(len(gt & set(row)) for gt, row in zip(truth, approx))
+        per_vector = bytes_per_vector(precision, dim)
+        report.append({
+            "precision": precision,
+            "bytes_per_vector": per_vector,
+            "vector_bytes": per_vector * total_rows,
+            "reduction": 1 - per_vector / bytes_per_vector("float32", dim),
+            "recall": hits / (len(truth) * k),
+        })
+    return report
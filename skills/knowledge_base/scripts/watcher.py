@@ -0,0 +1,259 @@
+import os
+import time
+import threading
+from collections import deque
+
+from skills.knowledge_base.scripts import ingest
+from skills.knowledge_base.scripts.metrics import percentile
+
+# 可选依赖：watchdog (inotify / FSEvents / ReadDirectoryChangesW)，缺失时退回轮询
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    HAS_WATCHDOG = True
+except ImportError:
+    HAS_WATCHDOG = False
+
+# 监听参数 (均可通过环境变量覆盖)
+WATCH_DEBOUNCE_SECONDS = float(os.environ.get("ZX_KB_WATCH_DEBOUNCE", "2"))   # 路径静默这么久才入库 (编辑器连续保存只入库一次)
+WATCH_POLL_SECONDS = float(os.environ.get("ZX_KB_WATCH_POLL", "2"))           # 轮询模式的扫描间隔
+WATCH_REPORT_SECONDS = 30    # 状态输出间隔
+LAG_WINDOW = 500             # 延迟统计窗口 (最近处理的变更数)
+
+
+def is_supported(path):
+    """入库支持的格式，忽略 Office 锁文件 (~$x.docx) 与隐藏的临时文件"""
+    name = os.path.basename(path)
+    if name.startswith(("~$", ".")):
+        return False
+    return name.lower().endswith(ingest.SUPPORTED_EXTENSIONS)
+
+
+def snapshot(root):
+    """目录下所有支持格式文件的 {绝对路径: (大小, 修改时间)}"""
+    files = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if not is_supported(path):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.abspath(path)] = (st.st_size, st.st_mtime)
+    return files
+
+
+class ChangeBuffer:
+    """防抖缓冲：同一路径的连续事件合并，静默 debounce 秒后才交给入库。线程安全。"""
+
+    def __init__(self, debounce=WATCH_DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._changes = {}   # path -> [首次发现时间, 最近一次事件时间]
+        self._lock = threading.Lock()
+
+    def add(self, path, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            item = self._changes.setdefault(path, [now, now])
+            item[1] = now
+
+    def due(self, now=None):
+        """取出已静默足够久的路径: [(path, 首次发现时间)]"""
+        now = time.time() if now is None else now
+        with self._lock:
+            ready = [p for p, (_, last) in self._changes.items() if now - last >= self.debounce]
+            return [(p, self._changes.pop(p)[0]) for p in sorted(ready)]
+
+    def oldest(self):
+        with self._lock:
+            return min((first for first, _ in self._changes.values()), default=None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._changes)
+
+
+if HAS_WATCHDOG:
+    class _EventHandler(FileSystemEventHandler):
+        def __init__(self, sync):
+            self.sync = sync
+
+        def on_any_event(self, event):
+            if event.is_directory:
+                # 整个目录被移动/删除时只有一个目录事件，下一轮对比快照补齐
+                if event.event_type in ("moved", "deleted"):
+                    self.sync.request_rescan()
+                return
+            for path in (event.src_path, getattr(event, "dest_path", None)):
+                if path:
+                    self.sync.notify(path)
+
+
+class FolderSync:
+    """
+    让一个集合与目录保持同步：
+    - 变化 (新建/修改/移入) 的文件防抖后增量入库，未变化的按清单跳过
+    - 删除 (或移出) 的文件删除其片段与归档副本
+    - 记录吞吐量与延迟 (从发现变化到写入索引的时间)，以及当前积压
+    有 watchdog 时使用系统文件事件，否则定期对比目录快照。
+    """
+
+    def __init__(self, root, collection="documents", debounce=WATCH_DEBOUNCE_SECONDS,
+                 poll_interval=WATCH_POLL_SECONDS, use_watchdog=None, workers=0):
+        self.root = os.path.abspath(root)
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.use_watchdog = HAS_WATCHDOG if use_watchdog is None else (use_watchdog and HAS_WATCHDOG)
+        self.workers = workers
+        self.buffer = ChangeBuffer(debounce)
+        self.stats = {"events": 0, "ingested": 0, "deleted": 0, "unchanged": 0, "failed": 0, "batches": 0}
+        self._snapshot = {}
+        self._polled_at = None     # 上一次目录快照的时间
+        self._changed_after = {}   # 轮询发现的路径 -> 变化一定发生在该时间之后 (上一次快照)
+        self._rescan = threading.Event()
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self._busy_seconds = 0.0
+
+    def notify(self, path, now=None):
+        """文件事件入口 (watchdog 回调或轮询对比)"""
+        path = os.path.abspath(path)
+        if is_supported(path) and path.startswith(self.root + os.sep):
+            self.buffer.add(path, now)
+            self.stats["events"] += 1
+
+    def request_rescan(self):
+        self._rescan.set()
+
+    def initial_sync(self):
+        """启动时全量对齐：增量入库所有文件 (未变化的按清单跳过)，删除离线期间已被删除的文件。"""
+        self._polled_at = time.time()
+        self._snapshot = snapshot(self.root)
+        files = sorted(self._snapshot)
+        result = ingest.IngestPipeline(self.collection, workers=self.workers).run(files) if files else {}
+        manifest = ingest.DBManager.get_instance().manifest
+        gone = [e.path for e in manifest.entries(self.collection)
+                if e.path.startswith(self.root + os.sep) and e.path not in self._snapshot]
+        for path in gone:
+            ingest.remove_file(path, self.collection)
+        return result, len(gone)
+
+    def poll(self, now=None):
+        """对比前后两次目录快照，变化与删除的路径进入防抖缓冲"""
+        self._rescan.clear()
+        previous, self._polled_at = self._polled_at, time.time() if now is None else now
+        current = snapshot(self.root)
+        changed = [p for p, stat in current.items() if self._snapshot.get(p) != stat]
+        for path in changed + list(self._snapshot.keys() - current.keys()):
+            self.notify(path, now)
+            if previous is not None:
+                self._changed_after.setdefault(os.path.abspath(path), previous)
+        self._snapshot = current
+
+    def process_due(self, now=None):
+        """处理已过防抖期的变更，返回 {路径: 状态}"""
+        due = self.buffer.due(now)
+        if not due:
+            return {}
+        start = time.perf_counter()
+        mtimes = {}
+        for path, _ in due:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                pass
+        present = [p for p, _ in due if p in mtimes]
+        statuses = {}
+        if present:
+            pipeline = ingest.IngestPipeline(self.collection, workers=self.workers, progress_interval=0)
+            pipeline.run(present)
+            statuses.update({p: pipeline.statuses.get(p, "failed") for p in present})
+        for path, _ in due:
+            if path in statuses:
+                continue
+            try:
+                statuses[path] = "deleted" if ingest.remove_file(path, self.collection) else "unchanged"
+            except Exception as e:
+                print(f"❌ Failed to remove {path}: {e}")
+                statuses[path] = "failed"
+        self._busy_seconds += time.perf_counter() - start
+        self.stats["batches"] += 1
+
+        applied = time.time()
+        for path, first_seen in due:
+            status = statuses[path]
+            key = {"added": "ingested", "replaced": "ingested", "skipped": "unchanged", "empty": "ingested"}.get(status, status)
+            self.stats[key] += 1
+            # 延迟从变化发生时算起：系统事件即发现时间；轮询只知道变化发生在上一次快照之后，
+            # 取修改时间但不早于上一次快照 (cp -p / mv / 解压保留的旧修改时间不算延迟)；删除从发现时算起
+            changed_at = first_seen
+            since = self._changed_after.pop(path, None)
+            if since is not None and path in mtimes:
+                changed_at = min(first_seen, max(mtimes[path], since))
+            self._lags.append(max(0.0, applied - changed_at))
+        return statuses
+
+    def lag_stats(self, now=None):
+        """吞吐量与延迟：已处理变更的延迟分位数、当前积压数与最旧积压的等待时间"""
+        now = time.time() if now is None else now
+        lags = list(self._lags)
+        processed = self.stats["ingested"] + self.stats["deleted"] + self.stats["unchanged"]
+        oldest = self.buffer.oldest()
+        return {
+            "mode": "watchdog" if self.use_watchdog else "polling",
+            "processed": processed,
+            "files_per_s": processed / self._busy_seconds if self._busy_seconds else 0.0,
+            "lag_p50_s": percentile(lags, 50),
+            "lag_p95_s": percentile(lags, 95),
+            "pending": len(self.buffer),
+            "behind_s": now - oldest if oldest is not None else 0.0,
+        }
+
+    def run(self, stop_event=None, report_interval=WATCH_REPORT_SECONDS):
+        """持续同步直到 stop_event 被设置 (或 Ctrl+C)"""
+        stop_event = stop_event or threading.Event()
+        self.initial_sync()
+        observer = None
+        if self.use_watchdog:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), self.root, recursive=True)
+            observer.start()
+        print(f"👀 Watching {self.root} -> '{self.collection}' "
+              f"({'watchdog' if observer else f'polling every {self.poll_interval:g}s'}, "
+              f"debounce {self.buffer.debounce:g}s)")
+        if not HAS_WATCHDOG:
+            print("💡 [Watch] 未安装可选依赖 watchdog，使用目录快照轮询；pip install watchdog 可改用系统文件事件")
+        last_poll = last_report = time.time()
+        try:
+            while not stop_event.is_set():
+                now = time.time()
+                if (observer is None and now - last_poll >= self.poll_interval) or self._rescan.is_set():
+                    self.poll(now)
+                    last_poll = now
+                if self.process_due(now) or (report_interval and now - last_report >= report_interval):
+                    print(format_lag(self.stats, self.lag_stats()))
+                    last_report = now
+                stop_event.wait(0.2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+        return self.stats
+
+
+def format_lag(stats, lag):
+    return (
+        f"🔄 [Watch] ingested {stats['ingested']}, deleted {stats['deleted']}, unchanged {stats['unchanged']}, "
+        f"failed {stats['failed']} | {lag['files_per_s']:.1f} files/s | lag p50 {lag['lag_p50_s']:.1f}s "
+        f"p95 {lag['lag_p95_s']:.1f}s | pending {lag['pending']} (behind {lag['behind_s']:.1f}s)"
+    )
+
+
+def watch(input_path, collection="documents", workers=0, use_watchdog=None):
+    """ingest.py --watch 入口"""
+    if not os.path.isdir(input_path):
+        raise ValueError(f"--watch 需要目录: {input_path}")
+    return FolderSync(input_path, collection, use_watchdog=use_watchdog, workers=workers).run()
@@ -0,0 +1,83 @@
+"""
+知识库测试辅助：离线可用的假 Embedding 模型 + 临时数据库目录。
+真实的 bge 模型需要联网下载，单元测试统一使用这里的确定性替身。
+"""
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+FAKE_DIM = 384
+
+
+class FakeTextEmbedding:
+    """基于字符二元组哈希的确定性向量，相同/相近文本得到相近向量。"""
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text):
+        vec = np.zeros(FAKE_DIM, dtype=np.float32)
+        text = text or " "
+        grams = [text[i:i + 2] for i in range(max(1, len(text) - 1))]
+        for g in grams:
+            h = int(hashlib.md5(g.encode("utf-8")).hexdigest()[:8], 16)
+            vec[h % FAKE_DIM] += 1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed(self, texts, **kwargs):
+        self.calls += 1
+        self.texts += len(texts)
+        for t in texts:
+            yield self._vector(t)
+
+
+class FakeCrossEncoder:
+    """按查询与文档共有的字符二元组数打分 (logit)，可设置 delay 模拟慢推理。"""
+
+    def __init__(self, model_name=None, delay=0.0, **kwargs):
+        self.model_name = model_name
+        self.delay = delay
+        self.calls = 0
+
+    def rerank(self, query, documents, batch_size=64, **kwargs):
+        import time
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        q = {query[i:i + 2] for i in range(len(query) - 1)}
+        for doc in documents:
+            d = {doc[i:i + 2] for i in range(len(doc) - 1)}
+            yield float(len(q & d)) - 2.0
+
+
+@contextmanager
+def temp_kb():
+    """在临时目录中启动一个使用假模型的 DBManager，退出时清理。"""
+    from skills.knowledge_base.scripts import db_manager, ingest
+
+    base = tempfile.mkdtemp(prefix="zx_kb_test_")
+    db_path = os.path.join(base, "lancedb_store")
+    docs_path = os.path.join(base, "documents")
+    with patch.object(db_manager, "DB_PATH", db_path), \
+         patch.object(db_manager, "DOCS_ARCHIVE_PATH", docs_path), \
+         patch.object(ingest, "DOCS_ARCHIVE_PATH", docs_path), \
+         patch.object(db_manager, "TextEmbedding", FakeTextEmbedding):
+        db_manager.DBManager._instance = None
+        try:
+            yield db_manager.DBManager.get_instance(verbose=False)
+        finally:
+            if db_manager.DBManager._instance is not None:
+                db_manager.DBManager._instance.meta.close()
+            db_manager.DBManager._instance = None
+            shutil.rmtree(base, ignore_errors=True)
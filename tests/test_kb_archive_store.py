@@ -0,0 +1,139 @@
+import unittest
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest
+from skills.knowledge_base.scripts.archive_store import store_file, hash_file, object_dir
+from skills.knowledge_base.scripts.manage import delete_knowledge, archive_knowledge
+
+
+class TestArchiveStore(unittest.TestCase):
+
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp(prefix="zx_kb_archive_src_")
+        self.archive_dir = tempfile.mkdtemp(prefix="zx_kb_archive_")
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir, ignore_errors=True)
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def _write(self, name, body):
+        path = os.path.join(self.src_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        return path
+
+    def test_content_addressed_layout(self):
+        """测试内容寻址：完整 SHA-256 分片目录，同内容不同文件名只存一份，同名复用"""
+        body = "# 报告\n" + "星云数据库副本延迟排查。\n" * 1000
+        a = self._write("报告.md", body)
+        b = self._write("sub/报告副本.md", body)
+        digest = hash_file(a)
+        self.assertEqual(digest, hashlib.sha256(body.encode("utf-8")).hexdigest())
+
+        path_a, method_a = store_file(a, digest, self.archive_dir, mode="copy")
+        self.assertEqual(path_a, os.path.join(self.archive_dir, digest[:2], digest[2:4], digest, "报告.md"))
+        self.assertEqual(method_a, "copy")
+        with open(path_a, encoding="utf-8") as f:
+            self.assertEqual(f.read(), body)
+        self.assertEqual(os.stat(path_a).st_mtime, os.stat(a).st_mtime)
+
+        path_b, method_b = store_file(b, digest, self.archive_dir, mode="copy")
+        self.assertEqual((os.path.dirname(path_b), method_b), (object_dir(self.archive_dir, digest), "dedup"))
+        self.assertTrue(os.path.samefile(path_a, path_b), "identical content is stored once")
+        self.assertEqual(store_file(a, digest, self.archive_dir)[1], "existing")
+        self.assertEqual([n for n in os.listdir(os.path.dirname(path_a)) if n.startswith(".tmp-")], [])
+
+    def test_link_modes(self):
+        """测试硬链接模式与源文件共享 inode；reflink 不可用时退回复制"""
+        src = self._write("a.md", "# 甲\n硬链接测试。")
+        digest = hash_file(src)
+        path, method = store_file(src, digest, self.archive_dir, mode="hardlink")
+        self.assertEqual(method, "hardlink")
+        self.assertTrue(os.path.samefile(src, path))
+
+        other = self._write("b.md", "# 乙\nreflink 测试。")
+        path, method = store_file(other, hash_file(other), self.archive_dir, mode="reflink")
+        self.assertIn(method, ("reflink", "copy"))
+        self.assertFalse(os.path.samefile(other, path))
+        with self.assertRaises(ValueError):
+            store_file(other, hash_file(other), self.archive_dir, mode="symlink")
+
+    def test_refcount_across_collections(self):
+        """测试引用计数：同一文档入库两个集合共用归档，全部删除后才删除文件并清理分片目录"""
+        path = self._write("共享.md", "# 共享\n两个集合都入库的文档。")
+        with temp_kb() as db:
+            ingest.main(path, "col_a")
+            ingest.main(path, "col_b")
+            source = db.manifest.get("col_a", path).source
+            self.assertEqual(db.manifest.get("col_b", path).source, source)
+            self.assertEqual(db.archive.refcount(source), 2)
+
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                self.assertIn("予以保留", delete_knowledge("共享.md", "col_a"))
+                self.assertTrue(os.path.exists(source))
+                self.assertIn("归档目录删除", delete_knowledge("共享.md", "col_b"))
+            self.assertFalse(os.path.exists(source))
+            self.assertFalse(os.path.exists(os.path.dirname(source)), "empty shard directories are removed")
+
+    def test_shared_archive_within_collection(self):
+        """测试同一集合内两个路径共用归档：清单中仍有路径使用时释放不删除文件"""
+        body = "# 笔记\n两个目录下的同名文件。"
+        x, y = self._write("x/笔记.md", body), self._write("y/笔记.md", body)
+        with temp_kb() as db:
+            ingest.main(self.src_dir, "col_a")
+            source = db.manifest.get("col_a", x).source
+            self.assertEqual(db.manifest.get("col_a", y).source, source)
+
+            db.manifest.remove_path("col_a", x)
+            self.assertFalse(db.archive.release("col_a", source))
+            self.assertTrue(os.path.exists(source))
+            self.assertEqual(db.archive.refcount(source), 1)
+
+            self.assertTrue(ingest.remove_file(y, "col_a"))
+            self.assertFalse(os.path.exists(source))
+
+    def test_modified_file_releases_old_archive(self):
+        """测试修改后重新入库：旧归档不再被引用时删除；删除集合释放全部引用"""
+        path = self._write("a.md", "# 版本一\n第一版内容。")
+        with temp_kb() as db:
+            ingest.main(path, "col_a")
+            old = db.manifest.get("col_a", path).source
+            self._write("a.md", "# 版本二\n第二版内容。")
+            ingest.main(path, "col_a")
+            new = db.manifest.get("col_a", path).source
+            self.assertNotEqual(old, new)
+            self.assertFalse(os.path.exists(old))
+
+            db.reset_table("col_a")
+            self.assertFalse(os.path.exists(new))
+            self.assertEqual(db.archive.stats()["files"], 0)
+
+    def test_gc_backfills_legacy_archives(self):
+        """测试回收：升级前的旧归档按来源目录补登记引用后保留，无引用的文件被删除"""
+        with temp_kb() as db:
+            legacy = os.path.join(db.archive.archive_dir, "1a2b3c4d_旧文档.md")
+            orphan = os.path.join(db.archive.archive_dir, "5e6f7a8b_孤儿.md")
+            for p in (legacy, orphan):
+                with open(p, "w", encoding="utf-8") as f:
+                    f.write("# 旧\n升级前的归档。")
+            vec = db.embed_query("旧")
+            db.create_table("legacy", [{"vector": vec, "text": "升级前的归档", "source": legacy}])
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                report = archive_knowledge(gc=True)
+            self.assertIn("已回收 1 个", report)
+            self.assertTrue(os.path.exists(legacy))
+            self.assertFalse(os.path.exists(orphan))
+            self.assertEqual(db.archive.refcount(legacy), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import query
+
+COLLECTION = "test_batch"
+TEXTS = [
+    "星云核心的授权价格为 50000 元",
+    "部署需要 8 核 CPU 与 32G 内存",
+    "交付周期为四周",
+    "会议纪要：客户关注数据安全",
+]
+
+
+class TestBatchSearch(unittest.TestCase):
+
+    def _seed(self, db, name=COLLECTION):
+        vectors = db.embed_documents(TEXTS)
+        data = [{"vector": v, "text": t, "source": f"/tmp/{name}_{i}.md", "line_range": "1-1",
+                 "location": "Unknown Location", "type": "document", "chunk_id": f"{name}-{i}"}
+                for i, (t, v) in enumerate(zip(TEXTS, vectors))]
+        db.create_table(name, data)
+
+    def test_batch_embeds_once_and_groups_results(self):
+        """测试批量检索：所有问题一次向量化，结果按问题分组且每组受上限约束"""
+        with temp_kb() as db:
+            self._seed(db)
+            calls = db.embedding_model.calls
+            output = query.search_many(["授权价格", "部署 CPU 内存", "交付周期"], COLLECTION, limit=2, mode="vector")
+            self.assertEqual(db.embedding_model.calls, calls + 1)
+            self.assertIn("3 个问题", output)
+            for q in ("授权价格", "部署 CPU 内存", "交付周期"):
+                self.assertIn(f"(Query: {q})", output)
+            # 每个问题最多 2 条
+            self.assertEqual(output.count("Source:"), 6)
+            price_section = output.split("(Query: 授权价格)")[1].split("(Query:")[0]
+            self.assertIn("50000", price_section.splitlines()[1])
+
+    def test_batch_across_collections_and_cap(self):
+        """测试批量检索可跨集合，超出单次上限的问题被忽略并提示"""
+        with temp_kb() as db:
+            self._seed(db, "documents")
+            self._seed(db, "episodic_memory")
+            with patch.object(query, "MAX_BATCH_QUERIES", 2):
+                output = query.search_many(["价格", "内存", "安全"], "all", limit=1)
+            self.assertIn("Collection:", output)
+            self.assertIn("已忽略: 安全", output)
+
+    def test_single_and_empty(self):
+        with temp_kb() as db:
+            self._seed(db)
+            self.assertIn("知识库检索结果", query.search_many(["价格", " 价格 "], COLLECTION))
+            self.assertIn("未提供", query.search_many(["", "  "], COLLECTION))
+            self.assertIn("不存在", query.search_many(["a", "b"], "missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import benchmark
+from skills.knowledge_base.scripts.chunker import chunk_blocks
+from skills.knowledge_base.scripts.extractors import iter_document_blocks
+from skills.knowledge_base.scripts.synthetic_corpus import generate_corpus, CORPUS_FORMATS
+
+
+class TestKnowledgeBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="zx_kb_bench_")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_synthetic_corpus(self):
+        """测试合成语料：四种格式都能被抽取，片段数接近目标；同参数复用、内容确定"""
+        for fmt in CORPUS_FORMATS:
+            out_dir = os.path.join(self.work_dir, fmt)
+            files = generate_corpus(out_dir, fmt, 60)
+            chunks = [c for f in files for c in chunk_blocks(iter_document_blocks(f))]
+            self.assertGreaterEqual(len(chunks), 40, fmt)
+            self.assertLessEqual(len(chunks), 80, fmt)
+            self.assertEqual(len({c["text"] for c in chunks}), len(chunks), f"{fmt} chunks are distinct")
+
+            mtime = os.path.getmtime(files[0])
+            self.assertEqual(generate_corpus(out_dir, fmt, 60), files)
+            self.assertEqual(os.path.getmtime(files[0]), mtime, "cached corpus is reused")
+
+        again = os.path.join(self.work_dir, "again")
+        with open(generate_corpus(again, "md", 60)[0], encoding="utf-8") as a, \
+                open(os.path.join(self.work_dir, "md", "doc_000000.md"), encoding="utf-8") as b:
+            self.assertEqual(a.read(), b.read())
+        with self.assertRaises(ValueError):
+            generate_corpus(again, "pptx", 10)
+
+    def test_benchmark_report(self):
+        """测试基准结果：各阶段吞吐、查询延迟分位数、召回率与磁盘占用，结果可序列化并能对比"""
+        self.assertEqual([benchmark.parse_size(s) for s in ("1k", "100k", "1m", "500")],
+                         [1000, 100000, 1000000, 500])
+        with temp_kb() as db:
+            results = benchmark.run_benchmark(db, self.work_dir, formats=("md", "pdf"), sizes=(80,),
+                                              queries=12, k=5, verbose=False)
+            self.assertEqual(len(results["runs"]), 2)
+            run = results["runs"][0]
+            self.assertEqual(run["chunks"], db.get_table("bench_md_80").count_rows())
+            for stage in benchmark.STAGES:
+                self.assertIn(stage, run["ingest"]["stages"])
+            self.assertGreater(run["ingest"]["stages"]["embed"]["chunks_per_s"], 0)
+            for mode in ("embed", "vector", "keyword", "hybrid"):
+                lat = run["query"][mode]
+                self.assertLessEqual(lat["p50_ms"], lat["p99_ms"])
+            # 没有 ANN 索引时向量检索就是精确检索
+            self.assertAlmostEqual(run["query"]["recall_at_k"], 1.0)
+            self.assertGreater(run["disk"]["table_bytes"], 0)
+            self.assertGreater(run["disk"]["bytes_per_chunk"], 0)
+
+            # 重复运行先删除旧集合，行数不累加
+            again = benchmark.run_one(db, self.work_dir, "md", 80, queries=4, k=5, verbose=False)
+            self.assertEqual(again["chunks"], run["chunks"])
+
+        base = json.loads(json.dumps(results))
+        current = json.loads(json.dumps(results))
+        current["runs"][0]["ingest"]["chunks_per_s"] = base["runs"][0]["ingest"]["chunks_per_s"] / 2
+        rows = benchmark.compare(base, current)
+        slower = next(r for r in rows if r["format"] == "md" and r["metric"] == "ingest chunks/s")
+        self.assertAlmostEqual(slower["change"], -0.5)
+        self.assertFalse(slower["better"])
+        self.assertIn("-50.0%", benchmark.format_compare(rows, base["meta"], current["meta"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts.extractors import TextBlock, UNKNOWN_LOCATION
+from skills.knowledge_base.scripts import chunker
+from skills.knowledge_base.scripts.chunker import chunk_blocks, estimate_tokens, CHUNK_MAX_TOKENS
+from skills.knowledge_base.scripts.manage import chunks_knowledge
+
+
+def _paragraph(tag, lines=12):
+    return "\n".join(f"{tag} 第 {n} 行：结构感知切片的测试正文，包含 QPS 与延迟指标" for n in range(lines))
+
+
+class TestStructuredChunker(unittest.TestCase):
+
+    def test_chunks_never_straddle_locations(self):
+        """测试片段不跨页，短页各自成片且无重叠"""
+        pages = [TextBlock(f"Page {i}", "\n".join(f"第 {i} 页第 {n} 行" for n in range(8))) for i in range(1, 4)]
+        chunks = list(chunk_blocks(pages))
+        self.assertEqual([c["location"] for c in chunks], ["Page 1", "Page 2", "Page 3"])
+        self.assertEqual([(c["line_start"], c["line_end"]) for c in chunks], [(1, 8), (9, 16), (17, 24)])
+
+        # 新页开头就是超长单行：切开的每一段都标为新页
+        chunks = list(chunk_blocks([TextBlock("Page 1", "hello world"), TextBlock("Page 2", "中" * 1200)]))
+        self.assertEqual([c["location"] for c in chunks], ["Page 1", "Page 2", "Page 2", "Page 2"])
+
+    def test_markdown_headings_become_sections(self):
+        """测试 Markdown 标题分节：文档标题并入首节，长小节的续写片段带标题"""
+        text = "# 产品白皮书\n\n## 概述\n" + _paragraph("概述", 6) + "\n\n## 性能\n" + \
+            "\n\n".join(_paragraph(f"性能{i}") for i in range(3))
+        chunks = list(chunk_blocks([TextBlock(UNKNOWN_LOCATION, text)]))
+        self.assertEqual(chunks[0]["location"], "Section: 产品白皮书")
+        self.assertTrue(chunks[0]["text"].startswith("# 产品白皮书\n\n## 概述"))
+        perf = [c for c in chunks if c["location"] == "Section: 性能"]
+        self.assertGreater(len(perf), 1)
+        for c in perf:
+            self.assertTrue(c["text"].startswith("## 性能"))
+        # 段落边界切分不产生重叠
+        bodies = [c["text"].split("\n", 1)[1] for c in perf[1:]]
+        self.assertFalse(any(line in perf[0]["text"] for b in bodies for line in b.splitlines()))
+
+    def test_hard_max_and_mid_paragraph_overlap(self):
+        """测试无空行的长文本按硬上限切分并带重叠，超长单行也被切开"""
+        long_paragraph = _paragraph("长段落", 60)
+        chunks = list(chunk_blocks([TextBlock("Page 1", long_paragraph)]))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(c["text"]) <= CHUNK_MAX_TOKENS for c in chunks))
+        self.assertLess(chunks[1]["line_start"], chunks[0]["line_end"] + 1)
+
+        chunks = list(chunk_blocks([TextBlock("Page 1", "字" * 1200)]))
+        self.assertEqual([estimate_tokens(c["text"]) for c in chunks], [480, 480, 240])
+
+
+class TestChunkerReport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="zx_kb_chunks_")
+        with open(os.path.join(self.tmp, "guide.md"), "w", encoding="utf-8") as f:
+            sections = []
+            for title in ("安装", "部署星云集群"):
+                body = "\n\n".join("\n".join(f"{title} {p}.{n}：正文内容" for n in range(10)) for p in range(4))
+                sections.append(f"## {title}\n{body}")
+            f.write("# 指南\n\n" + "\n\n".join(sections))
+        self.eval_path = os.path.join(self.tmp, "eval.jsonl")
+        with open(self.eval_path, "w", encoding="utf-8") as f:
+            f.write('{"query": "部署星云集群", "expected": ["部署星云集群"]}\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_compare_chunkers(self):
+        """测试对比报告：新切片片段更少、无跨位置与重复，并输出检索质量"""
+        report = chunker.compare_chunkers([os.path.join(self.tmp, "guide.md")])
+        old, new = report["lines-20-5"], report["structured"]
+        self.assertLess(new["chunks"], old["chunks"])
+        self.assertGreater(old["redundancy"], 0.1)
+        self.assertLess(new["redundancy"], old["redundancy"])
+        self.assertEqual(new["cross_location"], 0)
+
+        with temp_kb() as db, patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+            out = chunks_knowledge(self.tmp, self.eval_path, k=1)
+        self.assertIn("lines-20-5", out)
+        self.assertIn("structured", out)
+        self.assertIn("hit@1", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
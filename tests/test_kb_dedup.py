@@ -0,0 +1,115 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest, query
+from skills.knowledge_base.scripts.filters import build_filter
+from skills.knowledge_base.scripts.dedup import simhash, similarity
+from skills.knowledge_base.scripts.manage import dedup_knowledge
+
+COLLECTION = "test_dedup"
+
+DISCLAIMER = "免责声明：本文件仅供内部参考，未经书面许可不得转载、复制或向第三方披露，违者将依法追究相关责任。"
+REPORT = "\n\n".join(
+    f"## 第{i}章\n" + "\n".join(f"星云数据库第{i}章第{n}节：{'吞吐延迟副本分片索引压缩'[n % 10]}相关的测试说明与指标 {i * 100 + n}"
+                                for n in range(12)) + f"\n\n{DISCLAIMER}"
+    for i in range(3)
+)
+
+
+class TestChunkDedup(unittest.TestCase):
+
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp(prefix="zx_kb_dedup_")
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir, ignore_errors=True)
+
+    def _write(self, name, body):
+        path = os.path.join(self.src_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        return path
+
+    def test_simhash_similarity(self):
+        """测试 SimHash：个别字不同的文本相似度高，同一模板的不同章节相似度低"""
+        parts = REPORT.split("\n\n")
+        self.assertGreaterEqual(similarity(simhash(parts[0]), simhash(parts[0].replace("指标 0", "指标 O"))), 0.95)
+        self.assertLess(similarity(simhash(parts[0]), simhash(parts[2])), 0.9)
+
+    def test_duplicates_stored_as_references(self):
+        """测试同一报告的另一份副本与重复的免责声明只登记引用，不再向量化"""
+        with temp_kb() as db:
+            self._write("report.md", REPORT)
+            self._write("report_copy.md", REPORT.replace("指标", "指标 ") + "\n")
+            ingest.main(self.src_dir, COLLECTION)
+
+            tbl = db.get_table(COLLECTION)
+            stats = db.dedup.stats(COLLECTION)
+            self.assertEqual(stats["vectors"], tbl.count_rows())
+            self.assertGreater(stats["refs"], 0)
+            self.assertGreaterEqual(stats["ratio"], 0.5)
+            # 两个来源都在目录中，片段数含引用
+            counts = db.list_sources(COLLECTION)
+            self.assertEqual(len(counts), 2)
+            self.assertEqual(sum(counts.values()), stats["vectors"] + stats["refs"])
+
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                self.assertIn("去重比例", dedup_knowledge(COLLECTION))
+
+    def test_filtered_search_finds_reference_only_source(self):
+        """测试只有引用、没有向量行的来源：按来源过滤仍能检索到，结果显示引用自身的来源；重建目录计入引用"""
+        with temp_kb() as db:
+            ingest.main(self._write("a_report.md", REPORT), COLLECTION)
+            ingest.main(self._write("b_report.md", REPORT + "\n"), COLLECTION)
+            tbl = db.get_table(COLLECTION)
+            copy = next(s for s in db.list_sources(COLLECTION) if s.endswith("b_report.md"))
+            self.assertEqual(tbl.count_rows(f"source = '{copy}'"), 0)
+
+            for mode in ("vector", "keyword", "hybrid"):
+                rows = query.search_rows(db, tbl, "星云数据库第1章", limit=3, mode=mode,
+                                         where=build_filter(source="*b_report.md"))
+                self.assertTrue(rows, mode)
+                self.assertEqual({r["source"] for r in rows}, {copy}, mode)
+            output = query.search("星云数据库第1章", COLLECTION, filters={"source": "*b_report.md"})
+            self.assertIn("b_report.md", output)
+            self.assertNotIn("a_report.md", output)
+
+            counts = db.list_sources(COLLECTION)
+            db.ensure_catalog(COLLECTION, refresh=True)
+            self.assertEqual(db.list_sources(COLLECTION), counts)
+
+    def test_delete_canonical_promotes_references(self):
+        """测试被引用的来源删除后，引用提升为独立片段，内容仍可检索"""
+        with temp_kb() as db:
+            first = self._write("a_report.md", REPORT)
+            ingest.main(first, COLLECTION)
+            ingest.main(self._write("b_report.md", REPORT + "\n"), COLLECTION)
+            tbl = db.get_table(COLLECTION)
+            vectors = tbl.count_rows()
+            sources = sorted(db.list_sources(COLLECTION))
+            canonical = next(s for s in sources if s.endswith("a_report.md"))
+            copy = next(s for s in sources if s.endswith("b_report.md"))
+            self.assertEqual(tbl.count_rows(f"source = '{copy}'"), 0)
+
+            db.delete_by_source(COLLECTION, canonical)
+            self.assertEqual(tbl.count_rows(f"source = '{copy}'"), vectors)
+            self.assertEqual(db.dedup.stats(COLLECTION)["refs"], 0)
+
+    def test_disabled(self):
+        """测试关闭去重后行为与之前一致"""
+        with temp_kb() as db, patch.object(ingest, "DEDUP_ENABLED", False):
+            self._write("report.md", REPORT)
+            self._write("report_copy.md", REPORT + "\n")
+            ingest.main(self.src_dir, COLLECTION)
+            self.assertEqual(db.dedup.stats(COLLECTION)["refs"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest
+from skills.knowledge_base.scripts.embedding_cache import EmbeddingCache, normalize_text
+
+COLLECTION = "test_embed_cache"
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def test_repeated_query_skips_inference(self):
+        """测试重复提问 (含空白差异) 直接命中内存缓存"""
+        with temp_kb() as db:
+            first = db.embed_query("星云核心 的价格")
+            calls = db.embedding_model.calls
+            second = db.embed_query("  星云核心   的价格 ")
+            self.assertEqual(db.embedding_model.calls, calls)
+            self.assertEqual(list(first), list(second))
+            self.assertEqual(db.embedding_cache.stats()["memory_hits"], 1)
+
+    def test_disk_cache_survives_restart(self):
+        """测试内存缓存清空后从 SQLite 读回，且按 LRU 淘汰"""
+        with temp_kb() as db:
+            db.embed_documents(["a1", "b2", "c3"])
+            cache = EmbeddingCache(db.meta, "BAAI/bge-small-zh-v1.5", memory_entries=2, disk_entries=2)
+            texts_before = db.embedding_model.texts
+            vectors = cache.get_many(["a1", "b2", "c3"])
+            self.assertTrue(all(v is not None for v in vectors))
+            self.assertEqual(cache.disk_hits, 3)
+            self.assertEqual(len(cache._memory), 2)
+            self.assertEqual(db.embedding_model.texts, texts_before)
+
+            # 不同模型互不命中
+            other = EmbeddingCache(db.meta, "other-model")
+            self.assertEqual(other.get_many(["a1"]), [None])
+
+            # 超出磁盘上限时淘汰最久未使用的条目
+            cache.put_many(["d4"], [vectors[0]])
+            self.assertLessEqual(cache.stats()["disk_entries"], 2)
+
+    def test_reingest_edited_file_only_embeds_changed_chunks(self):
+        """测试重新入库轻微修改的文件时，未变化的片段不再推理"""
+        src_dir = tempfile.mkdtemp(prefix="zx_kb_src_")
+        path = os.path.join(src_dir, "long.md")
+        lines = [f"第 {i} 行内容 item-{i}" for i in range(60)]
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+            with temp_kb() as db:
+                ingest.main(src_dir, COLLECTION)
+                first_texts = db.embedding_model.texts
+
+                lines[-1] = "最后一行被修改"
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(lines))
+                stats = ingest.main(src_dir, COLLECTION)
+                self.assertEqual(stats["replaced"], 1)
+                # 只有包含最后一行的片段需要重新推理
+                self.assertEqual(db.embedding_model.texts - first_texts, 1)
+        finally:
+            shutil.rmtree(src_dir, ignore_errors=True)
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text(" Ａ  b\n\tc "), "A b c")
+
+
+if __name__ == "__main__":
+    unittest.main()
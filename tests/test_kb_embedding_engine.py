@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+
+import lancedb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb, FakeTextEmbedding, FAKE_DIM
+from skills.knowledge_base.scripts import embedding_engine, ingest, vector_precision
+from skills.knowledge_base.scripts.embedding_engine import EmbeddingEngine
+
+COLLECTION = "test_embed_engine"
+
+
+class RecordingEmbedding(FakeTextEmbedding):
+    """记录构造参数与每次 embed 的 batch_size / parallel"""
+
+    def __init__(self, model_name=None, **kwargs):
+        super().__init__(model_name, **kwargs)
+        self.init_kwargs = kwargs
+        self.embed_kwargs = []
+
+    def embed(self, texts, **kwargs):
+        self.embed_kwargs.append(kwargs)
+        return super().embed(texts)
+
+
+def _rows(db, texts, prefix="doc"):
+    vectors = db.embed_documents(texts)
+    return [{"vector": v, "text": t, "source": f"/tmp/{prefix}_{i}.md", "line_range": "1-1",
+             "location": "Unknown Location", "type": "document", "chunk_id": f"{prefix}-{i}"}
+            for i, (t, v) in enumerate(zip(texts, vectors))]
+
+
+class TestEmbeddingEngine(unittest.TestCase):
+
+    def test_engine_settings(self):
+        """测试引擎配置：线程数传给模型；文本数不足门槛时不启动并行进程池"""
+        engine = EmbeddingEngine(RecordingEmbedding, "test-model", batch_size=8, threads=4, parallel=2)
+        self.assertEqual(engine.model.init_kwargs, {"threads": 4})
+        self.assertEqual(engine.parallel_min_texts, 8 * 2 * embedding_engine.PARALLEL_MIN_BATCHES)
+
+        self.assertEqual(len(engine.embed(["查询"])), 1)
+        self.assertEqual(engine.model.embed_kwargs[-1], {"batch_size": 8, "parallel": None})
+        vectors = engine.embed([f"片段 {i}" for i in range(engine.parallel_min_texts)])
+        self.assertEqual(len(vectors), engine.parallel_min_texts)
+        self.assertEqual(engine.model.embed_kwargs[-1], {"batch_size": 8, "parallel": 2})
+
+        default = EmbeddingEngine(RecordingEmbedding, "test-model", batch_size=8, threads=None, parallel=None)
+        self.assertEqual(default.model.init_kwargs, {})
+        self.assertIsNone(default.parallel_min_texts)
+        default.embed([f"片段 {i}" for i in range(100)])
+        self.assertIsNone(default.model.embed_kwargs[-1]["parallel"])
+
+    def test_table_records_model(self):
+        """测试表记录模型与维度：换模型后拒绝写入，精度转换保留记录，旧表视为默认模型"""
+        with temp_kb() as db:
+            db.create_table(COLLECTION, _rows(db, ["副本延迟排查", "索引压缩比"]))
+            tbl = db.get_table(COLLECTION)
+            self.assertEqual(embedding_engine.table_model(tbl), (db.embedding_engine.model_name, FAKE_DIM))
+
+            vector_precision.convert_table(db, COLLECTION, "float16")
+            self.assertEqual(embedding_engine.table_model(db.get_table(COLLECTION)),
+                             (db.embedding_engine.model_name, FAKE_DIM))
+
+            db.embedding_engine.model_name = "other/model"
+            with self.assertRaises(ValueError):
+                db.replace_source_chunks(COLLECTION, _rows(db, ["新手册"], prefix="new"))
+            with self.assertRaises(ValueError):
+                db.append_chunks(COLLECTION, _rows(db, ["新手册"], prefix="new"))
+
+            # 升级前创建的表没有模型记录
+            legacy = lancedb.connect(db.db_path).create_table("legacy", data=[{"vector": [0.1, 0.2], "text": "x"}])
+            self.assertEqual(embedding_engine.table_model(legacy), (embedding_engine.DEFAULT_MODEL, 2))
+
+    def test_benchmark_grid(self):
+        """测试吞吐量基准：按组合逐一测量，输出维度与每秒向量数"""
+        grid = embedding_engine.parse_grid("16,64", "auto,2", "off")
+        self.assertEqual(len(grid), 4)
+        self.assertEqual(grid[1], {"batch_size": 16, "threads": 2, "parallel": None})
+
+        texts = embedding_engine.bench_texts(40)
+        results = embedding_engine.benchmark(RecordingEmbedding, grid, texts, model_name="test-model")
+        self.assertEqual([r["batch_size"] for r in results], [16, 16, 64, 64])
+        for row in results:
+            self.assertEqual((row["dim"], row["texts"]), (FAKE_DIM, 40))
+            self.assertGreater(row["per_s"], 0)
+        self.assertIn("threads=2", results[1]["config"])
+
+    def test_ingest_batches_for_parallel(self):
+        """测试开启数据并行时入库攒批大小至少满足并行门槛"""
+        with temp_kb() as db:
+            self.assertEqual(ingest.IngestPipeline(COLLECTION, workers=0).embed_batch_size, ingest.EMBED_BATCH_SIZE)
+            db.embedding_engine.parallel = 4
+            pipeline = ingest.IngestPipeline(COLLECTION, workers=0)
+            self.assertEqual(pipeline.embed_batch_size, db.embedding_engine.parallel_min_texts)
+
+
+if __name__ == '__main__':
+    unittest.main()
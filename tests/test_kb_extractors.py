@@ -0,0 +1,84 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from skills.knowledge_base.scripts.extractors import iter_document_blocks, TextBlock
+from skills.knowledge_base.scripts.chunker import chunk_blocks, chunk_blocks_by_lines, chunk_text_by_lines
+
+
+class TestStreamingExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="zx_kb_extract_")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_large_text_has_no_line_cap(self):
+        """测试超过 1 万行的文本被完整抽取 (旧实现在 10k 行截断)"""
+        path = os.path.join(self.tmp, "big.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(25000):
+                f.write(f"line {i}\n")
+        chunks = list(chunk_blocks(iter_document_blocks(path)))
+        self.assertEqual(chunks[-1]["line_end"], 25000)
+        self.assertIn("line 24999", chunks[-1]["text"])
+
+    def test_stream_chunker_matches_line_chunker(self):
+        """测试流式切片与原按行切片对纯文本结果一致"""
+        text = "\n".join(f"第 {i} 行" for i in range(1, 58))
+        blocks = [TextBlock("Unknown Location", "\n".join(text.splitlines()[i:i + 7])) for i in range(0, 57, 7)]
+        self.assertEqual(list(chunk_blocks_by_lines(blocks)), chunk_text_by_lines(text))
+
+    def test_pptx_locations(self):
+        """测试 PPT 每页一个块且带 Slide 位置"""
+        from pptx import Presentation
+        prs = Presentation()
+        for title in ["第一页", "第二页"]:
+            slide = prs.slides.add_slide(prs.slide_layouts[0])
+            slide.shapes.title.text = title
+        path = os.path.join(self.tmp, "deck.pptx")
+        prs.save(path)
+
+        blocks = list(iter_document_blocks(path))
+        self.assertEqual([b.location for b in blocks], ["Slide 1", "Slide 2"])
+        self.assertIn("第二页", blocks[1].text)
+
+    def test_xlsx_streams_rows_per_sheet(self):
+        """测试 Excel 按工作表流式分块"""
+        import openpyxl
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "销售"
+        for i in range(450):
+            ws.append([f"产品{i}", i])
+        wb.create_sheet("汇总").append(["总计", 450])
+        path = os.path.join(self.tmp, "data.xlsx")
+        wb.save(path)
+
+        blocks = list(iter_document_blocks(path))
+        self.assertEqual([b.location for b in blocks], ["Sheet: 销售"] * 3 + ["Sheet: 汇总"])
+        self.assertIn("产品449,449", blocks[2].text)
+
+    def test_docx_sections(self):
+        """测试 Word 按标题分节"""
+        import docx
+        document = docx.Document()
+        document.add_paragraph("前言内容")
+        document.add_heading("第一章 架构", level=1)
+        document.add_paragraph("章节正文")
+        path = os.path.join(self.tmp, "doc.docx")
+        document.save(path)
+
+        blocks = list(iter_document_blocks(path))
+        self.assertEqual(blocks[0].location, "Unknown Location")
+        self.assertEqual(blocks[1].location, "Section: 第一章 架构")
+        self.assertIn("章节正文", blocks[1].text)
+
+
+if __name__ == "__main__":
+    unittest.main()
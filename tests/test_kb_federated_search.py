@@ -0,0 +1,62 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import query
+
+
+class TestFederatedSearch(unittest.TestCase):
+
+    def _seed(self, db, name, texts):
+        vectors = db.embed_documents(texts)
+        data = [{"vector": v, "text": t, "source": f"/tmp/{name}_{i}.md", "line_range": "1-1",
+                 "location": "Unknown Location", "type": "document", "chunk_id": f"{name}-{i}"}
+                for i, (t, v) in enumerate(zip(texts, vectors))]
+        db.create_table(name, data)
+        db.maintain_indexes(name, background=False)
+
+    def _seed_all(self, db):
+        self._seed(db, "documents", ["星云核心的授权价格为 50000 元", "部署需要 8 核 CPU"])
+        self._seed(db, "episodic_memory", ["用户偏好使用 Python 编写脚本", "星云核心的授权价格为 50000 元"])
+
+    def test_merged_results_carry_collection(self):
+        """测试跨集合检索：查询只向量化一次，结果合并去重并标注集合"""
+        with temp_kb() as db:
+            self._seed_all(db)
+            calls = db.embedding_model.calls
+            rows = query.federated_search_rows(db, "星云核心 授权价格", ["documents", "episodic_memory"],
+                                               limit=4, mode="vector")
+            self.assertLessEqual(db.embedding_model.calls, calls + 1)
+            self.assertEqual({r["collection"] for r in rows}, {"documents", "episodic_memory"})
+            # 两个集合中相同的文字只保留一条
+            self.assertEqual(sum("50000" in r["text"] for r in rows), 1)
+            self.assertIn("50000", rows[0]["text"])
+            scores = [r["score"] for r in rows]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+            self.assertTrue(all(-1.0 <= s <= 1.0 for s in scores))
+
+    def test_keyword_scores_normalized_per_table(self):
+        with temp_kb() as db:
+            self._seed_all(db)
+            rows = query.federated_search_rows(db, "Python", ["documents", "episodic_memory"], mode="keyword")
+            self.assertEqual(rows[0]["collection"], "episodic_memory")
+            self.assertAlmostEqual(rows[0]["score"], 1.0)
+
+    def test_search_all_collections(self):
+        """测试 collection="all" 与逗号分隔写法"""
+        with temp_kb() as db:
+            self._seed_all(db)
+            self.assertEqual(sorted(query.parse_collections("all", db)), ["documents", "episodic_memory"])
+            self.assertEqual(query.parse_collections("documents, documents"), ["documents"])
+            output = query.search("Python 偏好", "all", limit=3)
+            self.assertIn("Collection: episodic_memory", output)
+            # 不存在的集合被忽略
+            output = query.search("Python 偏好", "episodic_memory,missing", limit=3)
+            self.assertIn("Python", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
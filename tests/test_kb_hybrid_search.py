@@ -0,0 +1,128 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import query
+from skills.knowledge_base.scripts.manage import eval_knowledge
+from skills.knowledge_base.scripts.index_manager import has_fts_index
+
+COLLECTION = "test_hybrid"
+TEXTS = [
+    "星云核心 Nebula Core 的授权价格为 50000 元",
+    "产品编号 ZX-9000 的交付周期为四周",
+    "产品编号 QW-4172 已停产",
+    "售前方案需要说明部署架构与高可用设计",
+    "会议纪要：客户关注数据安全与合规",
+]
+
+
+class TestHybridSearch(unittest.TestCase):
+
+    def _seed(self, db):
+        vectors = db.embed_documents(TEXTS)
+        data = [{"vector": v, "text": t, "source": f"/tmp/doc_{i}.md", "line_range": "1-1",
+                 "location": "Unknown Location", "type": "document", "chunk_id": str(i)}
+                for i, (t, v) in enumerate(zip(TEXTS, vectors))]
+        tbl = db.create_table(COLLECTION, data)
+        db.maintain_indexes(COLLECTION, background=False)
+        return tbl
+
+    def test_keyword_mode_hits_exact_identifier(self):
+        """测试关键词模式精确命中产品编号，且中文无需分词词典"""
+        with temp_kb() as db:
+            tbl = self._seed(db)
+            rows = query.search_rows(db, tbl, "ZX-9000", limit=1, mode="keyword")
+            self.assertIn("ZX-9000", rows[0]["text"])
+            rows = query.search_rows(db, tbl, "数据安全", limit=1, mode="keyword")
+            self.assertIn("数据安全", rows[0]["text"])
+
+    def test_hybrid_fuses_and_dedups(self):
+        """测试混合模式融合两路结果且不重复"""
+        with temp_kb() as db:
+            tbl = self._seed(db)
+            rows = query.search_rows(db, tbl, "ZX-9000 交付周期", limit=5, mode="hybrid")
+            self.assertIn("ZX-9000", rows[0]["text"])
+            self.assertEqual(len({r["chunk_id"] for r in rows}), len(rows))
+            scores = [r["score"] for r in rows]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_missing_fts_index_falls_back_to_vector(self):
+        """测试旧表缺少全文索引：检索不同步建索引，退回向量检索并交给后台维护补建"""
+        with temp_kb() as db:
+            vectors = db.embed_documents(TEXTS)
+            tbl = db.db.create_table(COLLECTION, data=[{"vector": v, "text": t, "source": f"/tmp/doc_{i}.md"}
+                                                       for i, (t, v) in enumerate(zip(TEXTS, vectors))])
+            expected = query.search_rows(db, tbl, "ZX-9000", limit=3, mode="vector")
+            with patch.object(db, "maintain_indexes") as maintain:
+                for mode in ("keyword", "hybrid"):
+                    rows = query.search_rows(db, tbl, "ZX-9000", limit=3, mode=mode)
+                    self.assertEqual(rows, expected, mode)
+            maintain.assert_called_with(COLLECTION, background=True)
+            self.assertFalse(has_fts_index(tbl))
+
+            self.assertIn("fts_built", db.maintain_indexes(COLLECTION, background=False))
+            rows = query.search_rows(db, tbl, "ZX-9000", limit=1, mode="keyword")
+            self.assertIn("ZX-9000", rows[0]["text"])
+
+    def test_rrf_fuse(self):
+        """测试 RRF 对两路都靠前的结果给更高分"""
+        a = [{"chunk_id": "x"}, {"chunk_id": "y"}]
+        b = [{"chunk_id": "y"}, {"chunk_id": "z"}]
+        fused = query.rrf_fuse([a, b], limit=3)
+        self.assertEqual(fused[0]["chunk_id"], "y")
+
+    def test_results_project_columns(self):
+        """测试检索只读取结果列 (不含向量)，分数在 Arrow 中计算"""
+        with temp_kb() as db:
+            tbl = self._seed(db)
+            for mode in ("vector", "keyword", "hybrid"):
+                rows = query.search_rows(db, tbl, "ZX-9000 交付周期", limit=3, mode=mode)
+                self.assertTrue(rows, mode)
+                for row in rows:
+                    self.assertEqual(set(row), set(query.RESULT_COLUMNS) | {"score"}, mode)
+            rows = query.search_rows(db, tbl, TEXTS[1], limit=1, mode="vector")
+            self.assertEqual(rows[0]["text"], TEXTS[1])
+            self.assertAlmostEqual(rows[0]["score"], 1.0, places=4)
+
+    def test_default_mode_from_config(self):
+        """测试未指定 mode 时使用 ZX_KB_SEARCH_MODE 配置的默认模式"""
+        with temp_kb() as db:
+            self._seed(db)
+            with patch.object(query, "DEFAULT_MODE", "keyword"), \
+                    patch.object(query, "search_rows", wraps=query.search_rows) as search_rows:
+                query.search("ZX-9000", COLLECTION)
+                query.search_many(["ZX-9000", "数据安全"], COLLECTION)
+            self.assertEqual({c.args[4] for c in search_rows.call_args_list}, {"keyword"})
+
+    def test_invalid_mode(self):
+        with temp_kb() as db:
+            tbl = self._seed(db)
+            with self.assertRaises(ValueError):
+                query.search_rows(db, tbl, "x", mode="fuzzy")
+
+    def test_eval_report(self):
+        """测试评测报告包含各模式的质量与延迟"""
+        with temp_kb() as db:
+            self._seed(db)
+            with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+                f.write(json.dumps({"query": "ZX-9000", "expected": "ZX-9000"}, ensure_ascii=False) + "\n")
+                f.write(json.dumps({"query": "授权价格", "expected": ["50000"]}, ensure_ascii=False) + "\n")
+                path = f.name
+            try:
+                with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                    report = eval_knowledge(path, COLLECTION, k=3)
+            finally:
+                os.remove(path)
+            for mode in ("vector", "keyword", "hybrid"):
+                self.assertIn(mode, report)
+            self.assertIn("hit@3", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest
+
+COLLECTION = "test_incremental"
+
+
+class TestIncrementalIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp(prefix="zx_kb_src_")
+        for name, body in [("a.md", "Alpha 文档\n第一行"), ("b.md", "Beta 文档\n第二行")]:
+            with open(os.path.join(self.src_dir, name), "w", encoding="utf-8") as f:
+                f.write(body)
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir, ignore_errors=True)
+
+    def test_reingest_is_idempotent(self):
+        """测试重复入库同一目录不会产生重复向量"""
+        with temp_kb() as db:
+            first = ingest.main(self.src_dir, COLLECTION)
+            self.assertEqual(first["added"], 2)
+            rows = db.get_table(COLLECTION).count_rows()
+
+            second = ingest.main(self.src_dir, COLLECTION)
+            self.assertEqual(second["skipped"], 2)
+            self.assertEqual(second["added"] + second["replaced"], 0)
+            self.assertEqual(db.get_table(COLLECTION).count_rows(), rows)
+
+    def test_changed_file_replaces_old_chunks(self):
+        """测试文件变化后旧片段被替换，清单记录新哈希"""
+        with temp_kb() as db:
+            ingest.main(self.src_dir, COLLECTION)
+            path = os.path.abspath(os.path.join(self.src_dir, "a.md"))
+            old_entry = db.manifest.get(COLLECTION, path)
+
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("Alpha 文档 v2\n新的内容")
+            stats = ingest.main(self.src_dir, COLLECTION)
+            self.assertEqual(stats["replaced"], 1)
+            self.assertEqual(stats["skipped"], 1)
+
+            new_entry = db.manifest.get(COLLECTION, path)
+            self.assertNotEqual(old_entry.content_hash, new_entry.content_hash)
+            tbl = db.get_table(COLLECTION)
+            self.assertEqual(tbl.count_rows(f"source = '{old_entry.source}'"), 0)
+            self.assertEqual(tbl.count_rows(f"source = '{new_entry.source}'"), len(new_entry.chunk_ids))
+            self.assertFalse(os.path.exists(old_entry.source))
+
+    def test_changed_copy_keeps_shared_source(self):
+        """测试不同目录下同名同内容的文件共用归档：修改其中一个后，另一个的片段仍保留"""
+        with temp_kb() as db:
+            for sub in ("x", "y"):
+                os.makedirs(os.path.join(self.src_dir, sub))
+                with open(os.path.join(self.src_dir, sub, "note.md"), "w", encoding="utf-8") as f:
+                    f.write("# 笔记\n星云数据库副本延迟排查。")
+            ingest.main(self.src_dir, COLLECTION)
+            x_path = os.path.abspath(os.path.join(self.src_dir, "x", "note.md"))
+            y_path = os.path.abspath(os.path.join(self.src_dir, "y", "note.md"))
+            shared = db.manifest.get(COLLECTION, y_path).source
+            self.assertEqual(db.manifest.get(COLLECTION, x_path).source, shared)
+
+            with open(x_path, "w", encoding="utf-8") as f:
+                f.write("# 笔记\n修改后的内容：索引压缩比。")
+            ingest.ingest_file(x_path, COLLECTION)
+            tbl = db.get_table(COLLECTION)
+            self.assertGreater(tbl.count_rows(f"source = '{shared}'"), 0)
+            self.assertTrue(os.path.exists(shared))
+
+            stats = ingest.main(self.src_dir, COLLECTION)
+            self.assertEqual(stats["skipped"], 4)
+
+    def test_identical_file_under_second_path_adds_no_rows(self):
+        """测试相同文件出现在第二个路径 (后续入库或同一次入库的不同写批次)：不重复写入片段"""
+        with temp_kb() as db:
+            a = os.path.join(self.src_dir, "a.md")
+            ingest.ingest_file(a, COLLECTION)
+            source = db.manifest.get(COLLECTION, os.path.abspath(a)).source
+            tbl = db.get_table(COLLECTION)
+            rows = tbl.count_rows()
+
+            copies = []
+            for sub in ("x", "y"):
+                os.makedirs(os.path.join(self.src_dir, sub))
+                copies.append(shutil.copy(a, os.path.join(self.src_dir, sub, "a.md")))
+            self.assertEqual(ingest.ingest_file(copies[0], COLLECTION), "added")
+            self.assertEqual(tbl.count_rows(), rows)
+            self.assertEqual(db.list_sources(COLLECTION)[source], rows)
+
+            # 同一次入库中两个新副本落在不同写批次
+            os.makedirs(os.path.join(self.src_dir, "z"))
+            copies.append(shutil.copy(os.path.join(self.src_dir, "b.md"), os.path.join(self.src_dir, "z", "b.md")))
+            pipeline = ingest.IngestPipeline(COLLECTION, workers=0, write_batch_rows=1)
+            pipeline.run([os.path.join(self.src_dir, "b.md"), copies[2], copies[1]])
+            self.assertEqual(pipeline.stats["added"], 3)
+            b_entry = db.manifest.get(COLLECTION, os.path.abspath(copies[2]))
+            self.assertEqual(tbl.count_rows(f"source = '{b_entry.source}'"), len(b_entry.chunk_ids))
+
+            for path in (a, copies[0]):
+                ingest.remove_file(path, COLLECTION)
+                self.assertEqual(tbl.count_rows(f"source = '{source}'"), rows)
+            ingest.remove_file(copies[1], COLLECTION)
+            self.assertEqual(tbl.count_rows(f"source = '{source}'"), 0)
+
+    def test_touched_but_unchanged_file_skips_by_hash(self):
+        """测试仅修改时间变化时按内容哈希跳过"""
+        with temp_kb() as db:
+            path = os.path.join(self.src_dir, "b.md")
+            self.assertEqual(ingest.ingest_file(path, COLLECTION), "added")
+            os.utime(path, (1, 1))
+            self.assertEqual(ingest.ingest_file(path, COLLECTION), "skipped")
+            self.assertEqual(db.manifest.get(COLLECTION, os.path.abspath(path)).mtime, 1)
+
+    def test_reset_table_clears_manifest(self):
+        """测试重置集合后可重新入库"""
+        with temp_kb() as db:
+            path = os.path.join(self.src_dir, "a.md")
+            ingest.ingest_file(path, COLLECTION)
+            db.reset_table(COLLECTION)
+            self.assertEqual(ingest.ingest_file(path, COLLECTION), "added")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest_journal
+from skills.knowledge_base.scripts.ingest_journal import IngestJournal, drain
+
+COLLECTION = "test_episodic"
+
+
+class TestIngestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix="zx_kb_journal_")
+        self.journal = IngestJournal(os.path.join(self.tmp_dir, "journal.sqlite3"))
+
+    def tearDown(self):
+        self.journal.meta.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _session(self, name, body):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        return path
+
+    def test_enqueue_claim_complete(self):
+        """测试任务生命周期：入队 -> 认领 (running) -> 完成，认领期间不会被重复认领"""
+        path = self._session("a_session.md", "## User\n你好")
+        task_id = self.journal.enqueue(path, COLLECTION)
+        self.assertTrue(self.journal.has_work())
+
+        task = self.journal.claim()
+        self.assertEqual(task["id"], task_id)
+        self.assertEqual(task["collection"], COLLECTION)
+        self.assertEqual(self.journal.get(task_id)["status"], "running")
+        self.assertIsNone(self.journal.claim(), "running task held by a live process must not be reclaimed")
+
+        self.journal.complete(task_id, "added")
+        entry = self.journal.get(task_id)
+        self.assertEqual((entry["status"], entry["result"], entry["attempts"]), ("done", "added", 1))
+        self.assertFalse(self.journal.has_work())
+
+    def test_fail_backoff_then_failed(self):
+        """测试失败重试：按指数退避推迟，达到最大次数后标记为 failed，retry 可重新入队"""
+        task_id = self.journal.enqueue(self._session("b_session.md", "x"), COLLECTION)
+        with patch.object(ingest_journal, "MAX_ATTEMPTS", 3), patch.object(ingest_journal, "RETRY_BASE_SECONDS", 0):
+            for attempt in range(1, 4):
+                self.assertIsNotNone(self.journal.claim())
+                status = self.journal.fail(task_id, RuntimeError(f"boom {attempt}"))
+            self.assertEqual(status, "failed")
+        entry = self.journal.get(task_id)
+        self.assertEqual((entry["attempts"], entry["last_error"]), (3, "boom 3"))
+        self.assertIsNone(self.journal.claim())
+
+        # 退避：默认等待时间内不会再被认领
+        other = self.journal.enqueue(self._session("c_session.md", "y"), COLLECTION)
+        self.journal.claim()
+        self.assertEqual(self.journal.fail(other, "later"), "pending")
+        self.assertIsNone(self.journal.claim(), "task should wait for its backoff window")
+
+        self.assertEqual(self.journal.retry_failed(), 1)
+        self.assertEqual(self.journal.claim()["id"], task_id)
+
+    def test_reclaim_abandoned_task(self):
+        """测试中断恢复：认领进程已退出的 running 任务可被重新认领"""
+        task_id = self.journal.enqueue(self._session("d_session.md", "z"), COLLECTION)
+        self.journal.claim(worker=999999999)
+        self.assertTrue(self.journal.has_work(), "interrupted task should still count as work")
+        task = self.journal.claim()
+        self.assertEqual(task["id"], task_id)
+        self.assertEqual(self.journal.get(task_id)["claimed_by"], os.getpid())
+
+    def test_drain_records_results(self):
+        """测试 drain：逐条执行并记录结果，异常与缺失文件进入重试"""
+        ok = self._session("e_session.md", "ok")
+        bad = self._session("f_session.md", "bad")
+        self.journal.enqueue(ok, COLLECTION)
+        self.journal.enqueue(bad, COLLECTION)
+        self.journal.enqueue(os.path.join(self.tmp_dir, "missing.md"), COLLECTION)
+
+        def fake_ingest(path, collection):
+            if path == bad:
+                raise RuntimeError("model unavailable")
+            return "added"
+
+        summary = drain(self.journal, fake_ingest)
+        self.assertEqual(summary, {"added": 1, "retry": 1, "missing": 1})
+        counts = self.journal.counts()
+        self.assertEqual((counts.get("done"), counts.get("pending")), (1, 2))
+        errors = sorted(e["last_error"] for e in self.journal.entries("pending"))
+        self.assertIn("model unavailable", errors)
+        self.assertTrue(any(e.startswith("file not found") for e in errors))
+
+    def test_drain_ingests_episodic_memory(self):
+        """测试端到端：队列中的会话文件被实际写入向量库，重复入队时跳过"""
+        path = self._session("g_session.md", "## User\n星云数据库的副本延迟怎么排查？\n\n## AI\n先看复制队列长度与网络延迟。")
+        self.journal.enqueue(path, COLLECTION)
+        with temp_kb() as db:
+            self.assertEqual(drain(self.journal), {"added": 1})
+            self.assertEqual(db.get_table(COLLECTION).count_rows(), 1)
+
+            self.journal.enqueue(path, COLLECTION)
+            self.assertEqual(drain(self.journal), {"skipped": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
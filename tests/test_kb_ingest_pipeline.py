@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import threading
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest
+
+COLLECTION = "test_pipeline"
+
+
+class TestIngestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp(prefix="zx_kb_src_")
+        for i in range(12):
+            with open(os.path.join(self.src_dir, f"doc_{i}.md"), "w", encoding="utf-8") as f:
+                # 两个段落，每段 15 行、超过切片目标长度 -> 在段落边界切成 2 个片段
+                # 每行带不同的哈希串，避免被当作近重复片段
+                paragraphs = ["\n".join(f"文档 {i} 第 {n} 行：{hashlib.md5(f'{i}-{n}'.encode()).hexdigest()}"
+                                        for n in range(p, p + 15))
+                              for p in (0, 15)]
+                f.write("\n\n".join(paragraphs))
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir, ignore_errors=True)
+
+    def test_cross_file_batches_and_coalesced_writes(self):
+        """测试跨文件攒批向量化与合并写入"""
+        with temp_kb() as db:
+            files = ingest.collect_files(self.src_dir)
+            pipeline = ingest.IngestPipeline(COLLECTION, workers=0, embed_batch_size=10, write_batch_rows=1000)
+            stats = pipeline.run(files)
+
+            self.assertEqual(stats["added"], 12)
+            tbl = db.get_table(COLLECTION)
+            # 每个文件 2 个段落 -> 2 个片段，共 24 个片段
+            self.assertEqual(tbl.count_rows(), 24)
+            self.assertEqual(pipeline.chunks_done, 24)
+            # 24 个片段按 10 个一批向量化，而不是每个文件一批
+            self.assertEqual(db.embedding_model.calls, 3)
+            # 所有文件合并成一次建表写入 (只产生一个数据分片；其余版本来自入库结束时补建的索引)
+            self.assertEqual(tbl.stats()["fragment_stats"]["num_fragments"], 1)
+            self.assertEqual(len(db.manifest.entries(COLLECTION)), 12)
+
+    def test_process_pool_parse(self):
+        """测试进程池解析路径"""
+        with temp_kb() as db:
+            stats = ingest.main(self.src_dir, COLLECTION, workers=2)
+            self.assertEqual(stats["added"], 12)
+            self.assertEqual(db.get_table(COLLECTION).count_rows(), 24)
+
+    def test_failed_file_does_not_block_others(self):
+        """测试单个文件解析失败不影响其他文件"""
+        with temp_kb() as db:
+            files = ingest.collect_files(self.src_dir) + [os.path.join(self.src_dir, "missing.md")]
+            stats = ingest.IngestPipeline(COLLECTION, workers=0).run(files)
+            self.assertEqual(stats["added"], 12)
+            self.assertEqual(stats["failed"], 1)
+
+    def test_record_error_does_not_stall_writer(self):
+        """测试写入后登记出错：该批文件记为失败，写线程继续消费，入库不会卡在有界队列上"""
+        with temp_kb() as db:
+            files = sorted(ingest.collect_files(self.src_dir))
+            pipeline = ingest.IngestPipeline(COLLECTION, workers=0, embed_batch_size=2, write_batch_rows=1)
+            record = pipeline._record
+
+            def _flaky_record(parsed, chunk_ids):
+                if parsed.path == os.path.abspath(files[0]):
+                    raise OSError("disk full")
+                record(parsed, chunk_ids)
+
+            result = {}
+            with patch.object(ingest, "WRITE_QUEUE_SIZE", 1), patch.object(pipeline, "_record", _flaky_record):
+                runner = threading.Thread(target=lambda: result.update(pipeline.run(files)), daemon=True)
+                runner.start()
+                runner.join(timeout=60)
+            self.assertFalse(runner.is_alive(), "ingest must not hang after a bookkeeping error")
+            self.assertEqual((result["added"], result["failed"]), (11, 1))
+            self.assertEqual(len(db.manifest.entries(COLLECTION)), 11)
+
+            # 重新入库时替换已写入但未登记的片段，不重复追加
+            self.assertEqual(ingest.ingest_file(files[0], COLLECTION), "added")
+            self.assertEqual(db.get_table(COLLECTION).count_rows(), 24)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import maintenance
+from skills.knowledge_base.scripts.manage import optimize_knowledge
+
+COLLECTION = "test_maintenance"
+
+
+class TestMaintenance(unittest.TestCase):
+
+    def _fragment(self, db, appends):
+        """模拟情景记忆：每次退出追加一小批"""
+        for i in range(appends):
+            rows = [{"vector": db.embed_query(f"会话 {i}"), "text": f"会话 {i}", "source": f"/tmp/s{i}.md",
+                     "chunk_id": str(i)}]
+            db.replace_source_chunks(COLLECTION, rows)
+        return db.get_table(COLLECTION)
+
+    def test_optimize_compacts_and_prunes(self):
+        """测试手动维护：碎片合并为一个，过期版本被清理，输出前后对比"""
+        with temp_kb() as db:
+            tbl = self._fragment(db, 12)
+            before = maintenance.table_health(tbl, db.table_path(COLLECTION))
+            self.assertEqual(before["fragments"], 12)
+
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                out = optimize_knowledge(COLLECTION, retention_days=0)
+            self.assertIn("碎片: 12 -> 1", out)
+            self.assertIn("检索延迟 p50/p95", out)
+
+            after = maintenance.table_health(tbl, db.table_path(COLLECTION))
+            self.assertEqual(after["rows"], 12)
+            self.assertLess(after["versions"], before["versions"])
+            self.assertLess(after["disk_bytes"], before["disk_bytes"])
+
+    def test_background_trigger_compacts_fragmented_tables(self):
+        """测试写入后的后台维护在小碎片过多时自动压缩"""
+        with temp_kb() as db, patch.object(maintenance, "COMPACT_SMALL_FRAGMENTS", 5):
+            self._fragment(db, 3)
+            self.assertNotIn("compacted", db.maintain_indexes(COLLECTION, background=False))
+            tbl = self._fragment(db, 6)
+            fragmented = maintenance.table_health(tbl)["fragments"]
+            with patch("skills.knowledge_base.scripts.index_manager.compact_if_fragmented",
+                       lambda t: maintenance.compact_if_fragmented(t, threshold=5)):
+                actions = db.maintain_indexes(COLLECTION, background=False)
+            self.assertIn("compacted", actions)
+            self.assertLess(maintenance.table_health(tbl)["fragments"], fragmented)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import os
+import sys
+import json
+import time
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb, FakeCrossEncoder
+from skills.knowledge_base.scripts import query, rerank
+from skills.knowledge_base.scripts.manage import eval_knowledge
+
+COLLECTION = "test_rerank"
+TEXTS = [
+    "星云核心 部署 文档",
+    "星云核心的授权价格为 50000 元，按年续费",
+    "授权 续费 说明",
+    "会议纪要：客户关注数据安全",
+]
+
+
+def _reranker(delay=0.0, candidates=10, budget_ms=500):
+    r = rerank.Reranker(candidates=candidates, budget_ms=budget_ms)
+    r._model = FakeCrossEncoder(delay=delay)
+    return r
+
+
+class TestRerank(unittest.TestCase):
+
+    def _seed(self, db):
+        vectors = db.embed_documents(TEXTS)
+        data = [{"vector": v, "text": t, "source": f"/tmp/doc_{i}.md", "line_range": "1-1",
+                 "location": "Unknown Location", "type": "document", "chunk_id": str(i)}
+                for i, (t, v) in enumerate(zip(TEXTS, vectors))]
+        return db.create_table(COLLECTION, data)
+
+    def test_rerank_reorders_with_calibrated_scores(self):
+        """测试精排：多取候选后按交叉编码器重排，分数经 sigmoid 校准到 (0, 1)"""
+        reranker = _reranker()
+        rows = [{"text": t, "score": 1.0 - i * 0.1} for i, t in enumerate(TEXTS)]
+        out = reranker.rerank("星云核心的授权价格", rows, limit=2)
+        self.assertEqual(len(out), 2)
+        self.assertIn("50000", out[0]["text"])
+        self.assertTrue(all(r["reranked"] and 0 < r["score"] < 1 for r in out))
+        self.assertEqual(out[0]["first_stage_score"], 0.9)
+        self.assertEqual(reranker.stats()["reranked"], 1)
+
+    def test_budget_exceeded_falls_back(self):
+        """测试超出延迟预算时退回第一阶段顺序"""
+        reranker = _reranker(delay=0.2, budget_ms=20)
+        rows = [{"text": t, "score": 1.0 - i * 0.1} for i, t in enumerate(TEXTS)]
+        out = reranker.rerank("星云核心的授权价格", rows, limit=3)
+        self.assertEqual([r["text"] for r in out], TEXTS[:3])
+        self.assertFalse(out[0]["reranked"])
+        self.assertEqual(reranker.stats()["fallbacks"], 1)
+
+    def test_slow_rerank_does_not_stall_next_query(self):
+        """测试超时任务仍在后台运行时，下一次查询立即回退而不是排队耗尽预算；任务结束后恢复精排"""
+        reranker = _reranker(delay=0.3, budget_ms=50)
+        rows = [{"text": t, "score": 1.0 - i * 0.1} for i, t in enumerate(TEXTS)]
+        self.assertFalse(reranker.rerank("星云核心的授权价格", rows, limit=3)[0]["reranked"])
+
+        reranker._model.delay = 0.0
+        start = time.perf_counter()
+        out = reranker.rerank("星云核心的授权价格", rows, limit=3)
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertFalse(out[0]["reranked"])
+        self.assertEqual(reranker._model.calls, 1, "no job is queued behind the slow one")
+
+        time.sleep(0.35)
+        out = reranker.rerank("星云核心的授权价格", rows, limit=3)
+        self.assertTrue(out[0]["reranked"])
+        self.assertEqual(reranker.stats()["fallbacks"], 2)
+
+    def test_not_loaded_falls_back_and_loads_in_background(self):
+        """测试模型未加载完成时不阻塞查询"""
+        reranker = rerank.Reranker()
+        with patch.object(reranker, "load_async") as load_async:
+            out = reranker.rerank("q", [{"text": "a", "score": 0.5}], limit=1)
+        load_async.assert_called_once()
+        self.assertFalse(out[0]["reranked"])
+
+    def test_search_and_eval_with_rerank(self):
+        """测试检索链路接入精排，评测报告给出精排前后对比"""
+        with temp_kb() as db:
+            tbl = self._seed(db)
+            with patch.object(rerank, "_RERANKER", _reranker()):
+                rows = query.search_rows(db, tbl, "星云核心的授权价格", limit=1, mode="vector", rerank=True)
+                self.assertIn("50000", rows[0]["text"])
+                rows = query.federated_search_rows(db, "星云核心的授权价格", [COLLECTION], limit=1, rerank=True)
+                self.assertTrue(rows[0]["reranked"])
+
+                with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+                    f.write(json.dumps({"query": "星云核心的授权价格", "expected": "50000"}, ensure_ascii=False) + "\n")
+                    path = f.name
+                try:
+                    with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                        report = eval_knowledge(path, COLLECTION, k=1, modes=["vector"], rerank=True)
+                finally:
+                    os.remove(path)
+            self.assertIn("vector+rerank", report)
+            self.assertIn("p95=", report)
+
+    def test_sigmoid(self):
+        self.assertAlmostEqual(rerank.sigmoid(0), 0.5)
+        self.assertGreater(rerank.sigmoid(800), 0.99)
+        self.assertLess(rerank.sigmoid(-800), 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import lancedb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import query
+from skills.knowledge_base.scripts.result_cache import ResultCache
+
+COLLECTION = "test_result_cache"
+
+
+def _rows(db, texts, prefix="doc"):
+    vectors = db.embed_documents(texts)
+    return [{"vector": v, "text": t, "source": f"/tmp/{prefix}_{i}.md", "line_range": "1-1",
+             "location": "Unknown Location", "type": "document", "chunk_id": f"{prefix}-{i}"}
+            for i, (t, v) in enumerate(zip(texts, vectors))]
+
+
+class TestResultCache(unittest.TestCase):
+
+    def _seed(self, db):
+        db.create_table(COLLECTION, _rows(db, ["星云数据库副本延迟排查：先看复制队列长度",
+                                               "索引压缩比约 4 倍", "会议纪要：下周发布"]))
+        db.maintain_indexes(COLLECTION, background=False)
+
+    def test_exact_hit_skips_search(self):
+        """测试精确命中：相同问题 (空白/全半角差异) 不再检索，结果一致且为副本"""
+        with temp_kb() as db:
+            self._seed(db)
+            first = query.search("副本延迟怎么排查", COLLECTION, mode="vector")
+            with patch.object(query, "search_rows", side_effect=AssertionError("should be cached")):
+                start = time.perf_counter()
+                second = query.search("副本延迟怎么排查 ", COLLECTION, mode="vector")
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            self.assertEqual(first.split("\n")[1:], second.split("\n")[1:])
+            self.assertLess(elapsed_ms, 50)
+
+            stats = db.result_cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+            self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+            # 参数不同 (模式/条数) 分开缓存
+            query.search("副本延迟怎么排查", COLLECTION, limit=2, mode="vector")
+            self.assertEqual(db.result_cache.stats()["misses"], 2)
+
+    def test_write_invalidates(self):
+        """测试写入失效：本进程或其他进程写入后表版本变化，不会返回旧结果"""
+        with temp_kb() as db:
+            self._seed(db)
+            self.assertNotIn("副本延迟新手册", query.search("副本延迟", COLLECTION, mode="vector"))
+
+            db.replace_source_chunks(COLLECTION, _rows(db, ["副本延迟新手册：检查网络"], prefix="new"))
+            self.assertIn("副本延迟新手册", query.search("副本延迟", COLLECTION, mode="vector"))
+            self.assertEqual(db.result_cache.stats()["invalidated"], 1)
+
+            # 另一个连接 (模拟 ingest.py 进程) 写入
+            other = lancedb.connect(db.db_path).open_table(COLLECTION)
+            other.add(_rows(db, ["副本延迟第三版手册"], prefix="other"))
+            self.assertIn("副本延迟第三版手册", query.search("副本延迟", COLLECTION, mode="vector"))
+            self.assertEqual(db.result_cache.stats()["invalidated"], 2)
+
+    def test_recreated_table_invalidates(self):
+        """测试删表重建：新表版本号从头开始，即使与旧记录的版本号相同也不返回旧结果"""
+        with temp_kb() as db:
+            self._seed(db)
+            old = db.table_versions([COLLECTION])[COLLECTION]
+            self.assertIn("复制队列", query.search("副本延迟", COLLECTION, mode="vector"))
+
+            db.reset_table(COLLECTION)
+            db.create_table(COLLECTION, _rows(db, ["副本延迟重建后的手册", "索引压缩比约 4 倍", "会议纪要"], prefix="new"))
+            db.maintain_indexes(COLLECTION, background=False)
+            new = db.table_versions([COLLECTION])[COLLECTION]
+            self.assertEqual(new[1], old[1])
+            self.assertNotEqual(new[0], old[0])
+            self.assertIn("重建后的手册", query.search("副本延迟", COLLECTION, mode="vector"))
+
+            # 其他进程重建时本进程不会收到通知：按表标识失效
+            cache = ResultCache()
+            cache.put("副本延迟", ("p",), {COLLECTION: old}, [{"text": "旧结果"}])
+            self.assertIsNone(cache.get("副本延迟", ("p",), {COLLECTION: new}))
+            self.assertEqual(cache.stats()["invalidated"], 1)
+
+    def test_semantic_hit(self):
+        """测试语义缓存：改写后的问题向量足够相似时复用结果，不相似的问题正常检索"""
+        with temp_kb() as db:
+            self._seed(db)
+            db.result_cache = ResultCache(semantic=True, threshold=0.8)
+            first = query.search("星云数据库副本延迟怎么排查", COLLECTION, mode="hybrid")
+            with patch.object(query, "search_rows", side_effect=AssertionError("should be cached")):
+                rephrased = query.search("星云数据库的副本延迟怎么排查？", COLLECTION, mode="hybrid")
+            self.assertEqual(first.split("\n")[1:], rephrased.split("\n")[1:])
+            self.assertEqual(db.result_cache.stats()["semantic_hits"], 1)
+
+            query.search("会议纪要", COLLECTION, mode="hybrid")
+            self.assertEqual(db.result_cache.stats()["misses"], 2)
+
+    def test_batch_and_rerank_fallback(self):
+        """测试批量检索按问题缓存；精排未生效的第一阶段结果不缓存"""
+        with temp_kb() as db:
+            self._seed(db)
+            query.search_many(["副本延迟", "索引压缩"], COLLECTION, mode="vector")
+            query.search_many(["副本延迟", "会议纪要"], COLLECTION, mode="vector")
+            stats = db.result_cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"]), (1, 3))
+
+            fallback = [{"text": "x", "score": 0.5, "reranked": False}]
+            for _ in range(2):
+                query.cached_search(db, "精排", [COLLECTION], 5, "vector", None, True, lambda vec: fallback)
+            self.assertEqual(db.result_cache.stats()["hits"], 1, "fallback results must not be cached")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import retrieval_service
+from skills.knowledge_base.scripts.retrieval_service import RetrievalService, measure_warm_latency
+from skills.knowledge_base.scripts.result_cache import ResultCache
+from skills.knowledge_base.scripts.metrics import percentile
+
+COLLECTION = "test_service"
+
+
+class TestRetrievalService(unittest.TestCase):
+
+    def _seed(self, db):
+        texts = ["Nebula Core 价格 is 50000 CNY", "星云核心部署需要 8 核 CPU", "会议纪要：下周发布"]
+        vectors = db.embed_documents(texts)
+        data = [{"vector": v, "text": t, "source": f"/tmp/doc_{i}.md", "line_range": "1-1",
+                 "location": "Unknown Location", "type": "document"} for i, (t, v) in enumerate(zip(texts, vectors))]
+        db.create_table(COLLECTION, data)
+
+    def test_warm_service_reuses_model_and_tables(self):
+        """测试常驻服务：模型只加载一次，表句柄被缓存复用"""
+        with temp_kb() as db:
+            self._seed(db)
+            service = RetrievalService()
+            service.warmup()
+            self.assertTrue(service.is_ready)
+
+            calls_before = db.embedding_model.calls
+            result = service.search("Nebula Core 价格", COLLECTION)
+            self.assertIn("50000", result)
+            # 只做了一次查询推理，没有重新加载模型
+            self.assertEqual(db.embedding_model.calls, calls_before + 1)
+            self.assertIs(db.get_table(COLLECTION), db.get_table(COLLECTION))
+
+    def test_concurrent_queries(self):
+        """测试多线程并发检索与延迟统计"""
+        with temp_kb() as db:
+            self._seed(db)
+            service = RetrievalService()
+            queries = ["Nebula Core 价格", "星云核心部署", "会议纪要"] * 4
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(lambda q: service.search(q, COLLECTION), queries))
+
+            self.assertEqual(len(results), 12)
+            self.assertTrue(all("知识库检索结果" in r for r in results))
+            stats = service.stats()
+            self.assertEqual(stats["queries"], 12)
+            self.assertGreater(stats["p95_ms"], 0)
+            self.assertIn("within_target", stats)
+
+    def test_warm_latency_bypasses_result_cache(self):
+        """测试热查询延迟测量：重复同一查询时每轮都真正推理与检索，不读写共享缓存"""
+        with temp_kb() as db, patch.object(retrieval_service, "_SERVICE", RetrievalService()):
+            self._seed(db)
+            cache = db.result_cache = ResultCache()
+            service = retrieval_service.get_service()
+            service.warmup()
+            calls = db.embedding_model.calls
+            stats = measure_warm_latency("Nebula Core 价格", COLLECTION, rounds=5)
+            self.assertEqual(stats["queries"], 5)
+            self.assertEqual(db.embedding_model.calls, calls + 5)
+            self.assertEqual(stats["result_cache"]["hits"] + stats["result_cache"]["misses"], 0)
+            self.assertEqual(stats["result_cache"]["entries"], 0)
+            self.assertIs(db.result_cache, cache)
+
+            # 普通检索照常走缓存
+            service.search("Nebula Core 价格", COLLECTION)
+            service.search("Nebula Core 价格", COLLECTION)
+            self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_percentile(self):
+        """测试最近邻分位数"""
+        self.assertEqual(percentile([], 95), 0.0)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pyarrow as pa
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import schema_migrations
+from skills.knowledge_base.scripts.manage import schema_knowledge
+
+COLLECTION = "test_schema"
+
+
+class TestSchemaMigration(unittest.TestCase):
+
+    def _legacy_table(self, db):
+        """最早版本的表：只有 vector / text / source，未记录结构版本"""
+        rows = [{"vector": db.embed_query(f"旧片段 {i}"), "text": f"旧片段 {i}", "source": "/kb/old.md"}
+                for i in range(3)]
+        tbl = db.db.create_table(COLLECTION, data=rows)
+        return tbl, np.stack([r["vector"] for r in rows])
+
+    def _vectors(self, tbl):
+        data = tbl.to_arrow().sort_by("text")
+        return np.stack(data.column("vector").to_pylist())
+
+    def test_migrate_adds_columns_and_keeps_vectors(self):
+        """测试旧表原地升级：补齐列与默认值，向量不变，记录结构版本"""
+        with temp_kb() as db:
+            tbl, vectors = self._legacy_table(db)
+            self.assertEqual(schema_migrations.schema_version(tbl), 0)
+
+            applied = db.migrate_table(COLLECTION)
+            self.assertEqual([step for step, _, _ in applied], [1, 2, 3, 4])
+            for column in schema_migrations.migration_columns():
+                self.assertIn(column, tbl.schema.names)
+            self.assertEqual(schema_migrations.schema_version(tbl), schema_migrations.SCHEMA_VERSION)
+            np.testing.assert_allclose(self._vectors(tbl), vectors, rtol=1e-6)
+
+            data = tbl.to_arrow()
+            self.assertEqual(set(data.column("type").to_pylist()), {"document"})
+            self.assertEqual(len(set(data.column("chunk_id").to_pylist())), 3)
+
+            # 已是最新版本：不产生新版本
+            version = tbl.version
+            self.assertEqual(db.migrate_table(COLLECTION), [])
+            self.assertEqual(tbl.version, version)
+
+    def test_ingest_write_after_migration(self):
+        """测试迁移后的旧表可直接按来源原子替换"""
+        with temp_kb() as db:
+            self._legacy_table(db)
+            row = {"vector": db.embed_query("新片段"), "text": "新片段", "source": "/kb/old.md",
+                   "line_range": "1-1", "location": "Line 1", "type": "document", "chunk_id": "new",
+                   "ingested_at": "2026-10-18T10:00:00"}
+            self.assertTrue(db.check_schema_compatibility(COLLECTION, row))
+            tbl = db.replace_source_chunks(COLLECTION, [row], stale_sources=["/kb/old.md"])
+            self.assertEqual(tbl.to_arrow().column("text").to_pylist(), ["新片段"])
+
+    def test_unknown_field_added_without_drop(self):
+        """测试迁移表之外的新字段补为可空列，已有数据保留"""
+        with temp_kb() as db:
+            vec = db.embed_query("x")
+            db.create_table(COLLECTION, [{"vector": vec, "text": "x", "source": "s", "chunk_id": "0"}])
+            tbl = db.get_table(COLLECTION)
+            self.assertTrue(db.check_schema_compatibility(COLLECTION, {"vector": vec, "text": "y", "source": "s",
+                                                                       "chunk_id": "1", "author": "ning"}))
+            self.assertIn("author", tbl.schema.names)
+            self.assertEqual(tbl.count_rows(), 1)
+
+    def test_new_table_is_stamped(self):
+        """测试新建的完整表直接记录为最新版本，schema 命令可查看"""
+        with temp_kb() as db:
+            row = {"vector": db.embed_query("x"), "text": "x", "source": "s", "line_range": "1-1",
+                   "location": "Line 1", "type": "document", "chunk_id": "0", "ingested_at": "2026-10-18",
+                   "session_id": "s1", "turn_id": 1, "turn_started_at": "2026-10-18", "turn_ended_at": "2026-10-18"}
+            tbl = db.create_table(COLLECTION, [row])
+            self.assertEqual(schema_migrations.schema_version(tbl), schema_migrations.SCHEMA_VERSION)
+
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                self.assertIn(f"{COLLECTION}: v{schema_migrations.SCHEMA_VERSION} ✅", schema_knowledge(COLLECTION))
+
+    def test_new_document_table_needs_no_migration(self):
+        """测试新建文档表直接带齐轮次列并记录最新版本，后续写入不触发迁移、不产生额外版本"""
+        with temp_kb() as db:
+            row = {"vector": db.embed_query("x"), "text": "x", "source": "s", "line_range": "1-1",
+                   "location": "Line 1", "type": "document", "chunk_id": "0", "ingested_at": "2026-10-18"}
+            tbl = db.create_table(COLLECTION, [row])
+            self.assertEqual(schema_migrations.schema_version(tbl), schema_migrations.SCHEMA_VERSION)
+            self.assertEqual(tbl.schema.field("turn_id").type, pa.int64())
+
+            version = tbl.version
+            self.assertEqual(db.migrate_table(COLLECTION), [])
+            db.append_chunks(COLLECTION, [{**row, "text": "y", "chunk_id": "1"}])
+            self.assertEqual(tbl.version, version + 1)
+            self.assertEqual(tbl.count_rows("session_id IS NULL"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import query, index_manager
+from skills.knowledge_base.scripts.filters import build_filter, glob_to_like
+
+COLLECTION = "test_filters"
+
+
+class TestSearchFilters(unittest.TestCase):
+
+    def _seed(self, db):
+        specs = [
+            ("/kb/白皮书.pdf", "Page 1", "2026-01-05T10:00:00", "星云核心 授权价格 50000"),
+            ("/kb/白皮书.pdf", "Page 2", "2026-01-05T10:00:00", "星云核心 部署架构"),
+            ("/kb/报价单.xlsx", "Sheet: 报价", "2026-03-01T09:00:00", "星云核心 报价 48000"),
+            ("/kb/100%_report.md", "Unknown Location", "2026-03-02T09:00:00", "星云核心 周报"),
+        ]
+        vectors = db.embed_documents([s[3] for s in specs])
+        data = [{"vector": v, "text": text, "source": source, "line_range": "1-1", "location": loc,
+                 "type": "document", "chunk_id": str(i), "ingested_at": ts}
+                for i, ((source, loc, ts, text), v) in enumerate(zip(specs, vectors))]
+        tbl = db.create_table(COLLECTION, data)
+        db.maintain_indexes(COLLECTION, background=False)
+        return tbl
+
+    def test_build_filter(self):
+        """测试过滤条件编译：glob 转 LIKE、字面量转义、日期范围"""
+        self.assertEqual(build_filter(), None)
+        self.assertEqual(build_filter(source="/kb/a.pdf"), "source = '/kb/a.pdf'")
+        self.assertEqual(build_filter(source="*.pdf"), "source LIKE '%.pdf'")
+        self.assertEqual(glob_to_like("100%_?*"), "100\\%\\__%")
+        self.assertEqual(build_filter(source="it's.md"), "source LIKE '%/it''s.md'")
+        self.assertEqual(
+            build_filter(type=["a", "b"], until="2026-03-01"),
+            "(type IN ('a', 'b')) AND (ingested_at <= '2026-03-01T23:59:59')",
+        )
+        with self.assertRaises(ValueError):
+            build_filter(since="last week")
+
+    def test_filtered_search_is_prefiltered(self):
+        """测试各检索模式都只返回过滤范围内的结果"""
+        with temp_kb() as db:
+            tbl = self._seed(db)
+            for mode in ("vector", "keyword", "hybrid"):
+                rows = query.search_rows(db, tbl, "星云核心", limit=5, mode=mode, where=build_filter(source="*.pdf"))
+                self.assertEqual({r["source"] for r in rows}, {"/kb/白皮书.pdf"}, mode)
+
+            rows = query.search_rows(db, tbl, "星云核心", limit=5, mode="vector",
+                                     where=build_filter(since="2026-03-01", location="Sheet: *"))
+            self.assertEqual([r["location"] for r in rows], ["Sheet: 报价"])
+            rows = query.search_rows(db, tbl, "星云核心", limit=5, mode="vector",
+                                     where=build_filter(source="100%_report.md"))
+            self.assertEqual(len(rows), 1)
+            # 只给文件名时按完整文件名匹配：report.md 不匹配 100%_report.md
+            rows = query.search_rows(db, tbl, "星云核心", limit=5, mode="vector",
+                                     where=build_filter(source="report.md"))
+            self.assertEqual(rows, [])
+
+            output = query.search("星云核心", COLLECTION, filters={"source": "*报价单*"})
+            self.assertIn("报价单", output)
+            self.assertNotIn("白皮书", output)
+
+    def test_scalar_indexes_back_filters(self):
+        """测试过滤列建有标量索引，按来源过滤与删除走索引查询"""
+        with temp_kb() as db:
+            tbl = self._seed(db)
+            indexed = index_manager._index_columns(tbl)
+            for column in index_manager.SCALAR_INDEXES:
+                self.assertIn(column, indexed)
+            plan = tbl.search().where(build_filter(source="/kb/报价单.xlsx")).explain_plan(True)
+            self.assertIn("ScalarIndexQuery", plan)
+
+    def test_old_table_gains_ingested_at_column(self):
+        """测试旧表缺少 ingested_at 时原地补列，不删表"""
+        with temp_kb() as db:
+            vec = db.embed_query("旧数据")
+            db.create_table(COLLECTION, [{"vector": vec, "text": "旧数据", "source": "/kb/old.md", "chunk_id": "0"}])
+            self.assertTrue(db.check_schema_compatibility(COLLECTION, {"vector": vec, "text": "x", "source": "s",
+                                                                       "chunk_id": "1", "ingested_at": "2026-01-01"}))
+            tbl = db.get_table(COLLECTION)
+            self.assertIn("ingested_at", tbl.schema.names)
+            self.assertEqual(tbl.count_rows(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
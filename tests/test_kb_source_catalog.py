@@ -0,0 +1,84 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest
+from skills.knowledge_base.scripts.manage import list_knowledge, delete_knowledge
+
+COLLECTION = "test_catalog"
+
+
+class TestSourceCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp(prefix="zx_kb_src_")
+        # 两个超过切片目标长度的段落 -> 2 个片段
+        self._write("a.md", "\n\n".join("\n".join(f"alpha {p}.{i} 用于测试来源目录的片段统计" for i in range(15))
+                                        for p in range(2)))
+        self._write("b.md", "beta 文档")
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir, ignore_errors=True)
+
+    def _write(self, name, body):
+        with open(os.path.join(self.src_dir, name), "w", encoding="utf-8") as f:
+            f.write(body)
+
+    def test_catalog_tracks_ingest_and_delete(self):
+        """测试目录随入库、替换、删除增量更新"""
+        with temp_kb() as db:
+            ingest.main(self.src_dir, COLLECTION)
+            entries = {os.path.basename(e["source"]).split("_", 1)[-1]: e for e in db.catalog.entries(COLLECTION)}
+            self.assertEqual(entries["a.md"]["chunks"], 2)
+            self.assertEqual(entries["b.md"]["chunks"], 1)
+            self.assertTrue(entries["b.md"]["content_hash"])
+            self.assertGreater(entries["a.md"]["bytes"], 0)
+            self.assertEqual(sum(db.list_sources(COLLECTION).values()), db.get_table(COLLECTION).count_rows())
+
+            # 修改后替换：旧来源移除，新来源记录新的片段数
+            self._write("a.md", "alpha 只剩一行")
+            ingest.main(self.src_dir, COLLECTION)
+            counts = db.list_sources(COLLECTION)
+            self.assertEqual(sorted(counts.values()), [1, 1])
+            self.assertEqual(sum(counts.values()), db.get_table(COLLECTION).count_rows())
+
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                source = db.catalog.find_by_name(COLLECTION, os.path.basename(next(iter(counts))))[0]
+                msg = delete_knowledge(os.path.basename(source), COLLECTION)
+                self.assertIn("已成功从知识库", msg)
+                self.assertNotIn(source, db.list_sources(COLLECTION))
+                self.assertIn("未找到", delete_knowledge("missing.md", COLLECTION))
+                self.assertIn("总计: 1 个文件", list_knowledge(COLLECTION))
+
+    def test_rebuild_for_existing_table_beyond_10k(self):
+        """测试升级前的旧表首次访问时全量重建目录，超过 1 万片段也计数正确"""
+        with temp_kb() as db:
+            vec = db.embed_query("x")
+            data = [{"vector": vec, "text": "片段", "source": f"/tmp/s{i % 3}.md"} for i in range(12001)]
+            db.create_table(COLLECTION, data)
+            # 模拟旧版本：表存在但目录为空
+            db.catalog.clear(COLLECTION)
+            counts = db.list_sources(COLLECTION)
+            self.assertEqual(sum(counts.values()), 12001)
+            self.assertEqual(counts["/tmp/s0.md"], 4001)
+            self.assertTrue(db.catalog.is_built(COLLECTION))
+
+    def test_iter_entries_pages(self):
+        """测试清单分页流式读取：跨页不重复不遗漏，顺序与一次读取一致"""
+        with temp_kb() as db:
+            rows = [{"source": f"/tmp/s{i:03d}.md", "text": "片段"} for i in range(25)]
+            db.catalog.apply_write(COLLECTION, rows)
+            paged = [e["source"] for e in db.catalog.iter_entries(COLLECTION, page_size=10)]
+            self.assertEqual(paged, [e["source"] for e in db.catalog.entries(COLLECTION)])
+            self.assertEqual(len(paged), 25)
+            self.assertEqual(db.catalog.counts(COLLECTION), {r["source"]: 1 for r in rows})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest
+from skills.knowledge_base.scripts import turn_memory
+from skills.knowledge_base.scripts.turn_memory import TurnRecorder, summarize_turn, format_turn
+from skills.knowledge_base.scripts.ingest_journal import IngestJournal, drain
+
+COLLECTION = "test_turns"
+
+
+def _turn(question, answer, tool_result=None):
+    messages = [HumanMessage(content=question)]
+    if tool_result is not None:
+        messages.append(AIMessage(content="", tool_calls=[{"name": "read_file", "args": {"path": "a.md"}, "id": "c1"}]))
+        messages.append(ToolMessage(content=tool_result, name="read_file", tool_call_id="c1"))
+    messages.append(AIMessage(content=answer))
+    return messages
+
+
+class TestTurnMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp(prefix="zx_kb_turns_")
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_summarize_and_bound_turn(self):
+        """测试单轮摘要：用户输入、最终回答与工具结果摘要，超长正文按上限截断"""
+        user, answer, tools = summarize_turn(_turn("查一下副本延迟", "延迟约 20ms", "x" * 1000))
+        self.assertEqual((user, answer), ("查一下副本延迟", "延迟约 20ms"))
+        self.assertEqual(len(tools), 1)
+        self.assertTrue(tools[0].startswith("read_file: "))
+        self.assertLessEqual(len(tools[0]), len("read_file: ") + turn_memory.TOOL_RESULT_CHARS + 1)
+        self.assertIsNone(summarize_turn([AIMessage(content="只有回答")]))
+
+        body = format_turn("问题", "回答" * 5000, [], max_chars=500)
+        self.assertLessEqual(len(body), 520)
+        self.assertTrue(body.endswith("(truncated)"))
+
+    def test_turns_are_appended_incrementally(self):
+        """测试按轮次增量入库：每轮追加片段 (带会话/轮次/时间)，来源目录累加，日志逐轮写入"""
+        with temp_kb() as db:
+            recorder = TurnRecorder(self.log_dir, session_id="s-test", collection=COLLECTION,
+                                    db_factory=lambda: db)
+            self.assertEqual(recorder.record(_turn("星云数据库的副本延迟怎么排查？", "先看复制队列长度。"),
+                                             "2026-10-18T10:00:00"), 1)
+            self.assertTrue(recorder.flush())
+            self.assertEqual(db.get_table(COLLECTION).count_rows(), 1)
+
+            recorder.record(_turn("索引压缩比多少？", "大约 4 倍。", "压缩统计: ratio=4.1"))
+            self.assertFalse(recorder.close(), "all turns ingested, no backfill needed")
+
+            rows = sorted(db.get_table(COLLECTION).to_arrow().to_pylist(), key=lambda r: r["turn_id"])
+            self.assertEqual([r["turn_id"] for r in rows], [1, 2])
+            self.assertEqual({r["session_id"] for r in rows}, {"s-test"})
+            self.assertEqual({r["type"] for r in rows}, {"turn"})
+            self.assertEqual(rows[0]["location"], "Turn 1")
+            self.assertEqual(rows[0]["turn_started_at"], "2026-10-18T10:00:00")
+            self.assertIn("ratio=4.1", rows[1]["text"])
+
+            # 来源为会话日志，line_range 指向日志中该轮的行
+            self.assertEqual(db.list_sources(COLLECTION), {recorder.log_path: 2})
+            with open(recorder.log_path, encoding="utf-8") as f:
+                log_lines = f.read().splitlines()
+            start, end = map(int, rows[1]["line_range"].split("-"))
+            self.assertEqual(log_lines[start - 1], "### User")
+            self.assertIn("ratio=4.1", "\n".join(log_lines[start - 1:end]))
+
+    def test_append_to_existing_episodic_table(self):
+        """测试追加到整段入库建立的旧集合：按迁移补齐轮次列，旧片段为空"""
+        session = os.path.join(self.log_dir, "old_session.md")
+        with open(session, "w", encoding="utf-8") as f:
+            f.write("## User\n上周讨论的发布计划\n\n## AI\n周五灰度发布。")
+        with temp_kb() as db:
+            ingest.main(session, COLLECTION)
+            recorder = TurnRecorder(self.log_dir, collection=COLLECTION, db_factory=lambda: db)
+            recorder.record(_turn("发布计划改了吗？", "改到下周一。"))
+            self.assertFalse(recorder.close())
+
+            rows = db.get_table(COLLECTION).to_arrow().to_pylist()
+            self.assertEqual(sorted(r["turn_id"] is None for r in rows), [False, True])
+
+    def test_failed_turns_request_backfill(self):
+        """测试写入失败：不影响对话，退出时提示需要整段补入库"""
+        def broken_db():
+            raise RuntimeError("model unavailable")
+
+        recorder = TurnRecorder(self.log_dir, collection=COLLECTION, db_factory=broken_db)
+        recorder.record(_turn("你好", "你好！"))
+        self.assertTrue(recorder.close())
+        self.assertEqual(recorder.stats["failed"], 1)
+        self.assertEqual(recorder.last_error, "model unavailable")
+        self.assertTrue(os.path.exists(recorder.log_path), "turn log is written even when ingest fails")
+
+    def test_backfill_only_missing_turns(self):
+        """测试补入库：只追加失败的轮次，已写入的轮次不会作为普通文档重复入库"""
+        with temp_kb() as db:
+            calls = []
+
+            def flaky_db():
+                calls.append(1)
+                if len(calls) == 2:
+                    raise RuntimeError("model unavailable")
+                return db
+
+            recorder = TurnRecorder(self.log_dir, collection=COLLECTION, db_factory=flaky_db)
+            recorder.record(_turn("星云数据库的副本延迟怎么排查？", "先看复制队列长度。"))
+            self.assertTrue(recorder.flush())
+            recorder.record(_turn("索引压缩比多少？", "大约 4 倍。", "压缩统计: ratio=4.1"))
+            self.assertTrue(recorder.close(), "failed turn requests backfill")
+            self.assertEqual(db.get_table(COLLECTION).count_rows(), 1)
+
+            journal = IngestJournal(os.path.join(self.log_dir, "journal.sqlite3"))
+            journal.enqueue(recorder.log_path, COLLECTION)
+            self.assertEqual(drain(journal), {"added": 1})
+            rows = sorted(db.get_table(COLLECTION).to_arrow().to_pylist(), key=lambda r: r["turn_id"])
+            self.assertEqual([(r["turn_id"], r["type"]) for r in rows], [(1, "turn"), (2, "turn")])
+            self.assertEqual(rows[1]["session_id"], recorder.session_id)
+            with open(recorder.log_path, encoding="utf-8") as f:
+                log_lines = f.read().splitlines()
+            start, _ = map(int, rows[1]["line_range"].split("-"))
+            self.assertEqual(log_lines[start - 1], "### User")
+
+            journal.enqueue(recorder.log_path, COLLECTION)
+            self.assertEqual(drain(journal), {"skipped": 1})
+            self.assertEqual(db.get_table(COLLECTION).count_rows(), 2)
+
+    def test_delete_keeps_session_log(self):
+        """测试删除会话日志的索引时不删除归档目录之外的源文件"""
+        from unittest.mock import patch
+        from skills.knowledge_base.scripts.manage import delete_knowledge
+        with temp_kb() as db:
+            recorder = TurnRecorder(self.log_dir, collection=COLLECTION, db_factory=lambda: db)
+            recorder.record(_turn("发布计划改了吗？", "改到下周一。"))
+            self.assertFalse(recorder.close())
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                self.assertIn("予以保留", delete_knowledge(recorder.log_path, COLLECTION))
+            self.assertTrue(os.path.exists(recorder.log_path))
+            self.assertEqual(db.list_sources(COLLECTION), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
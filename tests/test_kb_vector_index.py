@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb, FAKE_DIM
+from skills.knowledge_base.scripts import index_manager
+from skills.knowledge_base.scripts.manage import index_knowledge
+
+COLLECTION = "test_vector_index"
+
+
+def _rows(n, offset=0):
+    rng = np.random.default_rng(offset)
+    vecs = rng.normal(size=(n, FAKE_DIM)).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return [{"vector": v, "text": f"t{offset + i}", "source": "s", "chunk_id": str(offset + i)} for i, v in enumerate(vecs)]
+
+
+class TestVectorIndexLifecycle(unittest.TestCase):
+
+    def test_below_threshold_stays_brute_force(self):
+        """测试行数未达阈值时不建索引"""
+        with temp_kb() as db, patch.object(index_manager, "INDEX_MIN_ROWS", 1000):
+            db.create_table(COLLECTION, _rows(300))
+            self.assertNotIn("built", db.maintain_indexes(COLLECTION, background=False))
+            self.assertFalse(index_manager.vector_index_status(db.get_table(COLLECTION))["indexed"])
+
+    def test_build_then_incremental_optimize(self):
+        """测试达到阈值建索引、追加足够行后增量合并"""
+        with temp_kb() as db, \
+             patch.object(index_manager, "INDEX_MIN_ROWS", 1000), \
+             patch.object(index_manager, "REINDEX_UNINDEXED_ROWS", 200):
+            db.create_table(COLLECTION, _rows(1200))
+            self.assertEqual(db.maintain_indexes(COLLECTION, background=False), ["built", "fts_built", "scalar_built"])
+
+            tbl = db.get_table(COLLECTION)
+            tbl.add(_rows(100, offset=5000))
+            self.assertEqual(db.maintain_indexes(COLLECTION, background=False), [])
+            tbl.add(_rows(150, offset=6000))
+            self.assertEqual(db.maintain_indexes(COLLECTION, background=False), ["optimized"])
+            self.assertEqual(index_manager.vector_index_status(tbl)["num_unindexed_rows"], 0)
+
+    def test_manage_index_report(self):
+        """测试 manage.py index 输出状态与召回报告"""
+        with temp_kb() as db, patch.object(index_manager, "INDEX_MIN_ROWS", 1000):
+            db.create_table(COLLECTION, _rows(1200))
+            with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                out = index_knowledge(COLLECTION, build=True, bench=True, k=5, samples=5)
+            self.assertIn("IVF_PQ", out)
+            self.assertIn("brute-force", out)
+            self.assertIn("nprobes=20", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest, query, vector_precision
+from skills.knowledge_base.scripts.manage import precision_knowledge
+
+COLLECTION = "test_precision"
+TEXTS = [f"第 {i} 条记录：产品 ZX-{1000 + i} 的说明与价格 {i * 100} 元" for i in range(40)]
+
+
+class TestVectorPrecision(unittest.TestCase):
+
+    def _rows(self, db, texts=TEXTS, offset=0):
+        vectors = db.embed_documents(texts)
+        return [{"vector": v, "text": t, "source": f"/tmp/p_{offset + i}.md", "chunk_id": str(offset + i)}
+                for i, (t, v) in enumerate(zip(texts, vectors))]
+
+    def test_int8_quantization_roundtrip(self):
+        """测试 int8 逐行量化误差在 scale/2 以内"""
+        matrix = np.random.default_rng(0).normal(size=(5, 16)).astype(np.float32)
+        codes, scales = vector_precision.quantize_int8(matrix)
+        self.assertEqual(codes.dtype, np.int8)
+        err = np.abs(vector_precision.dequantize_int8(codes, scales) - matrix)
+        self.assertTrue(np.all(err <= scales[:, None] / 2 + 1e-6))
+
+    def test_low_precision_tables_search_transparently(self):
+        """测试 float16 / int8 表写入与检索对调用方透明，结果与 float32 一致"""
+        for precision in ("float16", "int8"):
+            with temp_kb() as db:
+                db.create_table(COLLECTION, self._rows(db), precision=precision)
+                # 追加写入沿用表的精度
+                db.replace_source_chunks(COLLECTION, self._rows(db, ["新增：产品 ZX-9999 停产"], offset=100))
+                tbl = db.get_table(COLLECTION)
+                self.assertEqual(vector_precision.table_precision(tbl), precision)
+                self.assertEqual(tbl.count_rows(), 41)
+
+                rows = query.search_rows(db, tbl, TEXTS[7], limit=3, mode="vector")
+                self.assertEqual(rows[0]["text"], TEXTS[7], precision)
+                self.assertAlmostEqual(rows[0]["score"], 1.0, places=2)
+                rows = query.search_rows(db, tbl, "ZX-9999 停产", limit=1, mode="vector",
+                                         where="source = '/tmp/p_100.md'")
+                self.assertEqual(rows[0]["chunk_id"], "100")
+
+    def test_convert_and_report(self):
+        """测试迁移命令转换已有集合，并输出体积与召回对比"""
+        src_dir = tempfile.mkdtemp(prefix="zx_kb_src_")
+        try:
+            with open(os.path.join(src_dir, "a.md"), "w", encoding="utf-8") as f:
+                f.write("\n".join(TEXTS))
+            with temp_kb() as db:
+                ingest.main(src_dir, COLLECTION)
+                rows_before = db.get_table(COLLECTION).count_rows()
+                with patch("skills.knowledge_base.scripts.manage.DBManager.get_instance", return_value=db):
+                    out = precision_knowledge(COLLECTION, target="int8", report=True, k=3, samples=3)
+                self.assertIn("从 float32 转换为 int8", out)
+                self.assertIn("float16", out)
+                self.assertIn("节省 75%", out)  # 1 - (384 + 4) / (384 * 4)
+                tbl = db.get_table(COLLECTION)
+                self.assertEqual(vector_precision.table_precision(tbl), "int8")
+                self.assertEqual(tbl.count_rows(), rows_before)
+                self.assertIn("知识库检索结果", query.search(TEXTS[0], COLLECTION, mode="hybrid"))
+
+                # 转回 float16 同样可用
+                vector_precision.convert_table(db, COLLECTION, "float16")
+                self.assertEqual(vector_precision.table_precision(db.get_table(COLLECTION)), "float16")
+        finally:
+            shutil.rmtree(src_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.kb_fakes import temp_kb
+from skills.knowledge_base.scripts import ingest
+from skills.knowledge_base.scripts.watcher import FolderSync, ChangeBuffer, is_supported
+
+COLLECTION = "test_watch"
+
+
+class TestFolderWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp(prefix="zx_kb_watch_")
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir, ignore_errors=True)
+
+    def _write(self, name, body):
+        path = os.path.join(self.src_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        return path
+
+    def _sync(self):
+        return FolderSync(self.src_dir, COLLECTION, debounce=1.0, use_watchdog=False)
+
+    def test_debounce_coalesces_events(self):
+        """测试防抖：同一路径的连续事件合并，静默期满后才取出，记录首次发现时间"""
+        buf = ChangeBuffer(debounce=2.0)
+        buf.add("/a.md", now=100.0)
+        buf.add("/a.md", now=101.5)
+        buf.add("/b.md", now=100.5)
+        self.assertEqual(buf.due(now=102.0), [])
+        self.assertEqual(buf.due(now=102.6), [("/b.md", 100.5)])
+        self.assertEqual(buf.oldest(), 100.0)
+        self.assertEqual(buf.due(now=103.5), [("/a.md", 100.0)])
+        self.assertEqual(len(buf), 0)
+
+        self.assertTrue(is_supported("/x/报告.DOCX"))
+        self.assertFalse(is_supported("/x/~$报告.docx"))
+        self.assertFalse(is_supported("/x/.a.md.swp"))
+        self.assertFalse(is_supported("/x/image.png"))
+
+    def test_poll_syncs_changes_and_deletes(self):
+        """测试轮询同步：只重新入库修改的文件，新文件入库，删除的文件同步删除片段与归档"""
+        a = self._write("a.md", "# 发布计划\n星云数据库周五灰度发布。")
+        b = self._write("sub/b.md", "# 压缩\n索引压缩比约 4 倍。")
+        with temp_kb() as db:
+            sync = self._sync()
+            sync.initial_sync()
+            self.assertEqual(len(db.list_sources(COLLECTION)), 2)
+            old_b_source = db.manifest.get(COLLECTION, b).source
+
+            time.sleep(0.01)
+            self._write("a.md", "# 发布计划\n改到下周一灰度发布。")
+            c = self._write("c.md", "# 新文档\n复制延迟排查步骤。")
+            os.remove(b)
+            now = time.time()
+            sync.poll(now)
+            self.assertEqual(len(sync.buffer), 3)
+            self.assertEqual(sync.process_due(now + 0.5), {}, "still inside the debounce window")
+
+            statuses = sync.process_due(now + 1.0)
+            self.assertEqual(statuses, {a: "replaced", b: "deleted", c: "added"})
+            names = sorted(os.path.basename(s) for s in db.list_sources(COLLECTION))
+            self.assertEqual(names, ["a.md", "c.md"])
+            self.assertIsNone(db.manifest.get(COLLECTION, b))
+            self.assertFalse(os.path.exists(old_b_source), "archived copy of the deleted file is removed")
+
+            # 没有变化时不产生事件
+            sync.poll(time.time())
+            self.assertEqual(len(sync.buffer), 0)
+
+            lag = sync.lag_stats()
+            self.assertEqual((lag["mode"], lag["processed"], lag["pending"]), ("polling", 3, 0))
+            self.assertGreater(lag["files_per_s"], 0)
+            self.assertGreaterEqual(lag["lag_p95_s"], lag["lag_p50_s"])
+
+    def test_lag_ignores_preserved_old_mtime(self):
+        """测试延迟统计：复制/移入时保留的旧修改时间 (cp -p、mv) 不计入延迟"""
+        with temp_kb():
+            sync = self._sync()
+            sync.initial_sync()
+            path = self._write("old.md", "# 旧文档\n三天前修改、刚刚移入目录。")
+            os.utime(path, (time.time() - 3 * 86400,) * 2)
+            now = time.time()
+            sync.poll(now)
+            self.assertEqual(sync.process_due(now + 1.0), {path: "added"})
+            self.assertLess(sync.lag_stats()["lag_p95_s"], 60)
+
+    def test_initial_sync_removes_files_deleted_offline(self):
+        """测试启动对齐：监听停止期间删除的文件在下次启动时删除，未变化的文件跳过"""
+        a = self._write("a.md", "# 甲\n第一份文档。")
+        b = self._write("b.md", "# 乙\n第二份文档。")
+        with temp_kb() as db:
+            ingest.main(self.src_dir, COLLECTION, workers=0)
+            os.remove(b)
+            result, removed = self._sync().initial_sync()
+            self.assertEqual((result["skipped"], removed), (1, 1))
+            self.assertEqual([e.path for e in db.manifest.entries(COLLECTION)], [a])
+
+    def test_remove_file_keeps_shared_archive(self):
+        """测试删除副本：另一路径仍引用同一归档 (内容与文件名相同) 时保留片段"""
+        body = "# 模板\n相同内容的两个副本。"
+        first = self._write("x/same.md", body)
+        second = self._write("y/same.md", body)
+        with temp_kb() as db:
+            ingest.main(self.src_dir, COLLECTION, workers=0)
+            os.remove(first)
+            self.assertTrue(ingest.remove_file(first, COLLECTION))
+            self.assertEqual(len(db.list_sources(COLLECTION)), 1)
+            self.assertEqual([e.path for e in db.manifest.entries(COLLECTION)], [second])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import os
 import sys
+import tempfile
+from unittest.mock import patch
 from langchain_core.messages import HumanMessage, AIMessage
 
 # 确保能导入 main.py
@@ -11,7 +13,7 @@ from agent_core.utils import USER_MEMORY_DIR
 class TestMemoryArchiving(unittest.TestCase):
     
     def test_archive_and_ingest_call(self):
-        """验证会话归档是否成功生成文件并尝试调用同步"""
+        """验证会话归档是否成功生成文件并加入入库任务日志 (不在退出路径上同步入库)"""
         print("\n🧪 Testing Session Archiving...")
         
         # 1. 模拟对话历史
@@ -20,10 +22,16 @@ class TestMemoryArchiving(unittest.TestCase):
             AIMessage(content="好的，我已经记下了。")
         ]
         
-        # 2. 调用归档函数
-        # 注意：这里会真实调用 subprocess，为了防止模型下载耗时，我们假设 ingest.py 已存在
+        # 2. 调用归档函数：任务日志写到临时目录，后台入库进程不实际拉起
+        from skills.knowledge_base.scripts import ingest_journal
+        journal_dir = tempfile.mkdtemp()
         try:
-            main._archive_session(history)
+            with patch.object(ingest_journal, "JOURNAL_PATH", os.path.join(journal_dir, "journal.sqlite3")), \
+                    patch.object(ingest_journal, "spawn_drainer") as spawn:
+                main._archive_session(history)
+                journal = ingest_journal.IngestJournal()
+                pending = journal.entries("pending")
+            spawn.assert_called_once()
             
             # 3. 检查文件是否生成
             import datetime
@@ -43,11 +51,38 @@ class TestMemoryArchiving(unittest.TestCase):
                 self.assertIn("## User", content)
                 self.assertIn("## AI", content)
                 
+            # 4. 会话文件已加入 episodic_memory 入库队列
+            self.assertEqual(len(pending), 1)
+            self.assertEqual(pending[0]["path"], os.path.abspath(latest_file))
+            self.assertEqual(pending[0]["collection"], "episodic_memory")
             print(f"    ✅ Session archived successfully to: {latest_file}")
             
         except Exception as e:
             self.fail(f"Archiving failed with error: {e}")
 
+    def test_archive_with_turn_memory(self):
+        """验证按轮次记录时，退出只等待剩余轮次，不再整段归档入库"""
+        from skills.knowledge_base.scripts.turn_memory import TurnRecorder
+        log_dir = tempfile.mkdtemp()
+        recorder = TurnRecorder(log_dir, db_factory=lambda: None)
+        recorder.record([HumanMessage(content="你好"), AIMessage(content="你好！")])
+        original = main._TURN_RECORDER
+        try:
+            main._TURN_RECORDER = recorder
+            with patch.object(recorder, "close", return_value=False) as close, \
+                    patch.object(main, "_enqueue_episodic") as enqueue:
+                main._archive_session([HumanMessage(content="你好"), AIMessage(content="你好！")])
+            close.assert_called_once()
+            enqueue.assert_not_called()
+
+            # 有轮次未写入时整段会话交给入库队列补齐
+            with patch.object(recorder, "close", return_value=True), \
+                    patch.object(main, "_enqueue_episodic") as enqueue:
+                main._archive_session(["x"])
+            enqueue.assert_called_once_with(recorder.log_path)
+        finally:
+            main._TURN_RECORDER = original
+
     def test_archive_session_once_guard(self):
         """验证退出归档只执行一次，避免重复写入。"""
         calls = []
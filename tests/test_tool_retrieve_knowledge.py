@@ -9,11 +9,51 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from agent_core.tools import retrieve_knowledge, PROJECT_ROOT
 
 class TestToolRetrieveKnowledge(unittest.TestCase):
+
+    @patch("subprocess.run")
+    @patch("agent_core.tools.get_knowledge_service")
+    def test_retrieve_knowledge_in_process(self, mock_service, mock_run):
+        """测试优先走进程内常驻检索服务，不再拉起子进程"""
+        service = MagicMock()
+        service.search.return_value = "--- 知识库检索结果 ---"
+        mock_service.return_value = service
+
+        result = retrieve_knowledge.invoke({"query": "design patterns", "collection": "documents"})
+
+        service.search.assert_called_once_with("design patterns", "documents", mode=None, filters={})
+        mock_run.assert_not_called()
+        self.assertEqual(result, "--- 知识库检索结果 ---")
+
+    @patch("agent_core.tools.get_knowledge_service")
+    def test_retrieve_knowledge_batch_queries(self, mock_service):
+        """测试多个问题合并为一次批量检索"""
+        service = MagicMock()
+        service.search_many.return_value = "=== 批量检索 ==="
+        mock_service.return_value = service
+
+        result = retrieve_knowledge.invoke({"queries": ["价格", "部署要求", "价格"], "collection": "all"})
+
+        service.search_many.assert_called_once_with(["价格", "部署要求", "价格"], "all", mode=None, filters={})
+        service.search.assert_not_called()
+        self.assertEqual(result, "=== 批量检索 ===")
+
+    @patch("agent_core.tools.get_knowledge_service")
+    def test_retrieve_knowledge_in_process_error(self, mock_service):
+        """测试常驻服务报错时返回可读错误"""
+        service = MagicMock()
+        service.search.side_effect = RuntimeError("model missing")
+        mock_service.return_value = service
+
+        result = retrieve_knowledge.invoke({"query": "test"})
+
+        self.assertIn("检索失败", result)
+        self.assertIn("model missing", result)
     
+    @patch("agent_core.tools.get_knowledge_service", return_value=None)
     @patch("subprocess.run")
     @patch("os.path.exists")
-    def test_retrieve_knowledge_success(self, mock_exists, mock_run):
-        """测试知识检索工具调用成功"""
+    def test_retrieve_knowledge_success(self, mock_exists, mock_run, mock_service):
+        """测试回退到子进程模式时的调用参数"""
         # Mock 脚本存在
         mock_exists.return_value = True
         
@@ -35,6 +75,8 @@ class TestToolRetrieveKnowledge(unittest.TestCase):
         self.assertTrue(cmd_list[1].endswith("query.py"))
         self.assertEqual(cmd_list[2], "design patterns")
         self.assertEqual(cmd_list[3], "documents")
+        # 未指定 mode 时不传 --mode，由脚本按 ZX_KB_SEARCH_MODE 决定
+        self.assertEqual(cmd_list[4:], [])
         
         # 验证环境变量注入
         env_arg = kwargs.get("env")
@@ -44,9 +86,10 @@ class TestToolRetrieveKnowledge(unittest.TestCase):
         # 验证返回结果
         self.assertEqual(result, "Found relevant document: design_doc.pdf")
 
+    @patch("agent_core.tools.get_knowledge_service", return_value=None)
     @patch("subprocess.run")
     @patch("os.path.exists")
-    def test_retrieve_knowledge_script_missing(self, mock_exists, mock_run):
+    def test_retrieve_knowledge_script_missing(self, mock_exists, mock_run, mock_service):
         """测试脚本文件缺失"""
         mock_exists.return_value = False
         
@@ -56,9 +99,10 @@ class TestToolRetrieveKnowledge(unittest.TestCase):
         self.assertIn("未找到", result)
         mock_run.assert_not_called()
 
+    @patch("agent_core.tools.get_knowledge_service", return_value=None)
     @patch("subprocess.run")
     @patch("os.path.exists")
-    def test_retrieve_knowledge_runtime_error(self, mock_exists, mock_run):
+    def test_retrieve_knowledge_runtime_error(self, mock_exists, mock_run, mock_service):
         """测试底层脚本运行时报错"""
         mock_exists.return_value = True
         